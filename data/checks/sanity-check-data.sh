@@ -1,19 +1,12 @@
 #!/usr/bin/env bash
 
-path="$1"
-
-if [[ -z "$path" ]]; then
-  echo "usage: $0 <path to data collection directory>"
+if [[ -z "$1" ]]; then
+  echo "usage: $0 <path to data collection directory> [check-logs options]"
+  exit 1
 fi
 
-function grep() {
-  command grep --color=always "$@"
-}
-
-echo "=== Warnings ==="
-grep -r "warning" "$path" | grep -v "echo" | grep -v "pool.c" | grep -v "warnings generated"
-
-echo "=== Errors ==="
-grep -r "received non SIGTRAP: stopped" "$path"
+# Resolved before changing directory, so that relative paths are relative to the caller
+path="$(realpath "$1")" || exit 1
 
-grep -r "perf_event_open" "$path"
+# Scans every file once, pass --index to skip files that did not change since the last check
+cd "$(dirname "$0")/../.." && python3 -m visualization.main check-logs "$path" "${@:2}"
@@ -1,27 +1,25 @@
+-- Run against the sidecar written by prepare, whose heap_traces index the traces without their addresses:
+-- sqlite3 data.sqlite.facts < data/scripts/find-heap-peaks.sql
 SELECT
-	algorithm.name,
-	algorithm.parameters,
-	algorithm.features,
-	algorithm.compiler,
-	algorithm.features,
-	heapBenchmarkMeasurement.peakAllocation,
-	heapBenchmarkMeasurement.trace
+	algorithm_name,
+	algorithm_parameters,
+	features,
+	compiler,
+	features,
+	peak_allocation,
+	trace
 FROM
-	benchmark
-	INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-	INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-	INNER JOIN heapBenchmark ON heapBenchmark.benchmark = benchmark.id
-	INNER JOIN heapBenchmarkMeasurement ON heapBenchmarkMeasurement.heapBenchmark = heapBenchmark.id
+	heap_measurements
 WHERE
-	heapBenchmarkMeasurement.trace LIKE "%;perform_benchmark;%"
-	AND algorithm.name = "ntru"
-	AND heapBenchmarkMeasurement.peakAllocation > 0
+	trace IN (SELECT raw FROM heap_traces WHERE trace LIKE "%;perform_benchmark;%")
+	AND algorithm_name = "ntru"
+	AND peak_allocation > 0
 GROUP BY
-	algorithm.name,
-	algorithm.parameters,
-	algorithm.features,
-	algorithm.compiler,
-	heapBenchmarkMeasurement.peakAllocation,
-	heapBenchmarkMeasurement.trace
+	algorithm_name,
+	algorithm_parameters,
+	features,
+	compiler,
+	peak_allocation,
+	trace
 ORDER BY
-	peakAllocation DESC
+	peak_allocation DESC
@@ -0,0 +1,35 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from test_hot_paths import PROFILE
+from visualization.callgrind.diff import ProfileDiff
+from visualization.callgrind.index import open_index
+
+
+class ProfileDiffTest(unittest.TestCase):
+  def setUp(self) -> None:
+    self.directory = tempfile.TemporaryDirectory()
+    path = Path(self.directory.name, "callgrind.out")
+    path.write_text(PROFILE)
+    index = open_index(path)
+    self.diff = ProfileDiff(index, index)
+
+  def tearDown(self) -> None:
+    self.directory.cleanup()
+
+  def test_functions_of_the_same_name_are_told_apart_by_file(self):
+    names = {function.name for function in self.diff.ranked()}
+    self.assertIn("main (test.c)", names)
+    self.assertIn("main (???)", names)
+    self.assertIn("owcpa_enc", names)
+
+  def test_no_inclusive_cost_is_above_the_total(self):
+    for function in self.diff.ranked():
+      for side in range(2):
+        self.assertLessEqual(function.inclusive[side], self.diff.totals[side], function.name)
+    self.assertIn((("main", "test.c"), ("crypto_kem_enc", "kem.c")), self.diff.calls)
+
+
+if __name__ == "__main__":
+  unittest.main()
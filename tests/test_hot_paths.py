@@ -0,0 +1,80 @@
+import unittest
+
+from visualization.callgrind.callgraph import CallGraph, HotPath
+from visualization.callgrind.dot import format_hot_path
+from visualization.callgrind.parser import parse_profile
+
+# A KEM operation drawing random bytes from a library without symbols, part
+# of which is symbolized as main, like the stubs of macOS profiles
+PROFILE = """
+events: Ir
+fl=test.c
+fn=main
+0 10
+cfl=kem.c
+cfn=crypto_kem_enc
+calls=1 0
+0 1000
+fl=kem.c
+fn=crypto_kem_enc
+0 100
+cfn=owcpa_enc
+calls=1 0
+0 600
+cfn=randombytes
+calls=1 0
+0 300
+fn=owcpa_enc
+0 600
+fn=randombytes
+0 20
+cfn=AES256_ECB
+calls=1 0
+0 280
+fn=AES256_ECB
+0 30
+cfl=???
+cfn=main
+calls=1 0
+0 150
+cfl=???
+cfn=0x00007fff204b2fb4
+calls=1 0
+0 100
+fl=???
+fn=main
+0 10
+cfn=0x00007fff204b4ec0
+calls=1 0
+0 140
+fn=0x00007fff204b2fb4
+0 50
+cfn=0x00007fff204b4ec0
+calls=1 0
+0 50
+fn=0x00007fff204b4ec0
+0 190
+"""
+
+
+class HotPathTest(unittest.TestCase):
+  def setUp(self) -> None:
+    self.graph = CallGraph(parse_profile(PROFILE.splitlines()))
+    self.hot_path = HotPath(self.graph, self.graph.find("crypto_kem_enc"), 1.0)
+
+  def names(self, functions):
+    return [self.graph.profile.functions[function].name for function in functions]
+
+  def test_calls_back_to_callers_of_the_root_are_left_out(self):
+    self.assertNotIn("main", self.names(self.hot_path.functions))
+    self.assertNotIn("main", format_hot_path(self.hot_path))
+
+  def test_functions_without_symbols_are_labelled_and_not_walked(self):
+    self.assertEqual(self.names(self.hot_path.functions),
+                     ["crypto_kem_enc", "owcpa_enc", "randombytes", "AES256_ECB", "0x00007fff204b2fb4"])
+    self.assertEqual([self.names(call) for call in self.hot_path.calls if self.names(call)[0].startswith("0x")], [])
+    self.assertIn('"0x00007fff204b2fb4"[label="[unknown] 0x00007fff204b2fb4\\n10.00%"]', format_hot_path(self.hot_path))
+
+
+if __name__ == "__main__":
+  unittest.main()
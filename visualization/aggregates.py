@@ -0,0 +1,131 @@
+import json
+import math
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from visualization.stats import confidence_interval
+
+# Resolution of the rollup histograms, a bin is about 9% wide
+HISTOGRAM_BINS_PER_DOUBLING = 8
+NON_POSITIVE_BIN = -(1 << 31)
+
+
+class StatisticsAggregate:
+  """A single-pass aggregate of count, mean, variance, extremes and a confidence interval.
+
+  Uses Welford's algorithm to accumulate the mean and variance without holding
+  the samples. The result is a JSON object, decoded using decode_statistics.
+  """
+
+  def __init__(self) -> None:
+    self.count = 0
+    self.mean = 0.0
+    self.squared_distance = 0.0
+    self.minimum: Optional[float] = None
+    self.maximum: Optional[float] = None
+    self.confidence = 0.95
+
+  def step(self, value: Any, confidence: Optional[float] = None):
+    if value is None:
+      return
+    if confidence is not None:
+      self.confidence = confidence
+    self.count += 1
+    delta = value - self.mean
+    self.mean += delta / self.count
+    self.squared_distance += delta * (value - self.mean)
+    if self.minimum is None or value < self.minimum:
+      self.minimum = value
+    if self.maximum is None or value > self.maximum:
+      self.maximum = value
+
+  def finalize(self) -> Optional[str]:
+    return encode_statistics(self.count, self.mean, self.squared_distance, self.minimum, self.maximum, self.confidence)
+
+
+def encode_statistics(count: int, mean: float, squared_distance: float, minimum: Any, maximum: Any,
+                      confidence: float) -> Optional[str]:
+  if count == 0:
+    return None
+  statistics: Dict[str, Any] = {
+    "count": count,
+    "mean": mean,
+    "variance": squared_distance / count,
+    "standard_deviation": math.sqrt(squared_distance / count),
+    "minimum": minimum,
+    "maximum": maximum,
+    "confidence_interval_lower": None,
+    "confidence_interval_upper": None,
+  }
+  # The confidence interval needs at least two samples
+  if count > 1:
+    sample_standard_deviation = math.sqrt(squared_distance / (count - 1))
+    lower, upper = confidence_interval(mean, sample_standard_deviation, count, confidence)
+    statistics["confidence_interval_lower"] = float(lower)
+    statistics["confidence_interval_upper"] = float(upper)
+  return json.dumps(statistics)
+
+
+def rollup_statistics(count: Optional[int], sum: float, sum_of_squares: float, minimum: Any, maximum: Any,
+                      confidence: Optional[float] = None) -> Optional[str]:
+  """The statistics of a group from its count, sum and sum of squares, as STATISTICS returns them."""
+  if not count:
+    return None
+  mean = sum / count
+  # Rounding may leave a slightly negative distance when all values are equal
+  squared_distance = max(0.0, sum_of_squares - sum * mean)
+  return encode_statistics(count, mean, squared_distance, minimum, maximum, 0.95 if confidence is None else confidence)
+
+
+def histogram_bin(value: Any) -> Optional[int]:
+  """The bin of a value in the histograms of the rollups.
+
+  Bins are fixed, HISTOGRAM_BINS_PER_DOUBLING of them between every power of
+  two, so that histograms of the same group can be merged by adding the counts
+  of their bins. Values that are not positive share NON_POSITIVE_BIN.
+  """
+  if value is None:
+    return None
+  if value <= 0:
+    return NON_POSITIVE_BIN
+  return math.floor(math.log2(value) * HISTOGRAM_BINS_PER_DOUBLING)
+
+
+def estimate_quantile(bins: List[Tuple[int, int]], quantile: float) -> Optional[float]:
+  """Estimate a quantile from the (bin, count) pairs of a histogram, as the geometric center of its bin."""
+  bins = sorted(bins)
+  total = sum(count for _, count in bins)
+  if total == 0:
+    return None
+  seen = 0
+  for bin, count in bins:
+    seen += count
+    if seen >= quantile * total:
+      break
+  if bin == NON_POSITIVE_BIN:
+    return 0.0
+  return 2 ** ((bin + 0.5) / HISTOGRAM_BINS_PER_DOUBLING)
+
+
+def decode_statistics(value: Optional[str]) -> Optional[Dict[str, Any]]:
+  """Decode the result of the STATISTICS aggregate."""
+  if value is None:
+    return None
+  return json.loads(value)
+
+
+def register_aggregates(connection: sqlite3.Connection):
+  """Register the statistics aggregates and functions on a connection.
+
+  STATISTICS(value) and STATISTICS(value, confidence) return a JSON object
+  with the count, mean, population variance and standard deviation, minimum,
+  maximum and the bounds of the confidence interval (95% by default).
+  ROLLUP_STATISTICS(count, sum, sum_of_squares, minimum, maximum) and its
+  variant with a confidence return the same object from the columns of a
+  rollup. HISTOGRAM_BIN(value) returns the histogram bin of a value.
+  """
+  connection.create_aggregate("STATISTICS", 1, StatisticsAggregate)
+  connection.create_aggregate("STATISTICS", 2, StatisticsAggregate)
+  connection.create_function("ROLLUP_STATISTICS", 5, rollup_statistics, deterministic=True)
+  connection.create_function("ROLLUP_STATISTICS", 6, rollup_statistics, deterministic=True)
+  connection.create_function("HISTOGRAM_BIN", 1, histogram_bin, deterministic=True)
@@ -0,0 +1,25 @@
+from typing import Any, Dict, List, Sequence, Tuple
+
+
+def partition_by_inputs(rows: Sequence[Tuple[Any, ...]], inputs: List[Dict[str, Any]], keys: List[str]) -> List[List[Tuple[Any, ...]]]:
+  """Partition rows whose leading columns hold the given input keys into one list of rows per input.
+
+  The leading key columns are removed from the partitioned rows. Like the SQL
+  equality used by fetch_data, inputs with a NULL key receive no rows.
+  """
+  partitions: Dict[Tuple[Any, ...], List[Tuple[Any, ...]]] = {}
+  width = len(keys)
+  for row in rows:
+    key = row[:width]
+    if key not in partitions:
+      partitions[key] = []
+    partitions[key].append(row[width:])
+
+  data = []
+  for input in inputs:
+    key = tuple(input[name] for name in keys)
+    if None in key:
+      data.append([])
+    else:
+      data.append(partitions.get(key, []))
+  return data
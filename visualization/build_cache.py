@@ -0,0 +1,83 @@
+import hashlib
+import inspect
+import json
+import sys
+from argparse import Namespace
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from visualization.graph import Graph
+from visualization.table import Table
+
+# Bump whenever the way outputs are produced from generated data changes in a
+# way that is not captured by the generator's own source, such as how graphs
+# are saved
+BUILD_CACHE_VERSION = 2
+
+# Options that control how an output is built rather than what it contains
+IGNORED_OPTIONS = {"command", "database", "immutable", "output", "verbose", "incremental", "prefetched_data", "columnar", "profile_report"}
+
+
+def hash_data(data: Any, digest: Any):
+  """Feed a deterministic representation of fetched data to a hashlib digest."""
+  # Data only holds arrays if numpy was imported to fetch it, commands that never do are spared importing it
+  numpy = sys.modules.get("numpy")
+  if numpy is not None and isinstance(data, numpy.ndarray):
+    digest.update("ndarray:{}:{}:".format(data.dtype.str, data.shape).encode())
+    digest.update(numpy.ascontiguousarray(data).tobytes())
+  elif isinstance(data, (list, tuple)):
+    digest.update("{}:{}:".format(type(data).__name__, len(data)).encode())
+    for item in data:
+      hash_data(item, digest)
+  elif isinstance(data, dict):
+    digest.update("dict:{}:".format(len(data)).encode())
+    for key in sorted(data.keys(), key=repr):
+      hash_data(key, digest)
+      hash_data(data[key], digest)
+  elif hasattr(data, "__dict__") and not isinstance(data, type):
+    digest.update("{}:".format(type(data).__name__).encode())
+    hash_data(vars(data), digest)
+  else:
+    digest.update("{}:{!r};".format(type(data).__name__, data).encode())
+
+
+def code_version(instance: Union[Graph, Table]) -> str:
+  """Hash the source of a generator and the base class it builds upon."""
+  digest = hashlib.sha256(str(BUILD_CACHE_VERSION).encode())
+  base = Graph if isinstance(instance, Graph) else Table
+  for cls in [type(instance), base]:
+    source_file = inspect.getsourcefile(sys.modules[cls.__module__])
+    if source_file is not None:
+      digest.update(Path(source_file).read_bytes())
+  return digest.hexdigest()
+
+
+def fingerprint(instance: Union[Graph, Table], options: Namespace, data: Any) -> str:
+  """Create a fingerprint of everything an output is built from."""
+  digest = hashlib.sha256(code_version(instance).encode())
+  relevant_options = {key: value for key, value in vars(options).items() if key not in IGNORED_OPTIONS}
+  digest.update(json.dumps(relevant_options, sort_keys=True, default=str).encode())
+  hash_data(data, digest)
+  return digest.hexdigest()
+
+
+def fingerprint_path(output_path: Path) -> Path:
+  return output_path.with_name(".{}.fingerprint".format(output_path.name))
+
+
+def read_fingerprint(output_path: Path) -> Optional[str]:
+  if not output_path.exists():
+    return None
+  try:
+    return fingerprint_path(output_path).read_text().strip()
+  except OSError:
+    return None
+
+
+def is_up_to_date(output_path: Path, current_fingerprint: str) -> bool:
+  """Whether an output exists and was built from the same fingerprint."""
+  return read_fingerprint(output_path) == current_fingerprint
+
+
+def store_fingerprint(output_path: Path, current_fingerprint: str):
+  fingerprint_path(output_path).write_text(current_fingerprint + "\n")
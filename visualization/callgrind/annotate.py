@@ -0,0 +1,204 @@
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from visualization.callgrind.parser import Function, Profile
+
+# An annotation written by a previous run, removed before annotating again
+ANNOTATION = re.compile(r"\s*// \d+\.\d+%.*$")
+HOT_LOOP = re.compile(r"^\s*// Hot loop, lines \d+-\d+: \d+\.\d+%$")
+LOOP = re.compile(r"\b(for|while|do)\b")
+KEYWORD = re.compile(r"(for|while|do|if|else)\b")
+
+
+def mask_code(source: str) -> str:
+  """Replace comments and string literals with spaces, keeping offsets and newlines intact."""
+  masked = list(source)
+  i = 0
+  while i < len(source):
+    if source.startswith("//", i):
+      end = source.find("\n", i)
+      end = len(source) if end == -1 else end
+    elif source.startswith("/*", i):
+      end = source.find("*/", i + 2)
+      end = len(source) if end == -1 else end + 2
+    elif source[i] in "\"'":
+      end = i + 1
+      while end < len(source) and source[end] != source[i] and source[end] != "\n":
+        end += 2 if source[end] == "\\" else 1
+      end = min(end + 1, len(source))
+    else:
+      i += 1
+      continue
+    for j in range(i, end):
+      if masked[j] != "\n":
+        masked[j] = " "
+    i = end
+  return "".join(masked)
+
+
+class LoopScanner:
+  """Finds the extent of the loops of C code, with comments and strings masked."""
+
+  def __init__(self, code: str) -> None:
+    self.code = code
+
+  def skip_space(self, i: int) -> int:
+    while i < len(self.code) and self.code[i].isspace():
+      i += 1
+    return i
+
+  def matching(self, i: int, opening: str, closing: str) -> int:
+    """The index after the bracket closing the one at i."""
+    depth = 0
+    while i < len(self.code):
+      if self.code[i] == opening:
+        depth += 1
+      elif self.code[i] == closing:
+        depth -= 1
+        if depth == 0:
+          return i + 1
+      i += 1
+    return i
+
+  def keyword(self, i: int) -> Optional[str]:
+    match = KEYWORD.match(self.code, i)
+    return match.group(1) if match is not None and (i == 0 or not (self.code[i - 1].isalnum() or self.code[i - 1] == "_")) else None
+
+  def statement_end(self, i: int) -> int:
+    """The index after the statement starting at or after i."""
+    i = self.skip_space(i)
+    if i >= len(self.code):
+      return i
+    if self.code[i] == "{":
+      return self.matching(i, "{", "}")
+    keyword = self.keyword(i)
+    if keyword in ("for", "while", "if"):
+      end = self.statement_end(self.matching(self.skip_space(i + len(keyword)), "(", ")"))
+      if keyword == "if":
+        after = self.skip_space(end)
+        if self.keyword(after) == "else":
+          end = self.statement_end(after + len("else"))
+      return end
+    if keyword == "do":
+      end = self.skip_space(self.statement_end(i + len("do")))
+      if self.keyword(end) == "while":
+        end = self.matching(self.skip_space(end + len("while")), "(", ")")
+      return self.code.find(";", end) + 1 or len(self.code)
+    # A simple statement, ending at the first semicolon outside of brackets
+    depth = 0
+    while i < len(self.code):
+      if self.code[i] in "({[":
+        depth += 1
+      elif self.code[i] in ")}]":
+        depth -= 1
+      elif self.code[i] == ";" and depth <= 0:
+        return i + 1
+      i += 1
+    return i
+
+  def loops(self) -> List[Tuple[int, int]]:
+    """The loops as the offsets of their first and last character."""
+    loops = []
+    # The while of a do-while loop is part of the loop started by do
+    do_whiles = set()
+    for match in LOOP.finditer(self.code):
+      if match.start() in do_whiles:
+        continue
+      end = self.statement_end(match.start())
+      if match.group(1) == "do":
+        closing = self.code.rfind("while", match.start(), end)
+        if closing != -1:
+          do_whiles.add(closing)
+      loops.append((match.start(), end))
+    return loops
+
+
+def find_loops(source: str) -> List[Tuple[int, int]]:
+  """Find the loops of C source as their first and last line, starting at 1."""
+  scanner = LoopScanner(mask_code(source))
+  return [(source.count("\n", 0, start) + 1, source.count("\n", 0, max(start, end - 1)) + 1) for start, end in scanner.loops()]
+
+
+def find_definition(lines: List[str], name: str) -> Optional[int]:
+  """Find the line defining a function, starting at 1."""
+  definition = re.compile(r"\b{}\s*\(".format(re.escape(name)))
+  for number, line in enumerate(lines, start=1):
+    # A definition starts at the beginning of the line, unlike calls
+    if definition.search(line) and not line[:1].isspace() and not line.rstrip().endswith(";"):
+      return number
+  return None
+
+
+def select_function(profile: Profile, name: str, source_path: Path, event: int) -> Function:
+  """Select the function of a name, preferring the one defined in a file named like the source."""
+  functions = [function for function in profile.find_functions(name) if function.lines is not None]
+  if len(functions) == 0:
+    raise ValueError("the profile has no function named '{}'".format(name))
+  same_file = [function for function in functions if Path(function.file).name.lower() == source_path.name.lower()]
+  return max(same_file or functions, key=lambda x: x.cost[event])
+
+
+class Annotation:
+  """The share of a function's exclusive cost on every line of its source, and its hot loops."""
+
+  def __init__(self, function: Function, event: int, source: str, first_line: Optional[int] = None,
+               threshold: float = 1.0, highlight: float = 25.0) -> None:
+    self.function = function
+    self.lines = [ANNOTATION.sub("", line) for line in source.split("\n") if not HOT_LOOP.match(line)]
+    source = "\n".join(self.lines)
+    self.threshold = threshold
+    total = function.cost[event]
+    assert function.lines is not None
+
+    # The line numbers of the profile refer to the original source file, which
+    # may be longer than the annotated source. Align the function's first line
+    # in the profile with its definition in the source.
+    profiled = {line: cost[event] for (file, line), cost in function.lines.items() if file == function.file and cost[event] > 0}
+    if first_line is None:
+      definition = find_definition(self.lines, function.name)
+      first_line = min(profiled.keys()) if definition is not None and len(profiled) > 0 else 1
+      offset = first_line - (definition or 1)
+    else:
+      offset = first_line - 1
+
+    self.percentages: Dict[int, float] = {}
+    # The share of the cost found in other files, such as inlined code, or outside of the source
+    self.unmatched = 0.0
+    for line, cost in profiled.items():
+      percentage = 100.0 * cost / total if total > 0 else 0.0
+      if 1 <= line - offset <= len(self.lines):
+        self.percentages[line - offset] = percentage
+      else:
+        self.unmatched += percentage
+    for (file, line), cost in function.lines.items():
+      if file != function.file and total > 0:
+        self.unmatched += 100.0 * cost[event] / total
+
+    self.loops: List[Tuple[int, int, float]] = []
+    for start, end in find_loops(source):
+      percentage = sum(self.percentages.get(line, 0.0) for line in range(start, end + 1))
+      self.loops.append((start, end, percentage))
+    # Highlight the innermost loops accounting for at least the given share of the cost
+    self.hot_loops = []
+    for start, end, percentage in self.loops:
+      if percentage < highlight:
+        continue
+      nested = [loop for loop in self.loops if (loop[0], loop[1]) != (start, end) and start <= loop[0] and loop[1] <= end]
+      if not any(loop[2] >= highlight for loop in nested):
+        self.hot_loops.append((start, end, percentage))
+
+  def format(self) -> str:
+    """Format the source with the share of every line as a trailing comment."""
+    hot_starts = {start: (end, percentage) for start, end, percentage in self.hot_loops}
+    output = []
+    for number, line in enumerate(self.lines, start=1):
+      if number in hot_starts:
+        end, percentage = hot_starts[number]
+        indentation = line[:len(line) - len(line.lstrip())]
+        output.append("{}// Hot loop, lines {}-{}: {:.2f}%".format(indentation, number, end, percentage))
+      percentage = self.percentages.get(number)
+      if percentage is not None and percentage >= self.threshold:
+        line = "{} // {:.2f}%".format(line, percentage)
+      output.append(line)
+    return "\n".join(output)
@@ -0,0 +1,211 @@
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from visualization.callgrind.parser import Profile
+
+# Functions without a symbol are named by their address
+ADDRESS = re.compile(r"^0x[0-9a-fA-F]+$")
+
+
+def is_unknown(name: str) -> bool:
+  return ADDRESS.match(name) is not None
+
+
+def strongly_connected_components(successors: List[List[int]]) -> List[List[int]]:
+  """Find the strongly connected components of a graph using Tarjan's algorithm.
+
+  The components are returned in reverse topological order, callees before
+  their callers. The search is iterative as call chains may be deep.
+  """
+  count = len(successors)
+  index = [-1] * count
+  lowlink = [0] * count
+  on_stack = [False] * count
+  stack: List[int] = []
+  components: List[List[int]] = []
+  next_index = 0
+
+  for start in range(count):
+    if index[start] != -1:
+      continue
+    work = [(start, 0)]
+    while work:
+      node, child = work.pop()
+      if child == 0:
+        index[node] = lowlink[node] = next_index
+        next_index += 1
+        stack.append(node)
+        on_stack[node] = True
+      recurse = False
+      for i in range(child, len(successors[node])):
+        successor = successors[node][i]
+        if index[successor] == -1:
+          work.append((node, i + 1))
+          work.append((successor, 0))
+          recurse = True
+          break
+        elif on_stack[successor]:
+          lowlink[node] = min(lowlink[node], index[successor])
+      if recurse:
+        continue
+      if lowlink[node] == index[node]:
+        component = []
+        while True:
+          member = stack.pop()
+          on_stack[member] = False
+          component.append(member)
+          if member == node:
+            break
+        components.append(component)
+      if work:
+        parent = work[-1][0]
+        lowlink[parent] = min(lowlink[parent], lowlink[node])
+  return components
+
+
+class CallGraph:
+  """The call graph of a profile for a single event, with inclusive costs.
+
+  Callgrind attributes the inclusive cost of every call to its call site, so
+  summing a function's exclusive cost and the cost of its calls counts
+  recursive calls twice. Functions calling each other are therefore
+  collapsed into cycles, as gprof does. A function in a cycle is given the
+  inclusive cost of the whole cycle; calls within the cycle are ignored.
+  """
+
+  def __init__(self, profile: Profile, event: str = "Ir") -> None:
+    event_index = profile.event_index(event)
+    self.profile = profile
+    self.event = event
+    count = len(profile.functions)
+    self.exclusive = [function.cost[event_index] for function in profile.functions]
+    self.callees: List[Dict[int, int]] = [{} for _ in range(count)]
+    self.callers: List[Dict[int, int]] = [{} for _ in range(count)]
+    for call in profile.calls.values():
+      self.callees[call.caller][call.callee] = call.cost[event_index]
+      self.callers[call.callee][call.caller] = call.cost[event_index]
+
+    self.components = strongly_connected_components([list(callees.keys()) for callees in self.callees])
+    self.component = [0] * count
+    for i, members in enumerate(self.components):
+      for member in members:
+        self.component[member] = i
+
+    # A component includes the cost of its members and of calls leaving it
+    self.component_inclusive = [0] * len(self.components)
+    for i, members in enumerate(self.components):
+      cost = 0
+      for member in members:
+        cost += self.exclusive[member]
+        for callee, call_cost in self.callees[member].items():
+          if self.component[callee] != i:
+            cost += call_cost
+      self.component_inclusive[i] = cost
+    self.inclusive = [self.component_inclusive[self.component[i]] for i in range(count)]
+
+  def is_cycle(self, function: int) -> bool:
+    return len(self.components[self.component[function]]) > 1
+
+  def caller_names(self, root: int) -> Set[str]:
+    """The names of the functions the root is called from, directly or not, outside of its cycle."""
+    component = self.component[root]
+    visited: Set[int] = set(self.components[component])
+    queue = list(visited)
+    while queue:
+      function = queue.pop()
+      for caller in self.callers[function]:
+        if caller not in visited:
+          visited.add(caller)
+          queue.append(caller)
+    names = {self.profile.functions[function].name for function in visited}
+    return names - {self.profile.functions[member].name for member in self.components[component]}
+
+  def find(self, name: str) -> int:
+    """Find the function of a name, preferring the most expensive one if several are named alike."""
+    candidates = [function.index for function in self.profile.find_functions(name)]
+    if len(candidates) == 0:
+      raise ValueError("the profile has no function named '{}'".format(name))
+    return max(candidates, key=lambda x: self.inclusive[x])
+
+  def flow(self, root: int) -> Tuple[Dict[int, float], Dict[Tuple[int, int], float]]:
+    """Apportion the inclusive cost of a root to the functions and calls it reaches.
+
+    Every caller passes on the share of its own cost that stems from the
+    root, in proportion to the cost of each call. This yields the cost of
+    each function when called on behalf of the root rather than its total
+    cost, for functions also called from elsewhere.
+    """
+    root_component = self.component[root]
+    component_flow: Dict[int, float] = {root_component: float(self.component_inclusive[root_component])}
+    call_flow: Dict[Tuple[int, int], float] = {}
+    # Components are ordered callees first, so walking them backwards visits callers first
+    for component in range(root_component, -1, -1):
+      flow = component_flow.get(component)
+      if flow is None:
+        continue
+      inclusive = self.component_inclusive[component]
+      share = min(1.0, flow / inclusive) if inclusive > 0 else 0.0
+      for member in self.components[component]:
+        for callee, cost in self.callees[member].items():
+          callee_component = self.component[callee]
+          if callee_component == component:
+            continue
+          call_flow[(member, callee)] = share * cost
+          component_flow[callee_component] = component_flow.get(callee_component, 0.0) + share * cost
+
+    function_flow = {}
+    for component, flow in component_flow.items():
+      for member in self.components[component]:
+        function_flow[member] = flow
+    return function_flow, call_flow
+
+
+class HotPath:
+  """The functions and calls that account for at least a share of the cost of a root.
+
+  Calls back into functions named like one the root is called from, such as
+  library stubs symbolized as main, are left out along with their callees.
+  Functions without a symbol are kept, but not walked below, as their
+  callees are only further addresses.
+  """
+
+  def __init__(self, graph: CallGraph, root: int, threshold: float) -> None:
+    self.graph = graph
+    self.root = root
+    self.threshold = threshold
+    function_flow, call_flow = graph.flow(root)
+    total = function_flow[root]
+    self.percentages: Dict[int, float] = {}
+    self.calls: List[Tuple[int, int]] = []
+
+    def percentage(flow: Optional[float]) -> float:
+      return 100.0 * flow / total if flow is not None and total > 0 else 0.0
+
+    functions = graph.profile.functions
+    callers = graph.caller_names(root)
+
+    # Walk the hot calls breadth first, in order of decreasing cost
+    self.functions = [root]
+    self.percentages[root] = 100.0
+    visited: Set[int] = {root}
+    queue = [root]
+    while queue:
+      caller = queue.pop(0)
+      callees = sorted(graph.callees[caller].keys(), key=lambda x: function_flow.get(x, 0.0), reverse=True)
+      for callee in callees:
+        if callee == caller or functions[callee].name in callers:
+          continue
+        if graph.component[callee] == graph.component[caller]:
+          # Calls within a cycle carry no apportioned cost of their own
+          hot = percentage(function_flow.get(callee)) >= threshold
+        else:
+          hot = percentage(call_flow.get((caller, callee))) >= threshold
+        if not hot:
+          continue
+        self.calls.append((caller, callee))
+        if callee not in visited:
+          visited.add(callee)
+          self.functions.append(callee)
+          self.percentages[callee] = percentage(function_flow.get(callee))
+          if not is_unknown(functions[callee].name):
+            queue.append(callee)
@@ -0,0 +1,106 @@
+import math
+from typing import Dict, List, Optional, Set, Tuple
+
+from visualization.callgrind.dot import IDENTIFIER, quote, quote_label
+from visualization.callgrind.index import CallgrindIndex
+
+
+class FunctionDelta:
+  """The inclusive and exclusive cost of a function before and after a change."""
+
+  def __init__(self, name: str, file: str) -> None:
+    self.key = (name, file)
+    # Named after its file as well if another function shares its name
+    self.name = name
+    self.inclusive = [0, 0]
+    self.exclusive = [0, 0]
+
+  def delta(self, exclusive: bool = False) -> int:
+    before, after = self.exclusive if exclusive else self.inclusive
+    return after - before
+
+  def relative(self, exclusive: bool = False) -> Optional[float]:
+    """The change relative to the cost before, or None for a function without cost before."""
+    before, after = self.exclusive if exclusive else self.inclusive
+    return (after - before) / before if before > 0 else None
+
+
+def format_relative(relative: Optional[float], delta: int) -> str:
+  if relative is None:
+    return "new" if delta > 0 else "-"
+  if relative == -1.0:
+    return "removed"
+  return "{:+.2f}%".format(100.0 * relative)
+
+
+class ProfileDiff:
+  """Two profiles with their functions aligned by name and the name of their file.
+
+  Functions of the same name in different files, such as static functions or
+  the unsymbolized stubs attributed to main, are told apart by their file as
+  the other callgrind queries do, since one may run within the other.
+  """
+
+  def __init__(self, before: CallgrindIndex, after: CallgrindIndex, event: str = "Ir") -> None:
+    self.event = event
+    self.totals = (before.total(event), after.total(event))
+    self.functions: Dict[Tuple[str, str], FunctionDelta] = {}
+    self.calls: Set[Tuple[Tuple[str, str], Tuple[str, str]]] = set()
+    for side, index in enumerate((before, after)):
+      event_index = index.event_index(event)
+      names = index.manifest["strings"]["name"]
+      files = index.manifest["strings"]["file"]
+      function_names = index["function_name"]
+      function_files = index["function_file"]
+      keys = [(names[function_names[function]], files[function_files[function]].rsplit("/", 1)[-1])
+              for function in range(len(function_names))]
+      inclusive = index["inclusive"][:, event_index]
+      exclusive = index["exclusive"][:, event_index]
+      for function, key in enumerate(keys):
+        delta = self.functions.get(key)
+        if delta is None:
+          delta = self.functions[key] = FunctionDelta(*key)
+        delta.inclusive[side] += int(inclusive[function])
+        delta.exclusive[side] += int(exclusive[function])
+      for caller, callee in zip(index["call_caller"], index["call_callee"]):
+        self.calls.add((keys[caller], keys[callee]))
+
+    counts: Dict[str, int] = {}
+    for name, _ in self.functions:
+      counts[name] = counts.get(name, 0) + 1
+    for (name, file), delta in self.functions.items():
+      if counts[name] > 1:
+        delta.name = "{} ({})".format(name, file)
+
+  def ranked(self, exclusive: bool = False) -> List[FunctionDelta]:
+    """The functions ordered by the absolute change of their cost, largest first."""
+    return sorted(self.functions.values(), key=lambda x: (-abs(x.delta(exclusive)), x.name))
+
+
+def delta_color(relative: Optional[float], delta: int) -> str:
+  """Shade increases red and decreases blue, saturating at a doubling or halving of the cost."""
+  if delta == 0:
+    return "#ffffff"
+  intensity = 1.0 if relative is None else min(1.0, math.sqrt(abs(relative)))
+  fade = int(round(255 * (1.0 - 0.8 * intensity)))
+  return "#ff{0:02x}{0:02x}".format(fade) if delta > 0 else "#{0:02x}{0:02x}ff".format(fade)
+
+
+def format_diff_dot(diff: ProfileDiff, threshold: float = 1.0, limit: int = 40) -> str:
+  """Format the functions whose inclusive cost changed by at least a share of the total cost before as a DOT graph."""
+  total = diff.totals[0]
+  functions = [function for function in diff.ranked() if total > 0 and 100.0 * abs(function.delta()) / total >= threshold][:limit]
+  ids = {function.key: function.name if IDENTIFIER.match(function.name) else quote(function.name)
+         for function in functions}
+  lines = ["digraph G {", "  rankdir=LR;", "  {", "    node [shape=box, style=filled]"]
+  for function in functions:
+    delta = function.delta()
+    label = "{}\\n{:+.2f}% of total\\n{}".format(function.name, 100.0 * delta / total, format_relative(function.relative(), delta))
+    lines.append("    {}[label={}, fillcolor=\"{}\"]".format(ids[function.key], quote_label(label),
+                                                          delta_color(function.relative(), delta)))
+  lines.append("  }")
+  for caller, callee in sorted(diff.calls):
+    if caller != callee and caller in ids and callee in ids:
+      lines.append("  {} -> {}".format(ids[caller], ids[callee]))
+  lines.append("}")
+  return "\n".join(lines) + "\n"
@@ -0,0 +1,54 @@
+import re
+from typing import Dict, List
+
+from visualization.callgrind.callgraph import HotPath, is_unknown
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def quote(value: str) -> str:
+  return '"{}"'.format(value.replace("\\", "\\\\").replace('"', '\\"'))
+
+
+def quote_label(label: str) -> str:
+  """Quote a label, keeping escape sequences such as \\n for line breaks."""
+  return '"{}"'.format(label.replace('"', '\\"'))
+
+
+def node_ids(hot_path: HotPath) -> Dict[int, str]:
+  """Name the nodes after their functions, telling apart functions of the same name by their file."""
+  functions = hot_path.graph.profile.functions
+  names: Dict[str, int] = {}
+  for function in hot_path.functions:
+    names[functions[function].name] = names.get(functions[function].name, 0) + 1
+
+  ids = {}
+  for function in hot_path.functions:
+    name = functions[function].name
+    if names[name] > 1:
+      name = "{} ({})".format(name, functions[function].file.rsplit("/", 1)[-1])
+    ids[function] = name if IDENTIFIER.match(name) else quote(name)
+  return ids
+
+
+def format_hot_path(hot_path: HotPath) -> str:
+  """Format a hot path as a DOT graph, labelling every function with its share of the root's cost.
+
+  Functions without a symbol are labelled [unknown], followed by their address.
+  """
+  functions = hot_path.graph.profile.functions
+  ids = node_ids(hot_path)
+  lines: List[str] = ["digraph G {", "  rankdir=LR;", "  {", "    node [shape=box]"]
+  for function in hot_path.functions:
+    name = functions[function].name
+    if is_unknown(name):
+      name = "[unknown] {}".format(name)
+    label = "{}\\n{:.2f}%".format(name, hot_path.percentages[function])
+    if hot_path.graph.is_cycle(function):
+      label += " (cycle)"
+    lines.append("    {}[label={}]".format(ids[function], quote_label(label)))
+  lines.append("  }")
+  for caller, callee in hot_path.calls:
+    lines.append("  {} -> {}".format(ids[caller], ids[callee]))
+  lines.append("}")
+  return "\n".join(lines) + "\n"
@@ -0,0 +1,82 @@
+from typing import Dict, List, Tuple
+
+from visualization.callgrind.callgraph import CallGraph
+from visualization.flame import FrameTree
+
+
+def function_names(graph: CallGraph) -> List[str]:
+  """Name the functions, telling apart functions of the same name by their file and marking cycles."""
+  functions = graph.profile.functions
+  counts: Dict[str, int] = {}
+  for function in functions:
+    counts[function.name] = counts.get(function.name, 0) + 1
+
+  names = []
+  for function in functions:
+    name = function.name
+    if counts[name] > 1:
+      name = "{} ({})".format(name, function.file.rsplit("/", 1)[-1])
+    if graph.is_cycle(function.index):
+      name += " (cycle)"
+    names.append(name)
+  return names
+
+
+def entry_functions(graph: CallGraph) -> List[int]:
+  """The functions with a cost that are not called from outside of their cycle, where the program starts."""
+  entries = []
+  for function, callers in enumerate(graph.callers):
+    component = graph.component[function]
+    if graph.inclusive[function] > 0 and all(graph.component[caller] == component for caller in callers):
+      entries.append(function)
+  return entries
+
+
+def collapse_stacks(graph: CallGraph, root: int, threshold: float = 0.0) -> List[Tuple[List[int], float]]:
+  """Collapse the calls below a root into call stacks, weighted by the cost spent in the last function of each.
+
+  The cost of a stack is apportioned to the stacks it continues in as
+  CallGraph.flow apportions the cost of a function to its calls, in
+  proportion to their cost. Calls within a cycle are not followed, a cycle
+  continues in the calls leaving any of its functions. Stacks costing less
+  than the threshold, a percentage of the root's cost, are not continued,
+  their cost is kept by their caller so that every stack keeps its width.
+  """
+  function_flow, call_flow = graph.flow(root)
+  minimum = function_flow[root] * threshold / 100
+  stacks = []
+  # Depth first, as there may be a stack per path through the call graph
+  work = [([root], function_flow[root])]
+  while work:
+    path, cost = work.pop()
+    function = path[-1]
+    component = graph.component[function]
+    flow = function_flow[function]
+    remaining = cost
+    for member in graph.components[component]:
+      for callee in graph.callees[member]:
+        if graph.component[callee] == component or flow <= 0:
+          continue
+        callee_cost = cost * call_flow[(member, callee)] / flow
+        if callee_cost <= 0 or callee_cost < minimum:
+          continue
+        remaining -= callee_cost
+        work.append((path + [callee], callee_cost))
+    stacks.append((path, max(0.0, remaining)))
+  return stacks
+
+
+def build_frame_tree(stacks: List[Tuple[List[int], float]], names: List[str]) -> FrameTree:
+  tree = FrameTree()
+  for path, cost in stacks:
+    tree.add([names[function] for function in path], cost)
+  return tree
+
+
+def format_collapsed_stacks(stacks: List[Tuple[List[int], float]], names: List[str]) -> str:
+  """Format stacks as lines of their frames separated by semicolons and their cost, as read by flamegraph.pl."""
+  lines = []
+  for path, cost in sorted(stacks, key=lambda x: [names[function] for function in x[0]]):
+    if round(cost) > 0:
+      lines.append("{} {}".format(";".join(names[function] for function in path), round(cost)))
+  return "\n".join(lines) + "\n"
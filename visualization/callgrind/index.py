@@ -0,0 +1,169 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+
+from visualization.callgrind.callgraph import CallGraph
+from visualization.callgrind.parser import Profile, read_profile
+from visualization.columns import StringColumn
+from visualization.signature import database_signature
+
+INDEX_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def intern(values: List[str]) -> StringColumn:
+  codes: Dict[str, int] = {}
+  array = numpy.empty(len(values), dtype=numpy.int32)
+  for i, value in enumerate(values):
+    array[i] = codes.setdefault(value, len(codes))
+  return StringColumn(array, list(codes.keys()))
+
+
+def write_index(profile: Profile, profile_path: Path, output_path: Path):
+  """Write the functions and calls of a profile as memory-mappable arrays.
+
+  Functions are numbered by their order in the profile. Their names, files
+  and objects are interned, with the strings stored in the manifest. The
+  calls are sorted by caller, so that the calls of function i are
+  calls[callee_offsets[i]:callee_offsets[i + 1]]. caller_calls lists the
+  same calls sorted by callee, indexed by caller_offsets.
+  """
+  count = len(profile.functions)
+  events = len(profile.events)
+  arrays: Dict[str, numpy.ndarray] = {}
+  strings: Dict[str, List[str]] = {}
+  for column in ("name", "file", "object"):
+    interned = intern([getattr(function, column) for function in profile.functions])
+    arrays["function_" + column] = interned.codes
+    strings[column] = interned.values
+
+  exclusive = numpy.array([function.cost for function in profile.functions], dtype=numpy.int64).reshape(count, events)
+  inclusive = numpy.empty_like(exclusive)
+  cycle = numpy.zeros(count, dtype=bool)
+  for i, event in enumerate(profile.events):
+    call_graph = CallGraph(profile, event)
+    inclusive[:, i] = call_graph.inclusive
+    cycle |= numpy.array([call_graph.is_cycle(function) for function in range(count)], dtype=bool)
+  arrays["exclusive"] = exclusive
+  arrays["inclusive"] = inclusive
+  arrays["cycle"] = cycle
+
+  calls = sorted(profile.calls.values(), key=lambda x: (x.caller, x.callee))
+  caller = numpy.array([call.caller for call in calls], dtype=numpy.int32)
+  callee = numpy.array([call.callee for call in calls], dtype=numpy.int32)
+  arrays["call_caller"] = caller
+  arrays["call_callee"] = callee
+  arrays["call_count"] = numpy.array([call.count for call in calls], dtype=numpy.int64)
+  arrays["call_cost"] = numpy.array([call.cost for call in calls], dtype=numpy.int64).reshape(len(calls), events)
+  arrays["callee_offsets"] = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(caller, minlength=count)))).astype(numpy.int64)
+  arrays["caller_calls"] = numpy.argsort(callee, kind="stable").astype(numpy.int32)
+  arrays["caller_offsets"] = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(callee, minlength=count)))).astype(numpy.int64)
+
+  output_path.mkdir(parents=True, exist_ok=True)
+  for name, array in arrays.items():
+    numpy.save(output_path.joinpath(name + ".npy"), array)
+  manifest = {
+    "version": INDEX_VERSION,
+    "profile": database_signature(profile_path),
+    "events": profile.events,
+    "totals": profile.totals,
+    "functions": count,
+    "calls": len(calls),
+    "strings": strings,
+  }
+  # Write the manifest last, so that a partial index is never picked up
+  with open(output_path.joinpath(MANIFEST_NAME), "wt") as file:
+    json.dump(manifest, file)
+
+
+class CallgrindIndex:
+  """A profile indexed by write_index, memory-mapped on load."""
+
+  def __init__(self, path: Path) -> None:
+    self.path = path
+    with open(path.joinpath(MANIFEST_NAME), "rt") as file:
+      self.manifest = json.load(file)
+    if self.manifest.get("version") != INDEX_VERSION:
+      raise ValueError("unsupported callgrind index version {}".format(self.manifest.get("version")))
+    self.events: List[str] = self.manifest["events"]
+    self.arrays: Dict[str, numpy.ndarray] = {}
+
+  def __getitem__(self, name: str) -> numpy.ndarray:
+    if name not in self.arrays:
+      self.arrays[name] = numpy.load(self.path.joinpath(name + ".npy"), mmap_mode="r")
+    return self.arrays[name]
+
+  def is_index_of(self, profile_path: Path) -> bool:
+    return self.manifest["profile"] == database_signature(profile_path)
+
+  def event_index(self, event: str) -> int:
+    if event not in self.events:
+      raise ValueError("the profile has no event '{}', only: {}".format(event, ", ".join(self.events)))
+    return self.events.index(event)
+
+  def total(self, event: str) -> int:
+    """The total cost of an event, as reported by the profile or summed from its functions."""
+    totals: Optional[List[int]] = self.manifest["totals"]
+    if totals is not None:
+      return totals[self.event_index(event)]
+    return int(self["exclusive"][:, self.event_index(event)].sum())
+
+  def name(self, function: int) -> str:
+    return self.manifest["strings"]["name"][self["function_name"][function]]
+
+  def file(self, function: int) -> str:
+    return self.manifest["strings"]["file"][self["function_file"][function]]
+
+  def find(self, name: str) -> List[int]:
+    """Find every function of a name, as static functions of different files may share one."""
+    try:
+      code = self.manifest["strings"]["name"].index(name)
+    except ValueError:
+      return []
+    return [int(x) for x in numpy.flatnonzero(self["function_name"] == code)]
+
+  def top(self, event: str, inclusive: bool = True, limit: int = 20) -> List[Tuple[int, int]]:
+    """The most expensive functions and their cost."""
+    costs = self["inclusive" if inclusive else "exclusive"][:, self.event_index(event)]
+    limit = min(limit, len(costs))
+    if limit == 0:
+      return []
+    candidates = numpy.argpartition(-costs, limit - 1)[:limit]
+    order = candidates[numpy.lexsort((candidates, -costs[candidates]))]
+    return [(int(function), int(costs[function])) for function in order]
+
+  def callees(self, function: int, event: str) -> List[Tuple[int, int, int]]:
+    """The functions called by a function, as (callee, calls, inclusive cost) sorted by cost."""
+    offsets = self["callee_offsets"]
+    calls = numpy.arange(offsets[function], offsets[function + 1])
+    return self.sorted_calls(calls, self["call_callee"], event)
+
+  def callers(self, function: int, event: str) -> List[Tuple[int, int, int]]:
+    """The functions calling a function, as (caller, calls, inclusive cost) sorted by cost."""
+    offsets = self["caller_offsets"]
+    calls = self["caller_calls"][offsets[function]:offsets[function + 1]]
+    return self.sorted_calls(calls, self["call_caller"], event)
+
+  def sorted_calls(self, calls: numpy.ndarray, functions: numpy.ndarray, event: str) -> List[Tuple[int, int, int]]:
+    costs = self["call_cost"][calls, self.event_index(event)]
+    order = numpy.argsort(-costs, kind="stable")
+    return [(int(functions[calls[i]]), int(self["call_count"][calls[i]]), int(costs[i])) for i in order]
+
+
+def index_path_of(profile_path: Path) -> Path:
+  return profile_path.with_name(profile_path.name + ".index")
+
+
+def open_index(profile_path: Path, index_path: Optional[Path] = None, verbose: bool = False) -> CallgrindIndex:
+  """Open the index of a profile, indexing the profile first if it has no up to date index."""
+  index_path = index_path or index_path_of(profile_path)
+  if index_path.joinpath(MANIFEST_NAME).is_file():
+    index = CallgrindIndex(index_path)
+    if index.is_index_of(profile_path):
+      return index
+  if verbose:
+    print("indexing:", profile_path)
+  write_index(read_profile(profile_path), profile_path, index_path)
+  return CallgrindIndex(index_path)
@@ -0,0 +1,217 @@
+from pathlib import Path
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+# Keys identifying a function, as (object, file, name)
+FunctionKey = Tuple[str, str, str]
+
+
+class Function:
+  """A function of a profile and its exclusive cost of every event."""
+
+  def __init__(self, index: int, object: str, file: str, name: str, events: int) -> None:
+    self.index = index
+    self.object = object
+    self.file = file
+    self.name = name
+    self.cost = [0] * events
+    # The exclusive cost of every source line, as (file, line), when collected
+    self.lines: Optional[Dict[Tuple[str, int], List[int]]] = None
+
+
+class Call:
+  """The calls from one function to another and their inclusive cost of every event."""
+
+  def __init__(self, caller: int, callee: int, events: int) -> None:
+    self.caller = caller
+    self.callee = callee
+    self.count = 0
+    self.cost = [0] * events
+
+
+class Profile:
+  """The functions and calls of a callgrind profile."""
+
+  def __init__(self) -> None:
+    self.positions: List[str] = ["line"]
+    self.events: List[str] = []
+    self.totals: Optional[List[int]] = None
+    self.functions: List[Function] = []
+    self.calls: Dict[Tuple[int, int], Call] = {}
+    self.keys: Dict[FunctionKey, int] = {}
+
+  def event_index(self, event: str) -> int:
+    if event not in self.events:
+      raise ValueError("the profile has no event '{}', only: {}".format(event, ", ".join(self.events)))
+    return self.events.index(event)
+
+  def function(self, key: FunctionKey) -> Function:
+    index = self.keys.get(key)
+    if index is None:
+      index = len(self.functions)
+      self.keys[key] = index
+      self.functions.append(Function(index, key[0], key[1], key[2], len(self.events)))
+    return self.functions[index]
+
+  def find_functions(self, name: str) -> List[Function]:
+    return [function for function in self.functions if function.name == name]
+
+
+class ProfileParser:
+  """Parses the callgrind format line by line, without holding the file in memory.
+
+  Supports compressed names, such as "fn=(12) main" followed by "fn=(12)",
+  and compressed positions relative to the previous cost line ("+3", "-2",
+  "*"). See https://valgrind.org/docs/manual/cl-format.html.
+
+  The cost of each source line is only collected for the functions named in
+  line_costs, as it multiplies the memory used.
+  """
+
+  def __init__(self, line_costs: Optional[Collection[str]] = None) -> None:
+    self.profile = Profile()
+    self.line_costs = line_costs
+    # Compressed names of objects, files and functions, each in their own namespace
+    self.names: Dict[str, Dict[str, str]] = {"ob": {}, "fl": {}, "fn": {}}
+    self.object = ""
+    self.file = ""
+    # The file of the current cost lines, changed by inlined code
+    self.current_file = ""
+    self.function: Optional[Function] = None
+    self.position: List[int] = [0]
+    # The index of the line number in positions
+    self.line: Optional[int] = 0
+    self.call_object: Optional[str] = None
+    self.call_file: Optional[str] = None
+    self.call_name: Optional[str] = None
+    # The pending call whose inclusive cost is given by the next cost line
+    self.call: Optional[Call] = None
+    self.call_count = 0
+
+  def expand_name(self, namespace: str, value: str) -> str:
+    """Expand a compressed name, remembering its definition."""
+    if not value.startswith("("):
+      return value
+    end = value.index(")")
+    id = value[1:end]
+    name = value[end + 1:].strip()
+    if name:
+      self.names[namespace][id] = name
+      return name
+    return self.names[namespace][id]
+
+  def parse_positions(self, fields: List[str], update: bool) -> List[int]:
+    position = list(self.position)
+    for i, field in enumerate(fields[:len(position)]):
+      if field == "*":
+        continue
+      elif field[0] == "+":
+        position[i] += int(field[1:], 0)
+      elif field[0] == "-":
+        position[i] -= int(field[1:], 0)
+      else:
+        position[i] = int(field, 0)
+    if update:
+      self.position = position
+    return position
+
+  def parse_cost(self, line: str):
+    fields = line.split()
+    positions = len(self.position)
+    self.parse_positions(fields, update=True)
+    costs = fields[positions:]
+    if self.call is not None:
+      target = self.call.cost
+      self.call.count += self.call_count
+      self.call = None
+    elif self.function is not None:
+      target = self.function.cost
+      if self.function.lines is not None and self.line is not None:
+        key = (self.current_file, self.position[self.line])
+        line_cost = self.function.lines.get(key)
+        if line_cost is None:
+          line_cost = self.function.lines[key] = [0] * len(target)
+        for i, cost in enumerate(costs):
+          line_cost[i] += int(cost)
+    else:
+      return
+    for i, cost in enumerate(costs):
+      target[i] += int(cost)
+
+  def parse_call(self, value: str):
+    if self.function is None or self.call_name is None:
+      raise ValueError("call outside of a function: 'calls={}'".format(value))
+    fields = value.split()
+    self.call_count = int(fields[0])
+    # The target position is relative to the current position, but does not change it
+    self.parse_positions(fields[1:], update=False)
+    object = self.call_object if self.call_object is not None else self.object
+    file = self.call_file if self.call_file is not None else self.current_file
+    callee = self.profile.function((object, file, self.call_name))
+    key = (self.function.index, callee.index)
+    call = self.profile.calls.get(key)
+    if call is None:
+      call = Call(self.function.index, callee.index, len(self.profile.events))
+      self.profile.calls[key] = call
+    self.call = call
+    self.call_object = None
+    self.call_file = None
+
+  def parse_line(self, line: str):
+    line = line.strip()
+    if not line or line[0] == "#":
+      return
+    if line[0] in "0123456789+-*":
+      self.parse_cost(line)
+      return
+
+    separator = line.find("=")
+    if separator == -1 or (":" in line[:separator]):
+      self.parse_header(line)
+      return
+    key, value = line[:separator], line[separator + 1:]
+    if key == "fn":
+      self.current_file = self.file
+      self.function = self.profile.function((self.object, self.file, self.expand_name("fn", value)))
+      if self.line_costs is not None and self.function.lines is None and self.function.name in self.line_costs:
+        self.function.lines = {}
+    elif key == "fl":
+      self.file = self.current_file = self.expand_name("fl", value)
+    elif key in ("fi", "fe"):
+      self.current_file = self.expand_name("fl", value)
+    elif key == "ob":
+      self.object = self.expand_name("ob", value)
+    elif key == "cfn":
+      self.call_name = self.expand_name("fn", value)
+    elif key in ("cfi", "cfl"):
+      self.call_file = self.expand_name("fl", value)
+    elif key == "cob":
+      self.call_object = self.expand_name("ob", value)
+    elif key == "calls":
+      self.parse_call(value)
+    # Jumps are followed by the position of the jump without any cost, which
+    # is parsed as a regular cost line
+
+  def parse_header(self, line: str):
+    key, _, value = line.partition(":")
+    value = value.strip()
+    if key == "positions":
+      self.profile.positions = value.split()
+      self.position = [0] * len(self.profile.positions)
+      self.line = self.profile.positions.index("line") if "line" in self.profile.positions else None
+    elif key == "events":
+      self.profile.events = value.split()
+    elif key in ("totals", "summary"):
+      self.profile.totals = [int(x) for x in value.split()]
+
+
+def parse_profile(lines: Iterable[str], line_costs: Optional[Collection[str]] = None) -> Profile:
+  parser = ProfileParser(line_costs)
+  for line in lines:
+    parser.parse_line(line)
+  return parser.profile
+
+
+def read_profile(path: Path, line_costs: Optional[Collection[str]] = None) -> Profile:
+  """Read a callgrind profile, such as callgrind.out.1234."""
+  with open(path, "rt", errors="replace") as file:
+    return parse_profile(file, line_costs)
@@ -0,0 +1,193 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy
+
+from visualization.columns import ColumnTable, StringColumn, fetch_columns
+from visualization.signature import database_signature
+
+# Only needed for annotations, the database module reads the fact tables from here
+if TYPE_CHECKING:
+  from visualization.database import Database
+
+COLUMNAR_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# The columns describing the benchmark a measurement belongs to, shared by every fact table
+BENCHMARK_COLUMNS: List[Tuple[str, Any]] = [
+  ("environment", str),
+  ("run_index", numpy.int32),
+  ("algorithm_name", str),
+  ("algorithm_parameters", str),
+  ("compiler", str),
+  ("features", str),
+  ("stage", str),
+]
+
+BENCHMARK_SELECT = """
+  environment.name,
+  benchmarkRun.runIndex,
+  algorithm.name,
+  algorithm.parameters,
+  algorithm.compiler,
+  algorithm.features,
+  benchmark.stage
+"""
+
+BENCHMARK_JOINS = """
+  benchmark
+  INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
+  INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
+  INNER JOIN environment ON environment.id = benchmarkRun.environment
+"""
+
+# Denormalized fact tables, as the query selecting them and their columns
+FACT_TABLES: Dict[str, Tuple[str, List[Tuple[str, Any]]]] = {
+  "sequential_iterations": ("""
+    SELECT {}, sequentialBenchmark.averageDuration, sequentialBenchmarkIteration.iteration, sequentialBenchmarkIteration.duration
+    FROM {}
+      INNER JOIN sequentialBenchmark ON sequentialBenchmark.benchmark = benchmark.id
+      INNER JOIN sequentialBenchmarkIteration ON sequentialBenchmarkIteration.sequentialBenchmark = sequentialBenchmark.id
+    """.format(BENCHMARK_SELECT, BENCHMARK_JOINS), BENCHMARK_COLUMNS + [
+    ("average_duration", numpy.float64),
+    ("iteration", numpy.int32),
+    ("duration", numpy.int64),
+  ]),
+  "micro_events": ("""
+    SELECT {}, microBenchmarkMeasurement.region, microBenchmarkEvent.event, microBenchmarkEvent.value
+    FROM {}
+      INNER JOIN microBenchmark ON microBenchmark.benchmark = benchmark.id
+      INNER JOIN microBenchmarkMeasurement ON microBenchmarkMeasurement.microBenchmark = microBenchmark.id
+      INNER JOIN microBenchmarkEvent ON microBenchmarkEvent.microBenchmarkMeasurement = microBenchmarkMeasurement.id
+    """.format(BENCHMARK_SELECT, BENCHMARK_JOINS), BENCHMARK_COLUMNS + [
+    ("region", str),
+    ("event", str),
+    ("value", numpy.int64),
+  ]),
+  "parallel_throughput": ("""
+    SELECT {}, parallelBenchmark.numberOfThreads, parallelBenchmark.throughput
+    FROM {}
+      INNER JOIN parallelBenchmark ON parallelBenchmark.benchmark = benchmark.id
+    """.format(BENCHMARK_SELECT, BENCHMARK_JOINS), BENCHMARK_COLUMNS + [
+    ("number_of_threads", numpy.int32),
+    ("throughput", numpy.float64),
+  ]),
+  "stack_symbols": ("""
+    SELECT {}, stackBenchmarkSymbol.symbol, stackBenchmarkSymbol.size
+    FROM {}
+      INNER JOIN stackBenchmark ON stackBenchmark.benchmark = benchmark.id
+      INNER JOIN stackBenchmarkSymbol ON stackBenchmarkSymbol.stackBenchmark = stackBenchmark.id
+    """.format(BENCHMARK_SELECT, BENCHMARK_JOINS), BENCHMARK_COLUMNS + [
+    ("symbol", str),
+    ("size", numpy.int64),
+  ]),
+  "heap_measurements": ("""
+    SELECT {}, heapBenchmarkMeasurement.peakAllocation, heapBenchmarkMeasurement.trace
+    FROM {}
+      INNER JOIN heapBenchmark ON heapBenchmark.benchmark = benchmark.id
+      INNER JOIN heapBenchmarkMeasurement ON heapBenchmarkMeasurement.heapBenchmark = heapBenchmark.id
+    """.format(BENCHMARK_SELECT, BENCHMARK_JOINS), BENCHMARK_COLUMNS + [
+    ("peak_allocation", numpy.int64),
+    ("trace", str),
+  ]),
+}
+
+
+def export_columnar(database: "Database", output_path: Path, verbose: bool = False):
+  """Export the fact tables of a database as one .npy file per column.
+
+  String columns are dictionary-encoded. Their codes are stored in the .npy file
+  and their distinct values in the manifest.
+  """
+  manifest: Dict[str, Any] = {
+    "version": COLUMNAR_VERSION,
+    "database": database_signature(database.path),
+    "tables": {},
+  }
+  for table_name, (sql, columns) in FACT_TABLES.items():
+    table = fetch_columns(database.cursor(), sql, (), columns)
+    table_path = output_path.joinpath(table_name)
+    table_path.mkdir(parents=True, exist_ok=True)
+    table_manifest: Dict[str, Any] = {"rows": len(table), "columns": {}}
+    for name, column in table.columns.items():
+      column_manifest: Dict[str, Any] = {"file": "{}/{}.npy".format(table_name, name)}
+      if isinstance(column, StringColumn):
+        numpy.save(table_path.joinpath(name + ".npy"), column.codes)
+        column_manifest["values"] = column.values
+      else:
+        numpy.save(table_path.joinpath(name + ".npy"), column)
+      table_manifest["columns"][name] = column_manifest
+    manifest["tables"][table_name] = table_manifest
+    if verbose:
+      print("exported {} rows of {}".format(len(table), table_name))
+
+  # Write the manifest last, so that a partial export is never picked up
+  with open(output_path.joinpath(MANIFEST_NAME), "wt") as file:
+    json.dump(manifest, file)
+
+
+class ColumnarStore:
+  """Fact tables exported by export_columnar, memory-mapped on access."""
+
+  def __init__(self, path: Path) -> None:
+    self.path = path
+    with open(path.joinpath(MANIFEST_NAME), "rt") as file:
+      self.manifest = json.load(file)
+    if self.manifest.get("version") != COLUMNAR_VERSION:
+      raise ValueError("unsupported columnar export version {}".format(self.manifest.get("version")))
+    self.tables: Dict[str, ColumnTable] = {}
+
+  def is_export_of(self, database_path: Path) -> bool:
+    """Whether the store was exported from the current version of a database."""
+    return self.manifest["database"] == database_signature(database_path)
+
+  def table(self, name: str) -> ColumnTable:
+    if name not in self.tables:
+      columns: Dict[str, Any] = {}
+      for column_name, column in self.manifest["tables"][name]["columns"].items():
+        array = numpy.load(self.path.joinpath(column["file"]), mmap_mode="r")
+        if "values" in column:
+          columns[column_name] = StringColumn(array, column["values"])
+        else:
+          columns[column_name] = array
+      self.tables[name] = ColumnTable(columns)
+    return self.tables[name]
+
+  def select(self, name: str, columns: List[str], **filters: Any) -> ColumnTable:
+    """Select the rows of a table whose string columns equal the given values."""
+    table = self.table(name)
+    mask = numpy.ones(len(table), dtype=bool)
+    for column_name, value in filters.items():
+      # Like SQL equality, NULL matches nothing
+      if value is None:
+        mask[:] = False
+        break
+      column = table[column_name]
+      mask &= column.codes == column.code(value)
+    rows = numpy.flatnonzero(mask)
+    selected: Dict[str, Any] = {}
+    for column_name in columns:
+      column = table[column_name]
+      if isinstance(column, StringColumn):
+        selected[column_name] = StringColumn(column.codes[rows], column.values)
+      else:
+        selected[column_name] = column[rows]
+    return ColumnTable(selected)
+
+
+# Stores opened by this process, keyed by path
+columnar_stores: Dict[Path, ColumnarStore] = {}
+
+
+def open_columnar_store(path: Path) -> ColumnarStore:
+  """Open a columnar export, reusing the store already opened by this process."""
+  key = Path(os.path.abspath(path))
+  if key not in columnar_stores:
+    columnar_stores[key] = ColumnarStore(path)
+  return columnar_stores[key]
+
+
+def is_columnar_store(path: Optional[Path]) -> bool:
+  return path is not None and path.joinpath(MANIFEST_NAME).is_file()
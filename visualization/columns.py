@@ -0,0 +1,110 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy
+
+from visualization.query_cache import CachedCursor
+
+# Number of rows fetched from SQLite at a time
+CHUNK_SIZE = 64 * 1024
+
+
+class StringColumn:
+  """A dictionary-encoded column of strings.
+
+  Each distinct string is stored once in values, in the order it first
+  appeared. Rows refer to it by their index in codes.
+  """
+
+  def __init__(self, codes: numpy.ndarray, values: List[Any]) -> None:
+    self.codes = codes
+    self.values = values
+
+  def __len__(self) -> int:
+    return len(self.codes)
+
+  def code(self, value: Any) -> int:
+    """The code of a value, or -1 if the column does not contain it."""
+    try:
+      return self.values.index(value)
+    except ValueError:
+      return -1
+
+  def decode(self) -> numpy.ndarray:
+    return numpy.array(self.values, dtype=object)[self.codes]
+
+
+class ColumnTable:
+  """The result of a query stored as one typed array per column."""
+
+  def __init__(self, columns: Dict[str, Any]) -> None:
+    self.columns = columns
+
+  def __len__(self) -> int:
+    for column in self.columns.values():
+      return len(column)
+    return 0
+
+  def __getitem__(self, name: str) -> Any:
+    return self.columns[name]
+
+
+class ColumnBuilder:
+  """Appends chunks of values to a preallocated array, growing it geometrically."""
+
+  def __init__(self, dtype: Any, capacity: int) -> None:
+    # Strings are stored as codes into values
+    self.encoding: Optional[Dict[Any, int]] = None
+    self.values: List[Any] = []
+    if dtype is str:
+      self.encoding = {}
+      dtype = numpy.int32
+    self.array = numpy.empty(capacity, dtype=dtype)
+    self.length = 0
+
+  def append(self, chunk: Sequence[Any]):
+    end = self.length + len(chunk)
+    if end > len(self.array):
+      self.array.resize(max(end, 2 * len(self.array)), refcheck=False)
+    if self.encoding is not None:
+      chunk = [self.encode(value) for value in chunk]
+    self.array[self.length:end] = chunk
+    self.length = end
+
+  def encode(self, value: Any) -> int:
+    code = self.encoding.get(value)
+    if code is None:
+      code = len(self.values)
+      self.encoding[value] = code
+      self.values.append(value)
+    return code
+
+  def finish(self) -> Any:
+    self.array.resize(self.length, refcheck=False)
+    if self.encoding is not None:
+      return StringColumn(self.array, self.values)
+    return self.array
+
+
+def fetch_columns(cursor: Any, sql: str, parameters: Sequence[Any], columns: Iterable[Tuple[str, Any]],
+                  chunk_size: int = CHUNK_SIZE) -> ColumnTable:
+  """Stream the result of a query into typed columns.
+
+  Columns are given as (name, dtype) in the order they are selected. A dtype of
+  str creates a dictionary-encoded StringColumn. Rows are fetched in chunks, so
+  that the result is never held as Python tuples in its entirety.
+  """
+  # Streamed results are too large to be worth keeping in the query cache
+  if isinstance(cursor, CachedCursor):
+    cursor.execute(sql, parameters, cached=False)
+  else:
+    cursor.execute(sql, parameters)
+
+  columns = list(columns)
+  builders = [ColumnBuilder(dtype, chunk_size) for _, dtype in columns]
+  while True:
+    rows = cursor.fetchmany(chunk_size)
+    if len(rows) == 0:
+      break
+    for builder, chunk in zip(builders, zip(*rows)):
+      builder.append(chunk)
+  return ColumnTable({name: builder.finish() for (name, _), builder in zip(columns, builders)})
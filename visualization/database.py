@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from visualization.query_cache import QueryCache, CachedCursor
+from visualization.aggregates import register_aggregates
+from visualization.facts import attach_database, create_fact_views, facts_path_of, is_fresh
+from visualization.rollups import create_rollup_views
+from visualization.traces import create_trace_views, register_trace_functions
+
+# Number of prepared statements kept per connection
+CACHED_STATEMENTS = 256
+# Size of the page cache per connection in KiB
+CACHE_SIZE = 64 * 1024
+# Number of bytes of the database file to memory-map
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+class QueryStatistics:
+  """Accumulated timing of a single SQL statement."""
+
+  def __init__(self, sql: str) -> None:
+    self.sql = sql
+    self.executions = 0
+    self.rows = 0
+    self.duration = 0.0
+
+
+class TimedCursor:
+  """A cursor that records how long its statements take to execute and fetch."""
+
+  def __init__(self, cursor: sqlite3.Cursor, statistics: Dict[str, QueryStatistics]) -> None:
+    self.cursor = cursor
+    self.statistics = statistics
+    self.current: Optional[QueryStatistics] = None
+
+  def execute(self, sql: str, parameters: Sequence[Any] = ()) -> "TimedCursor":
+    key = " ".join(sql.split())
+    if key not in self.statistics:
+      self.statistics[key] = QueryStatistics(key)
+    self.current = self.statistics[key]
+    start = time.perf_counter()
+    self.cursor.execute(sql, parameters)
+    self.current.duration += time.perf_counter() - start
+    self.current.executions += 1
+    return self
+
+  def record(self, start: float, rows: int):
+    if self.current is not None:
+      self.current.duration += time.perf_counter() - start
+      self.current.rows += rows
+
+  def fetchone(self) -> Optional[Tuple[Any, ...]]:
+    start = time.perf_counter()
+    row = self.cursor.fetchone()
+    self.record(start, 0 if row is None else 1)
+    return row
+
+  def fetchmany(self, size: int = 1) -> List[Tuple[Any, ...]]:
+    start = time.perf_counter()
+    rows = self.cursor.fetchmany(size)
+    self.record(start, len(rows))
+    return rows
+
+  def fetchall(self) -> List[Tuple[Any, ...]]:
+    start = time.perf_counter()
+    rows = self.cursor.fetchall()
+    self.record(start, len(rows))
+    return rows
+
+  def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+    while True:
+      row = self.fetchone()
+      if row is None:
+        return
+      yield row
+
+  @property
+  def description(self) -> Any:
+    return self.cursor.description
+
+  def close(self):
+    self.cursor.close()
+
+
+class Database:
+  """A long-lived, read-only connection to a benchmark database.
+
+  When a fresh sidecar prepared from the database is next to it, the
+  connection reads the fact tables, rollups and trace index from the
+  sidecar and everything else from the database, attached to it.
+  """
+
+  def __init__(self, path: Path, immutable: bool = False) -> None:
+    self.path = path
+    self.immutable = immutable
+    facts_path = facts_path_of(path)
+    self.facts = is_fresh(facts_path, path)
+    if not self.facts and facts_path.is_file():
+      print("warning: sidecar '{}' is out of date, reading from the database. Run prepare to update it".format(facts_path))
+    # Archived databases are never written to, which lets SQLite skip locking
+    # and change detection entirely
+    uri = "file:{}?mode=ro{}".format(facts_path if self.facts else path, "&immutable=1" if immutable else "")
+    self.connection = sqlite3.connect(uri, uri=True, cached_statements=CACHED_STATEMENTS)
+    # Changing where temporary objects are stored drops them, so it must precede the views
+    self.connection.execute("PRAGMA temp_store = MEMORY")
+    if self.facts:
+      attach_database(self.connection, path, immutable)
+    else:
+      create_fact_views(self.connection)
+      create_rollup_views(self.connection)
+      create_trace_views(self.connection)
+    self.connection.execute("PRAGMA query_only = ON")
+    for schema in ["main", "source"] if self.facts else ["main"]:
+      self.connection.execute("PRAGMA {}.cache_size = -{}".format(schema, CACHE_SIZE))
+      self.connection.execute("PRAGMA {}.mmap_size = {}".format(schema, MMAP_SIZE))
+    register_aggregates(self.connection)
+    register_trace_functions(self.connection)
+    self.query_cache = QueryCache()
+    self.statistics: Dict[str, QueryStatistics] = {}
+
+  def cursor(self, cached: bool = True) -> Any:
+    """Create a cursor, optionally serving repeated queries from the query cache."""
+    cursor = TimedCursor(self.connection.cursor(), self.statistics)
+    if cached:
+      return CachedCursor(cursor, self.query_cache)
+    return cursor
+
+  def format_statistics(self, limit: int = 10) -> str:
+    """Format the slowest statements executed on this connection."""
+    statistics = sorted(self.statistics.values(), key=lambda x: x.duration, reverse=True)
+    lines = ["{:>10s} {:>10s} {:>12s}  {}".format("Executions", "Rows", "Duration (s)", "Statement")]
+    for statistic in statistics[:limit]:
+      sql = statistic.sql if len(statistic.sql) <= 80 else statistic.sql[:77] + "..."
+      lines.append("{:>10d} {:>10d} {:>12.3f}  {}".format(statistic.executions, statistic.rows, statistic.duration, sql))
+    lines.append("query cache: {} hits, {} misses".format(self.query_cache.hits, self.query_cache.misses))
+    return "\n".join(lines)
+
+  def close(self):
+    self.connection.close()
+
+
+# Databases opened by this process, keyed by path and mode
+databases: Dict[Tuple[Path, bool], Database] = {}
+databases_pid = os.getpid()
+# Databases inherited from the parent of a forked worker. SQLite connections
+# must not be used across fork, so these are only kept referenced to not close
+# them from the worker
+inherited_databases: List[Database] = []
+
+
+def is_database_file(path: Path) -> bool:
+  with path.open("rb") as file:
+    header = file.read(100)
+  return len(header) == 100 and header[:16] == b"SQLite format 3\x00"
+
+
+def open_database(path: Path, immutable: bool = False) -> Database:
+  """Open a database, reusing the connection already opened by this process."""
+  global databases_pid
+  if databases_pid != os.getpid():
+    inherited_databases.extend(databases.values())
+    databases.clear()
+    databases_pid = os.getpid()
+
+  key = (Path(os.path.abspath(path)), immutable)
+  if key not in databases:
+    databases[key] = Database(path, immutable)
+  return databases[key]
+
+
+def close_databases():
+  """Close all connections opened by this process."""
+  for database in databases.values():
+    database.close()
+  databases.clear()
@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import numpy
+
+from visualization.aggregates import register_aggregates
+from visualization.columnar import FACT_TABLES
+from visualization.rollups import update_rollups
+from visualization.signature import database_signature
+from visualization.traces import register_trace_functions, update_trace_index
+
+FACTS_VERSION = 3
+
+# Columns leading the covering index of every fact table, in order, when the table has them
+INDEX_COLUMNS = ["algorithm_name", "algorithm_parameters", "environment", "stage", "region", "event"]
+
+# The fact tables are exposed under the same names whether they are read from
+# the sidecar or joined from the benchmark database, so that generators can
+# query them without knowing where they come from. In the sidecar, every
+# string column is interned as keys into a dimension_<column> table, shared
+# by the fact tables with that column, and the tables are stored as
+# <name>_facts, with a view of the same name resolving the keys. The
+# rollups of visualization.rollups and the heap traces of
+# visualization.traces are exposed the same way.
+
+
+def facts_path_of(database_path: Path) -> Path:
+  """The sidecar of a database, next to it."""
+  return Path(str(database_path) + ".facts")
+
+
+def fact_columns(columns: List[Tuple[str, Any]]) -> List[str]:
+  return [name for name, _ in columns]
+
+
+def create_fact_views(connection: sqlite3.Connection):
+  """Expose the fact tables of a benchmark database as temporary views joining its tables.
+
+  Must be called before the connection is made query only.
+  """
+  for name, (sql, columns) in FACT_TABLES.items():
+    connection.execute("CREATE TEMP VIEW IF NOT EXISTS {}({}) AS {}".format(name, ", ".join(fact_columns(columns)), sql))
+
+
+def read_facts_signature(connection: sqlite3.Connection) -> Optional[Any]:
+  try:
+    rows = dict(connection.execute("SELECT key, value FROM factsMetadata").fetchall())
+  except sqlite3.Error:
+    return None
+  if rows.get("version") != str(FACTS_VERSION):
+    return None
+  return json.loads(rows.get("database", "null"))
+
+
+def is_fresh(facts_path: Path, database_path: Path) -> bool:
+  """Whether a sidecar exists and was prepared from the current version of a database."""
+  if not facts_path.is_file():
+    return False
+  connection = sqlite3.connect("file:{}?mode=ro".format(facts_path), uri=True)
+  try:
+    return read_facts_signature(connection) == database_signature(database_path)
+  finally:
+    connection.close()
+
+
+def attach_database(connection: sqlite3.Connection, database_path: Path, immutable: bool = False):
+  """Attach the benchmark database a sidecar was prepared from, for the queries the sidecar cannot answer."""
+  uri = "file:{}?mode=ro{}".format(os.path.abspath(database_path), "&immutable=1" if immutable else "")
+  connection.execute("ATTACH DATABASE ? AS source", (uri,))
+
+
+def can_update(facts_path: Path, database_path: Path) -> bool:
+  """Whether a sidecar can be brought up to date by adding the benchmark runs it lacks.
+
+  Runs are only ever added to a database, so a sidecar holding a run that is
+  no longer in the database was prepared from another database.
+  """
+  if not facts_path.is_file():
+    return False
+  connection = sqlite3.connect("file:{}?mode=ro".format(facts_path), uri=True)
+  try:
+    if read_facts_signature(connection) is None:
+      return False
+    attach_database(connection, database_path)
+    removed = connection.execute("SELECT COUNT(*) FROM main.preparedRuns WHERE id NOT IN (SELECT id FROM source.benchmarkRun)").fetchone()[0]
+    return removed == 0
+  except sqlite3.Error:
+    return False
+  finally:
+    connection.close()
+
+
+def prepare_facts(database_path: Path, facts_path: Path, verbose: bool = False, rebuild: bool = False) -> int:
+  """Flatten the fact tables of a database into a sidecar database, interning their strings, and roll them up.
+
+  A sidecar that is out of date is updated in a single transaction, adding
+  the facts of the benchmark runs it lacks and merging them into the groups
+  of the rollups they belong to. Otherwise, or when rebuilding, the sidecar is
+  written to a temporary file first and moved into place once complete, so
+  that a partial sidecar is never picked up. Returns the number of runs added.
+  """
+  # Taken before reading, so that changes made while preparing mark the sidecar stale
+  signature = database_signature(database_path)
+  update = not rebuild and can_update(facts_path, database_path)
+  temporary_path = facts_path.with_name(facts_path.name + ".tmp")
+  if not update and temporary_path.exists():
+    temporary_path.unlink()
+  connection = sqlite3.connect(str(facts_path if update else temporary_path), isolation_level=None)
+  try:
+    if not update:
+      connection.execute("PRAGMA journal_mode = OFF")
+      connection.execute("PRAGMA synchronous = OFF")
+    # Rollups bin their values using HISTOGRAM_BIN, the trace index holds NORMALIZE_TRACE of the traces
+    register_aggregates(connection)
+    register_trace_functions(connection)
+    attach_database(connection, database_path)
+    connection.execute("BEGIN")
+    connection.execute("CREATE TABLE IF NOT EXISTS preparedRuns (id INTEGER PRIMARY KEY)")
+    connection.execute("CREATE TEMP TABLE new_runs AS SELECT id FROM source.benchmarkRun WHERE id NOT IN (SELECT id FROM main.preparedRuns)")
+    runs = connection.execute("SELECT COUNT(*) FROM new_runs").fetchone()[0]
+    where = "benchmark.benchmarkRun IN (SELECT id FROM new_runs)"
+
+    for name, (sql, columns) in FACT_TABLES.items():
+      names = fact_columns(columns)
+      strings = [column for column, kind in columns if kind is str]
+      connection.execute("CREATE TEMP TABLE staging ({})".format(", ".join(names)))
+      # None of the fact queries has a condition of its own
+      connection.execute("INSERT INTO staging {} WHERE {}".format(sql, where))
+      for column in strings:
+        # Small dimensions keep scanning the values of an unfiltered column cheap
+        connection.execute("CREATE TABLE IF NOT EXISTS dimension_{} (id INTEGER PRIMARY KEY, value TEXT UNIQUE)".format(column))
+        # NULL is interned as well, so that the views can use inner joins
+        connection.execute("INSERT OR IGNORE INTO dimension_{} VALUES (0, NULL)".format(column))
+        connection.execute("INSERT OR IGNORE INTO dimension_{0} (value) SELECT DISTINCT {0} FROM staging WHERE {0} IS NOT NULL".format(column))
+
+      definitions = ["{} {}".format(column, "INTEGER" if kind is str or numpy.dtype(kind).kind in "iu" else "REAL") for column, kind in columns]
+      connection.execute("CREATE TABLE IF NOT EXISTS {}_facts (id INTEGER PRIMARY KEY, {})".format(name, ", ".join(definitions)))
+      selected = ["(SELECT id FROM dimension_{0} WHERE value IS staging.{0})".format(column) if column in strings else column for column in names]
+      connection.execute("INSERT INTO {}_facts ({}) SELECT {} FROM staging ORDER BY rowid".format(name, ", ".join(names), ", ".join(selected)))
+      connection.execute("DROP TABLE staging")
+
+      # Covering every column lets queries filtering on the leading columns skip the table entirely.
+      # The id precedes the numeric columns to keep the rows of a group in the order of the
+      # database, as aggregates such as STATISTICS depend on the order of their values
+      leading = [column for column in INDEX_COLUMNS if column in names]
+      ordered = leading + [column for column in strings if column not in leading] + ["id"] + [column for column in names if column not in strings]
+      connection.execute("CREATE INDEX IF NOT EXISTS {0}_facts_covering ON {0}_facts ({1})".format(name, ", ".join(ordered)))
+
+      resolved = ["{0}.value AS {0}".format(column) if column in strings else "facts.{0} AS {0}".format(column) for column in names]
+      joins = ["INNER JOIN dimension_{0} AS {0} ON {0}.id = facts.{0}".format(column) for column in strings]
+      connection.execute("CREATE VIEW IF NOT EXISTS {0} AS SELECT {1} FROM {0}_facts AS facts {2}".format(name, ", ".join(resolved), " ".join(joins)))
+      if verbose:
+        rows = connection.execute("SELECT COUNT(*) FROM {}_facts".format(name)).fetchone()[0]
+        print("prepared {} rows of {}".format(rows, name))
+
+    update_rollups(connection, where)
+    update_trace_index(connection)
+    connection.execute("INSERT INTO preparedRuns SELECT id FROM new_runs")
+    connection.execute("DROP TABLE new_runs")
+    connection.execute("CREATE TABLE IF NOT EXISTS factsMetadata (key TEXT PRIMARY KEY, value TEXT)")
+    connection.executemany("INSERT OR REPLACE INTO factsMetadata VALUES (?, ?)", [
+      ("version", str(FACTS_VERSION)),
+      ("database", json.dumps(signature)),
+    ])
+    connection.execute("COMMIT")
+    if not update:
+      connection.execute("ANALYZE main")
+  except BaseException:
+    connection.close()
+    if not update:
+      temporary_path.unlink()
+    raise
+  connection.close()
+  if not update:
+    os.replace(temporary_path, facts_path)
+  if verbose:
+    print("{} {} runs".format("added" if update else "prepared", runs))
+  return runs
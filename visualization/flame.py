@@ -0,0 +1,139 @@
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+# Only needed for annotations, the axes are created by the graphs
+if TYPE_CHECKING:
+  from matplotlib.axes import Axes
+
+# Approximate width of a character of the labels, relative to their font size
+CHARACTER_WIDTH = 0.6
+
+
+class FrameTree:
+  """A prefix tree of call paths, with their frames interned as integer ids.
+
+  Node 0 is the root, the empty path. The nodes are held as arrays of the id
+  of their frame, their parent and the array of their children, along with
+  the total of the values added on paths through them and the largest of
+  those values, their peak.
+  """
+
+  def __init__(self) -> None:
+    self.frames: List[str] = []
+    self.frame_ids: Dict[str, int] = {}
+    self.node_frames: List[int] = [-1]
+    self.parents: List[int] = [-1]
+    self.children: List[List[int]] = [[]]
+    self.totals: List[float] = [0]
+    self.peaks: List[float] = [0]
+
+  def intern(self, frame: str) -> int:
+    frame_id = self.frame_ids.get(frame)
+    if frame_id is None:
+      frame_id = len(self.frames)
+      self.frame_ids[frame] = frame_id
+      self.frames.append(frame)
+    return frame_id
+
+  def child(self, node: int, frame_id: int) -> int:
+    """The child of a node for a frame, added if there is none."""
+    # Call trees are narrow, so scanning the children beats hashing them
+    for child in self.children[node]:
+      if self.node_frames[child] == frame_id:
+        return child
+    child = len(self.node_frames)
+    self.node_frames.append(frame_id)
+    self.parents.append(node)
+    self.children.append([])
+    self.totals.append(0)
+    self.peaks.append(0)
+    self.children[node].append(child)
+    return child
+
+  def add(self, path: Iterable[str], value: float) -> int:
+    """Add a value to the total and peak of every node on a path in a single pass along it, returning its last node."""
+    node = 0
+    self.totals[0] += value
+    self.peaks[0] = max(self.peaks[0], value)
+    for frame in path:
+      node = self.child(node, self.intern(frame))
+      self.totals[node] += value
+      self.peaks[node] = max(self.peaks[node], value)
+    return node
+
+  def name(self, node: int) -> str:
+    return "all" if node == 0 else self.frames[self.node_frames[node]]
+
+  def path(self, node: int) -> List[str]:
+    path = []
+    while node > 0:
+      path.append(self.name(node))
+      node = self.parents[node]
+    return path[::-1]
+
+  def layout(self, minimum_fraction: float = 0.0) -> List[Tuple[int, float, int]]:
+    """Place every node as wide as its total, after its preceding siblings, as (node, left, depth).
+
+    Siblings are ordered by name, as in flame graphs. Nodes narrower than a
+    fraction of the root are left out, along with their children.
+    """
+    minimum = self.totals[0] * minimum_fraction
+    placed = []
+    stack = [(0, 0.0, 0)]
+    while len(stack) > 0:
+      node, left, depth = stack.pop()
+      if self.totals[node] <= 0 or self.totals[node] < minimum:
+        continue
+      placed.append((node, left, depth))
+      children = sorted(self.children[node], key=self.name)
+      lefts = []
+      for child in children:
+        lefts.append(left)
+        left += self.totals[child]
+      stack.extend(reversed(list(zip(children, lefts, [depth + 1] * len(children)))))
+    return placed
+
+
+def frame_color(name: str) -> Tuple[float, float, float]:
+  """A warm color, stable for a frame across graphs."""
+  digest = zlib.crc32(name.encode())
+  return (0.8 + 0.2 * (digest & 0xff) / 255, 0.3 + 0.5 * ((digest >> 8) & 0xff) / 255, 0.2 * ((digest >> 16) & 0xff) / 255)
+
+
+def shade_color(shade: float) -> Tuple[float, float, float]:
+  """A color from pale yellow at 0 to red at 1."""
+  shade = min(1.0, max(0.0, shade))
+  return (1.0, 0.95 - 0.8 * shade, 0.6 - 0.6 * shade)
+
+
+def draw_flame_graph(axes: "Axes", tree: FrameTree, shades: Optional[List[float]] = None,
+                     minimum_fraction: float = 0.001, font_size: float = 6, icicle: bool = False):
+  """Draw a tree as a flame graph, with the nodes on top of their parents, or below them as an icicle chart.
+
+  The nodes are colored by their shade from 0 to 1 if given, and by a hash of
+  their frame otherwise. Labels are cut to the width of their node.
+  """
+  placed = tree.layout(minimum_fraction)
+  total = tree.totals[0]
+  height = max([depth for _, _, depth in placed], default=0) + 1
+  colors: List[Any] = [frame_color(tree.name(node)) if shades is None else shade_color(shades[node]) for node, _, _ in placed]
+  axes.bar([left for _, left, _ in placed], 1.0, width=[tree.totals[node] for node, _, _ in placed],
+           bottom=[depth for _, _, depth in placed], align="edge", color=colors, edgecolor="white", linewidth=0.3)
+
+  # Characters fitting across the whole graph
+  characters = axes.figure.get_figwidth() * axes.get_position().width * 72 / (font_size * CHARACTER_WIDTH)
+  for node, left, depth in placed:
+    fitting = int(characters * tree.totals[node] / total) - 1 if total > 0 else 0
+    name = tree.name(node)
+    if fitting < 3:
+      continue
+    label = name if len(name) <= fitting else name[:fitting - 2] + ".."
+    axes.text(left + total * 0.002, depth + 0.5, label, fontsize=font_size, va="center", ha="left", clip_on=True)
+
+  axes.set_xlim(0, max(total, 1))
+  axes.set_ylim(0, height)
+  if icicle:
+    axes.invert_yaxis()
+  axes.set_yticks([])
+  for side in ["left", "right", "top"]:
+    axes.spines[side].set_visible(False)
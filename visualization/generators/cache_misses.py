@@ -1,19 +1,12 @@
 import sqlite3
 from argparse import ArgumentParser, Namespace
-from typing import Any, List, Dict
-from statistics import NormalDist
-
-import numpy
+from typing import Any, List, Dict, Optional
 
 from visualization.table import Table
+from visualization.batch import partition_by_inputs
+from visualization.aggregates import decode_statistics
 
 
-def calculate_confidence_interval(data, confidence=0.95):
-  dist = NormalDist.from_samples(data)
-  z = NormalDist().inv_cdf((1 + confidence) / 2.)
-  h = dist.stdev * z / ((len(data) - 1) ** .5)
-  return dist.mean - h, dist.mean + h
-
 class CacheMissesTable(Table):
   def __init__(self, options: Namespace) -> None:
     super().__init__(options)
@@ -33,25 +26,19 @@ class CacheMissesTable(Table):
   def fetch_all_inputs(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
     cursor.execute("""
     SELECT
-      algorithm.name,
-      algorithm.parameters,
-      microBenchmarkMeasurement.region
+      algorithm_name,
+      algorithm_parameters,
+      region
     FROM
-      benchmark
-      INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-      INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-      INNER JOIN environment ON environment.id = benchmarkRun.environment
-      INNER JOIN microBenchmark ON microBenchmark.benchmark = benchmark.id
-      INNER JOIN microBenchmarkMeasurement ON microBenchmarkMeasurement.microBenchmark = microBenchmark.id
-      INNER JOIN microBenchmarkEvent ON microBenchmarkEvent.microBenchmarkMeasurement = microBenchmarkMeasurement.id
+      micro_event_rollups
     WHERE
-      microBenchmarkMeasurement.region IN ("crypto_kem_keypair", "crypto_kem_enc", "crypto_kem_dec", "crypto_dh_keypair", "crpyto_dh_enc")
-      AND microBenchmarkEvent.event = "cache-misses"
-      AND microBenchmarkEvent.value >= 0
+      region IN ("crypto_kem_keypair", "crypto_kem_enc", "crypto_kem_dec", "crypto_dh_keypair", "crpyto_dh_enc")
+      AND event = "cache-misses"
+      AND maximum >= 0
     GROUP BY
-      algorithm.name,
-      algorithm.parameters,
-      microBenchmarkMeasurement.region
+      algorithm_name,
+      algorithm_parameters,
+      region
     """)
     keys = ["algorithm_name", "algorithm_parameters", "region"]
     rows = cursor.fetchall()
@@ -60,60 +47,71 @@ class CacheMissesTable(Table):
         inputs.append({keys[i]: value for i, value in enumerate(row)})
     return inputs
 
+  @staticmethod
+  def fetch_all_data(cursor: sqlite3.Cursor, inputs: List[Dict[str, Any]]) -> Optional[List[Any]]:
+    cursor.execute("""
+      SELECT
+        algorithm_name,
+        algorithm_parameters,
+        region,
+        environment,
+        compiler,
+        features,
+        ROLLUP_STATISTICS(SUM(count), TOTAL(sum), TOTAL(sum_of_squares), MIN(minimum), MAX(maximum))
+      FROM
+        micro_event_rollups
+      WHERE
+        region IN ("crypto_kem_keypair", "crypto_kem_enc", "crypto_kem_dec", "crypto_dh_keypair", "crpyto_dh_enc")
+        AND event = "cache-misses"
+        AND event >= 0
+      GROUP BY
+        algorithm_name,
+        algorithm_parameters,
+        region,
+        environment,
+        compiler,
+        features
+      """)
+    return partition_by_inputs(cursor.fetchall(), inputs, ["algorithm_name", "algorithm_parameters", "region"])
+
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     parameters = (self.options.algorithm_name, self.options.algorithm_parameters,
                   self.options.region)
     cursor.execute("""
       SELECT
-        environment.name,
-        algorithm.compiler,
-        algorithm.features,
-        microBenchmarkEvent.value
+        environment,
+        compiler,
+        features,
+        ROLLUP_STATISTICS(SUM(count), TOTAL(sum), TOTAL(sum_of_squares), MIN(minimum), MAX(maximum))
       FROM
-        benchmark
-        INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-        INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-        INNER JOIN environment ON environment.id = benchmarkRun.environment
-        INNER JOIN microBenchmark ON microBenchmark.benchmark = benchmark.id
-        INNER JOIN microBenchmarkMeasurement ON microBenchmarkMeasurement.microBenchmark = microBenchmark.id
-        INNER JOIN microBenchmarkEvent ON microBenchmarkEvent.microBenchmarkMeasurement = microBenchmarkMeasurement.id
+        micro_event_rollups
       WHERE
-        algorithm.name = ?
-        AND algorithm.parameters = ?
-        AND microBenchmarkMeasurement.region = ?
-        AND microBenchmarkEvent.event = "cache-misses"
-        AND microBenchmarkEvent.event >= 0
+        algorithm_name = ?
+        AND algorithm_parameters = ?
+        AND region = ?
+        AND event = "cache-misses"
+        AND event >= 0
+      GROUP BY
+        environment,
+        compiler,
+        features
       """, parameters)
     return cursor.fetchall()
 
   def generate(self, data: Any) -> str:
-    # [("Modern Workstation", "gcc", "avx2-optimized", 3456789)]
-    series: Dict[str, List[float]] = {}
-    for row in data:
-      label = ",".join(row[0:3])
-      if label not in series:
-        series[label] = []
-      series[label].append(row[3])
-    values = list(series.values())
-    values.sort(key=lambda x: numpy.mean(x), reverse=True)
-    keys = list(series.keys())
-    keys.sort(key=lambda x: numpy.mean(series[x]), reverse=True)
+    # [("Modern Workstation", "gcc", "avx2-optimized", '{"count": 1000, "mean": 3456789.0, ...}')]
+    groups = [(row[0], row[1], row[2], decode_statistics(row[3])) for row in data]
+    groups.sort(key=lambda x: x[3]["mean"], reverse=True)
     rows = []
-    for i in range(len(keys)):
-      key = keys[i]
-      value = values[i]
-      standard_deviation = numpy.std(value)
-      average = numpy.mean(value)
-      confidence_interval_lower, confidence_interval_upper = calculate_confidence_interval(value)
-      environment, compiler, features = key.split(",")
+    for environment, compiler, features, statistics in groups:
       rows.append([
         environment,
         compiler,
         features,
-        str(int(round(average))),
-        str(int(round(standard_deviation))),
-        str(int(round(confidence_interval_lower))),
-        str(int(round(confidence_interval_upper)))
+        str(int(round(statistics["mean"]))),
+        str(int(round(statistics["standard_deviation"]))),
+        str(int(round(statistics["confidence_interval_lower"]))),
+        str(int(round(statistics["confidence_interval_upper"])))
       ])
     return """
     \\begin{{table}}[H]
@@ -1,14 +1,17 @@
 import sqlite3
 import random
 from argparse import ArgumentParser, Namespace
-from typing import Any
+from typing import Any, TYPE_CHECKING
 
-from matplotlib import pyplot
 import numpy
 
 from visualization.graph import Graph
 from visualization.table import Table
 
+# Only needed for annotations, to not load matplotlib for tables
+if TYPE_CHECKING:
+  from matplotlib.figure import Figure
+
 
 class ExampleGraph(Graph):
   def __init__(self, options: Namespace) -> None:
@@ -24,9 +27,10 @@ class ExampleGraph(Graph):
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     return numpy.random.rand(self.options.numbers)
 
-  def generate(self, plot: pyplot, data: Any) -> None:
-    plot.plot(data)
-    plot.ylabel("Some numbers")
+  def generate(self, figure: "Figure", data: Any) -> None:
+    axes = figure.subplots()
+    axes.plot(data)
+    axes.set_ylabel("Some numbers")
 
 
 class ExampleTable(Table):
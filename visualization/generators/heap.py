@@ -1,12 +1,16 @@
 import sqlite3
-import re
 from argparse import ArgumentParser, Namespace
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Tuple, TYPE_CHECKING
 
-import numpy
 from visualization.table import Table
+from visualization.graph import Graph
+from visualization.batch import partition_by_inputs
+from visualization.flame import FrameTree, draw_flame_graph
+from visualization.traces import normalize_trace
 
-address_regex = re.compile(r"0x[0-9abcdefABCDEF]+;?")
+# Only needed for annotations, to not load matplotlib for tables
+if TYPE_CHECKING:
+  from matplotlib.figure import Figure
 
 class HeapAllocationTable(Table):
   def __init__(self, options: Namespace) -> None:
@@ -21,52 +25,48 @@ class HeapAllocationTable(Table):
     parser.add_argument("--algorithm-parameters",
                         type=str, default="", help="The parameters of the algorithm to include")
     parser.add_argument("--trace", required=True,
-                        type=str, help="Part of a trace to search for")
+                        type=str, help="Pattern to search the traces for, without their addresses, such as %%perform_benchmark%%")
 
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     parameters = (self.options.algorithm_name, self.options.algorithm_parameters, self.options.trace)
+    # The pattern is matched against the normalized traces, which heap_traces indexes
     cursor.execute("""
     SELECT
-      environment.name,
-      algorithm.parameters,
-      algorithm.features,
-      AVG(heapBenchmarkMeasurement.peakAllocation),
-      heapBenchmarkMeasurement.trace
+      environment,
+      algorithm_parameters,
+      features,
+      AVG(peak_allocation),
+      trace
     FROM
-      benchmark
-      INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-      INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-      INNER JOIN heapBenchmark ON heapBenchmark.benchmark = benchmark.id
-      INNER JOIN heapBenchmarkMeasurement ON heapBenchmarkMeasurement.heapBenchmark = heapBenchmark.id
-      INNER JOIN environment ON environment.id = benchmarkRun.environment
+      heap_measurements
     WHERE
-      algorithm.name = ?
-      AND algorithm.parameters = ?
-      AND heapBenchmarkMeasurement.trace LIKE ?
-      AND heapBenchmarkMeasurement.peakAllocation > 0
+      algorithm_name = ?
+      AND algorithm_parameters = ?
+      AND trace IN (SELECT raw FROM heap_traces WHERE trace LIKE ?)
+      AND peak_allocation > 0
     GROUP BY
-      algorithm.id,
-      environment.id,
-      heapBenchmarkMeasurement.trace
+      compiler,
+      features,
+      environment,
+      trace
     ORDER BY
-      environment.name,
-      heapBenchmarkMeasurement.peakAllocation DESC
+      environment,
+      peak_allocation DESC
       """, parameters)
     return cursor.fetchall()
 
   def generate(self, data: Any) -> str:
     # [('Cloud Provider 1', '', 'plain-optimized', 9024.0, 'main;benchmark_sequential;perform_benchmark;get_global_state;crypto_dh_keypair;0x7fc56d704301;BN_mod_exp_mont_consttime')]
-    allocations = {}
-    for row in data:
-      row = list(row)
-      trace = address_regex.sub("", row[4])
-      label = ",".join(row[0:3] + [trace])
-      allocations[label] = row[3]
+    # Traces differing only in their addresses are the same path, whose last row wins
+    allocations: Dict[Tuple[str, str, str, str], float] = {}
+    normalized: Dict[str, str] = {}
+    for environment, parameters, features, allocation, trace in data:
+      if trace not in normalized:
+        normalized[trace] = normalize_trace(trace)
+      allocations[(environment, parameters, features, normalized[trace])] = allocation
     rows = []
-    for key, value in allocations.items():
-      environment, parameters, features, stack = key.split(",")
-      allocation = value
-      rows.append([environment, parameters, features, str(allocation), stack.replace(";", " ")])
+    for (environment, parameters, features, trace), allocation in allocations.items():
+      rows.append([environment, parameters, features, str(allocation), trace.replace(";", " ")])
     rows.sort(key=lambda x: float(x[3]), reverse=True)
 
     return """
@@ -82,3 +82,113 @@ class HeapAllocationTable(Table):
         \\end{{tabularx}}
     \\end{{table}}
     """.format(self.options.algorithm_name, self.options.trace.replace("%", ""), "\\\\\n            ".join([" & ".join(map(lambda x: x.rjust(20, " "), columns)) for columns in rows])).replace("_", "\\_")
+
+
+class HeapFlameGraph(Graph):
+  figure_options = {"layout": "tight", "figsize": (12, 5)}
+
+  def __init__(self, options: Namespace) -> None:
+    super().__init__(options)
+    self.name = "Heap Flame Graph"
+    self.description = "Flame graph of the heap allocations per call path, colored by their peak"
+
+  @staticmethod
+  def populate_argument_parser(parser: ArgumentParser):
+    parser.add_argument("--algorithm-name", required=True,
+                        type=str, help="The name of the algorithm to plot")
+    parser.add_argument("--algorithm-parameters", default="", type=str,
+                        help="The parameters of the algorithm to plot. Leave empty if there are none")
+    parser.add_argument("--environment", required=True, type=str,
+                        help="The environment to use")
+    parser.add_argument("--compiler", required=True, type=str,
+                        help="The compiler of the variant to plot")
+    parser.add_argument("--features", required=True, type=str,
+                        help="The features of the variant to plot, such as ref or avx2")
+
+  @staticmethod
+  def fetch_all_inputs(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    cursor.execute("""
+    SELECT
+      algorithm_name,
+      algorithm_parameters,
+      environment,
+      compiler,
+      features
+    FROM
+      heap_measurements
+    WHERE
+      peak_allocation > 0
+    GROUP BY
+      algorithm_name,
+      algorithm_parameters,
+      environment,
+      compiler,
+      features
+    """)
+    keys = ["algorithm_name", "algorithm_parameters", "environment", "compiler", "features"]
+    rows = cursor.fetchall()
+    inputs = []
+    for row in rows:
+        inputs.append({keys[i]: value for i, value in enumerate(row)})
+    return inputs
+
+  @staticmethod
+  def fetch_all_data(cursor: sqlite3.Cursor, inputs: List[Dict[str, Any]]) -> List[Any]:
+    cursor.execute("""
+      SELECT
+        algorithm_name,
+        algorithm_parameters,
+        environment,
+        compiler,
+        features,
+        trace,
+        AVG(peak_allocation)
+      FROM
+        heap_measurements
+      WHERE
+        peak_allocation > 0
+      GROUP BY
+        algorithm_name,
+        algorithm_parameters,
+        environment,
+        compiler,
+        features,
+        trace
+      """)
+    return partition_by_inputs(cursor.fetchall(), inputs, ["algorithm_name", "algorithm_parameters", "environment", "compiler", "features"])
+
+  def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
+    parameters = (self.options.algorithm_name, self.options.algorithm_parameters, self.options.environment,
+                  self.options.compiler, self.options.features)
+    cursor.execute("""
+      SELECT
+        trace,
+        AVG(peak_allocation)
+      FROM
+        heap_measurements
+      WHERE
+        algorithm_name = ?
+        AND algorithm_parameters = ?
+        AND environment = ?
+        AND compiler = ?
+        AND features = ?
+        AND peak_allocation > 0
+      GROUP BY
+        trace
+      """, parameters)
+    return cursor.fetchall()
+
+  def generate(self, figure: "Figure", data: Any) -> None:
+    # [('main;benchmark_sequential;perform_benchmark;crypto_kem_keypair;0x7fc56d704301;poly_Rq_mul', 4058.0)]
+    # The width of a path is the sum of the average peaks of the allocations below it,
+    # its color the largest of them relative to that of the graph
+    tree = FrameTree()
+    for trace, allocation in data:
+      tree.add([frame for frame in normalize_trace(trace).split(";") if frame != ""], allocation)
+    shades = [peak / tree.peaks[0] if tree.peaks[0] > 0 else 0 for peak in tree.peaks]
+
+    axes = figure.subplots()
+    draw_flame_graph(axes, tree, shades)
+    axes.set_title("{} {} ({} {}) in {}".format(self.options.algorithm_name, self.options.algorithm_parameters,
+                                                self.options.compiler, self.options.features, self.options.environment), fontsize=8)
+    axes.set_xlabel("Sum of peak allocations (bytes)")
@@ -1,29 +1,16 @@
 import sqlite3
-import matplotlib
 from argparse import ArgumentParser, Namespace
 from typing import Any, Dict, List
-from statistics import NormalDist
+from matplotlib.figure import Figure
 from matplotlib.lines import Line2D
-from matplotlib import pyplot
 import numpy
 import pandas
 
 from visualization.graph import Graph
+from visualization.stats import group_statistics
 
 
-def calculate_confidence_interval(data, confidence=0.95):
-    dist = NormalDist.from_samples(data)
-    z = NormalDist().inv_cdf((1 + confidence) / 2.)
-    h = dist.stdev * z / ((len(data) - 1) ** .5)
-    return dist.mean - h, dist.mean + h
-
-
-def plot_clustered_stacked(plot, dataframes: Dict[str, Any]):
-    matplotlib.rcParams.update({'figure.autolayout': True})
-    matplotlib.rcParams['xtick.labelsize'] = 8
-    matplotlib.rcParams['ytick.labelsize'] = 8
-
-
+def plot_clustered_stacked(figure: Figure, dataframes: Dict[str, Any]):
     colors_dict = {"gcc,ref": "#e6194B",
                    "gcc,ref-optimized": "#3cb44b",
                    "gcc,avx2": "#4363d8",
@@ -36,7 +23,7 @@ def plot_clustered_stacked(plot, dataframes: Dict[str, Any]):
     for key in dataframes:
         width_ratios.append(len(dataframes[key].index) * len(dataframes[key].columns))
 
-    figure, axes_list = plot.subplots(2, number_of_dataframes, gridspec_kw={'width_ratios': width_ratios})
+    axes_list = figure.subplots(2, number_of_dataframes, gridspec_kw={'width_ratios': width_ratios})
     figure_width, figure_height = figure.get_size_inches()
     figure.set_size_inches(figure_width * 1.5, figure_height)
 
@@ -64,6 +51,10 @@ def plot_clustered_stacked(plot, dataframes: Dict[str, Any]):
         axes_list[1][i].spines.top.set_visible(False)
         axes_list[1][i].xaxis.tick_bottom()
 
+        for axes in [axes_list[0][i], axes_list[1][i]]:
+            axes.tick_params(labelsize=8)
+            axes.yaxis.get_offset_text().set_fontsize(8)
+
     figure.suptitle("", fontsize=13)
     custom_lines = [Line2D([0], [0], color=color, lw=4) for color in colors_dict.values()]
     figure.legend(custom_lines, [label.replace(",", " ") for label in colors_dict.keys()], bbox_to_anchor=(.5, 1.02),
@@ -73,6 +64,8 @@ def plot_clustered_stacked(plot, dataframes: Dict[str, Any]):
 
 
 class MicroGraph(Graph):
+    figure_options = {"layout": "tight"}
+
     def __init__(self, options: Namespace) -> None:
         super().__init__(options)
         self.name = "Micro Graph"
@@ -151,13 +144,11 @@ class MicroGraph(Graph):
       """, parameters)
         return cursor.fetchall()
 
-    def generate(self, plot: pyplot, data: Any) -> None:
+    def generate(self, figure: Figure, data: Any) -> None:
         # [("clang", "avx2-optimized", "keypair", "randombytes", 37295)]
-        # randombytes: keypair: clang,avx2-optimized: [37295]
-        series: Dict[str, Dict[str, Dict[str, List[int]]]] = {}
-        stage_names = set()
-        region_names = set()
-        group_names = set()
+        region_names: Dict[str, None] = {}
+        labels = []
+        values = []
         for row in data:
             compiler, features, stage, region, value = row
             if region == "syndrome_asm":
@@ -165,49 +156,26 @@ class MicroGraph(Graph):
             if stage == "encrypt" and region == "gen_e" and compiler == "clang":
                 print(row)
 
-            group = ",".join([compiler, features])
-
-            region_names.add(region)
-            if region not in series:
-                series[region] = {}
+            # Regions are plotted in the order they first appear
+            region_names[region] = None
+            labels.append((region, stage, ",".join([compiler, features])))
+            values.append(value)
 
-            stage_names.add(stage)
-            if stage not in series[region]:
-                series[region][stage] = {}
-
-            group_names.add(group)
-            if group not in series[region][stage]:
-                series[region][stage][group] = []
-            series[region][stage][group].append(value)
+        statistics = group_statistics(labels, values, quantiles=())
 
         sort_order = ["gcc,ref", "gcc,ref-optimized", "gcc,avx2", "gcc,avx2-optimized", "clang,ref-optimized",
                       "clang,avx2-optimized"]
-        stage_names = sorted(list(stage_names))
-        group_names = sorted(list(group_names), key=lambda x: sort_order.index(x))
-
-        # Filter 95% CI
-        # for region, stages in series.items():
-        #     for stage, groups in stages.items():
-        #         for group, values in groups.items():
-        #             lower, upper = calculate_confidence_interval(values)
-        #             series[region][stage][group] = [x for x in values if (x >= lower and x <= upper)]
+        stage_names = sorted(set(str(label[1]) for label in statistics.labels))
+        group_names = sorted(set(str(label[2]) for label in statistics.labels), key=lambda x: sort_order.index(x))
 
-        # keypair = [[] for _ in range(len(region_names))]
-        # encrypt = [[] for _ in range(len(region_names))]
-        # decrypt = [[] for _ in range(len(region_names))]
+        # randombytes: [[keypair averages per group], [encrypt averages per group], ...]
+        averages = {region: numpy.zeros(shape=(len(stage_names), len(group_names))) for region in region_names}
+        for (region, stage, group), average in zip(statistics.labels, statistics.mean):
+            averages[str(region)][stage_names.index(stage), group_names.index(group)] = average
 
         region_dict = {}
-        for region, stages in series.items():
-            temp = [[] for _ in range(len(stage_names))]
-
-            for stage, groups in stages.items():
-                g = numpy.zeros(shape=len(group_names))
-                for group, values in groups.items():
-                    if len(values) != 0:
-                        average = numpy.mean(values)
-                        g[group_names.index(group)] = average
-                temp[stage_names.index(stage)] = g
-            region_dict[region] = pandas.DataFrame(temp, index=stage_names, columns=group_names)\
+        for region in region_names:
+            region_dict[region] = pandas.DataFrame(averages[region], index=stage_names, columns=group_names)\
                 .replace(0, numpy.nan).dropna(how='all').dropna(axis=1, how="all")
 
-        plot_clustered_stacked(plot, region_dict)
+        plot_clustered_stacked(figure, region_dict)
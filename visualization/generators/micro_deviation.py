@@ -1,20 +1,16 @@
 import sqlite3
 from argparse import ArgumentParser, Namespace
-from typing import Any, List, Dict
-from statistics import NormalDist
-
-import numpy
-from matplotlib import pyplot
+from typing import Any, List, Dict, Optional, TYPE_CHECKING
 
 from visualization.graph import Graph
 from visualization.table import Table
+from visualization.batch import partition_by_inputs
+from visualization.aggregates import decode_statistics
+from visualization.stats import group_statistics
 
-
-def calculate_confidence_interval(data, confidence=0.95):
-  dist = NormalDist.from_samples(data)
-  z = NormalDist().inv_cdf((1 + confidence) / 2.)
-  h = dist.stdev * z / ((len(data) - 1) ** .5)
-  return dist.mean - h, dist.mean + h
+# Only needed for annotations, to not load matplotlib for tables
+if TYPE_CHECKING:
+  from matplotlib.figure import Figure
 
 
 def scientfic_notation(number):
@@ -42,49 +38,81 @@ class MicroDeviationGraph(Graph):
     parser.add_argument("--event", required=True, type=str,
                         help="The event to use, such as cpu-cycles or instructions")
 
+  @staticmethod
+  def fetch_all_inputs(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    cursor.execute("""
+    SELECT
+      algorithm_name,
+      algorithm_parameters,
+      environment,
+      region,
+      event
+    FROM
+      micro_events
+    GROUP BY
+      algorithm_name,
+      algorithm_parameters,
+      environment,
+      region,
+      event
+    """)
+    keys = ["algorithm_name", "algorithm_parameters", "environment", "region", "event"]
+    rows = cursor.fetchall()
+    inputs = []
+    for row in rows:
+        inputs.append({keys[i]: value for i, value in enumerate(row)})
+    return inputs
+
+  @staticmethod
+  def fetch_all_data(cursor: sqlite3.Cursor, inputs: List[Dict[str, Any]]) -> Optional[List[Any]]:
+    cursor.execute("""
+      SELECT
+        algorithm_name,
+        algorithm_parameters,
+        environment,
+        region,
+        event,
+        compiler,
+        features,
+        value
+      FROM
+        micro_events
+      """)
+    return partition_by_inputs(cursor.fetchall(), inputs, ["algorithm_name", "algorithm_parameters", "environment", "region", "event"])
+
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     parameters = (self.options.algorithm_name, self.options.algorithm_parameters,
                   self.options.environment, self.options.region, self.options.event)
     cursor.execute("""
       SELECT
-        algorithm.compiler,
-        algorithm.features,
-        microBenchmarkEvent.value
+        compiler,
+        features,
+        value
       FROM
-        benchmark
-        INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-        INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-        INNER JOIN environment ON environment.id = benchmarkRun.environment
-        INNER JOIN microBenchmark ON microBenchmark.benchmark = benchmark.id
-        INNER JOIN microBenchmarkMeasurement ON microBenchmarkMeasurement.microBenchmark = microBenchmark.id
-        INNER JOIN microBenchmarkEvent ON microBenchmarkEvent.microBenchmarkMeasurement = microBenchmarkMeasurement.id
+        micro_events
       WHERE
-        algorithm.name = ?
-        AND algorithm.parameters = ?
-        AND environment.name = ?
-        AND microBenchmarkMeasurement.region = ?
-        AND microBenchmarkEvent.event = ?
+        algorithm_name = ?
+        AND algorithm_parameters = ?
+        AND environment = ?
+        AND region = ?
+        AND event = ?
       """, parameters)
     return cursor.fetchall()
 
-  def generate(self, plot: pyplot, data: Any) -> None:
+  def generate(self, figure: "Figure", data: Any) -> None:
     # [("gcc", "ref", 184585549)]
-    series: Dict[str, List[float]] = {}
-    for row in data:
-      label = " ".join(row[0:2])
-      if label not in series:
-        series[label] = []
-      series[label].append(row[2])
-    values = list(series.values())
-    values.sort(key=lambda x: numpy.std(x), reverse=True)
-    keys = list(series.keys())
-    keys.sort(key=lambda x: numpy.std(series[x]), reverse=True)
-    plot.boxplot(values, showfliers=False)
-    plot.gcf().axes[0].yaxis.get_major_formatter().set_scientific(False)
-    plot.gcf().axes[0].set_xticklabels(keys)
-    plot.title("")
-    plot.ylabel(self.options.event)
-    plot.xlabel("Optimizations")
+    labels = [" ".join(row[0:2]) for row in data]
+    statistics = group_statistics(labels, [row[2] for row in data])
+    order = statistics.order(statistics.standard_deviation, reverse=True)
+    values = [statistics.values[i] for i in order]
+    keys = [str(statistics.labels[i]) for i in order]
+    axes = figure.subplots()
+    axes.boxplot(values, showfliers=False)
+    axes.yaxis.get_major_formatter().set_scientific(False)
+    axes.set_xticklabels(keys)
+    axes.set_title("")
+    axes.set_ylabel(self.options.event)
+    axes.set_xlabel("Optimizations")
 
 
 class MicroDeviationTable(Table):
@@ -106,59 +134,91 @@ class MicroDeviationTable(Table):
     parser.add_argument("--event", required=True, type=str,
                         help="The event to use, such as cpu-cycles or instructions")
 
+  @staticmethod
+  def fetch_all_inputs(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    cursor.execute("""
+    SELECT
+      algorithm_name,
+      algorithm_parameters,
+      environment,
+      region,
+      event
+    FROM
+      micro_event_rollups
+    GROUP BY
+      algorithm_name,
+      algorithm_parameters,
+      environment,
+      region,
+      event
+    """)
+    keys = ["algorithm_name", "algorithm_parameters", "environment", "region", "event"]
+    rows = cursor.fetchall()
+    inputs = []
+    for row in rows:
+        inputs.append({keys[i]: value for i, value in enumerate(row)})
+    return inputs
+
+  @staticmethod
+  def fetch_all_data(cursor: sqlite3.Cursor, inputs: List[Dict[str, Any]]) -> Optional[List[Any]]:
+    cursor.execute("""
+      SELECT
+        algorithm_name,
+        algorithm_parameters,
+        environment,
+        region,
+        event,
+        compiler,
+        features,
+        ROLLUP_STATISTICS(SUM(count), TOTAL(sum), TOTAL(sum_of_squares), MIN(minimum), MAX(maximum))
+      FROM
+        micro_event_rollups
+      GROUP BY
+        algorithm_name,
+        algorithm_parameters,
+        environment,
+        region,
+        event,
+        compiler,
+        features
+      """)
+    return partition_by_inputs(cursor.fetchall(), inputs, ["algorithm_name", "algorithm_parameters", "environment", "region", "event"])
+
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     parameters = (self.options.algorithm_name, self.options.algorithm_parameters,
                   self.options.environment, self.options.region, self.options.event)
     cursor.execute("""
       SELECT
-        algorithm.compiler,
-        algorithm.features,
-        microBenchmarkEvent.value
+        compiler,
+        features,
+        ROLLUP_STATISTICS(SUM(count), TOTAL(sum), TOTAL(sum_of_squares), MIN(minimum), MAX(maximum))
       FROM
-        benchmark
-        INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-        INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-        INNER JOIN environment ON environment.id = benchmarkRun.environment
-        INNER JOIN microBenchmark ON microBenchmark.benchmark = benchmark.id
-        INNER JOIN microBenchmarkMeasurement ON microBenchmarkMeasurement.microBenchmark = microBenchmark.id
-        INNER JOIN microBenchmarkEvent ON microBenchmarkEvent.microBenchmarkMeasurement = microBenchmarkMeasurement.id
+        micro_event_rollups
       WHERE
-        algorithm.name = ?
-        AND algorithm.parameters = ?
-        AND environment.name = ?
-        AND microBenchmarkMeasurement.region = ?
-        AND microBenchmarkEvent.event = ?
+        algorithm_name = ?
+        AND algorithm_parameters = ?
+        AND environment = ?
+        AND region = ?
+        AND event = ?
+      GROUP BY
+        compiler,
+        features
       """, parameters)
     return cursor.fetchall()
 
   def generate(self, data: Any) -> str:
-   # [("gcc", "ref", 34579902)]
-    series: Dict[str, List[float]] = {}
-    for row in data:
-      label = " ".join(row[0:2])
-      if label not in series:
-        series[label] = []
-      series[label].append(row[2])
-    values = list(series.values())
-    values.sort(key=lambda x: numpy.std(x), reverse=True)
-    keys = list(series.keys())
-    keys.sort(key=lambda x: numpy.std(series[x]), reverse=True)
+    # [("gcc", "ref", '{"count": 1000, "mean": 34579902.0, ...}')]
+    groups = [(row[0], row[1], decode_statistics(row[2])) for row in data]
+    groups.sort(key=lambda x: x[2]["standard_deviation"], reverse=True)
     rows = []
-    for i in range(len(keys)):
-      key = keys[i]
-      value = values[i]
-      standard_deviation = numpy.std(value)
-      average = numpy.mean(value)
-      confidence_interval_lower, confidence_interval_upper = calculate_confidence_interval(
-          value)
-      compiler, features = key.split(" ")
+    for compiler, features, statistics in groups:
       rows.append([
           compiler,
           features,
-          scientfic_notation(average),
-          scientfic_notation(standard_deviation),
-          scientfic_notation(confidence_interval_lower),
-          scientfic_notation(confidence_interval_upper)
+          scientfic_notation(statistics["mean"]),
+          scientfic_notation(statistics["standard_deviation"]),
+          scientfic_notation(statistics["confidence_interval_lower"]),
+          scientfic_notation(statistics["confidence_interval_upper"])
       ])
     return """
     \\begin{{table}}[H]
@@ -1,19 +1,20 @@
 import sqlite3
 from argparse import ArgumentParser, Namespace
-from typing import Any, List, Dict
-from statistics import NormalDist
+from typing import Any, List, Dict, Optional, TYPE_CHECKING
 
 import numpy
-from matplotlib import pyplot
 
 from visualization.graph import Graph
 from visualization.table import Table
+from visualization.batch import partition_by_inputs
+from visualization.aggregates import decode_statistics
+from visualization.stats import group_statistics
+from visualization.columns import fetch_columns
+from visualization.columnar import ColumnarStore
 
-def calculate_confidence_interval(data, confidence=0.95):
-  dist = NormalDist.from_samples(data)
-  z = NormalDist().inv_cdf((1 + confidence) / 2.)
-  h = dist.stdev * z / ((len(data) - 1) ** .5)
-  return dist.mean - h, dist.mean + h
+# Only needed for annotations, to not load matplotlib for tables
+if TYPE_CHECKING:
+  from matplotlib.figure import Figure
 
 
 class SequentialDeviationGraph(Graph):
@@ -63,9 +64,8 @@ class SequentialDeviationGraph(Graph):
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     parameters = (self.options.algorithm_name, self.options.algorithm_parameters,
                   self.options.stage, self.options.environment)
-    cursor.execute("""
+    return fetch_columns(cursor, """
       SELECT
-        environment.name,
         algorithm.compiler,
         algorithm.features,
         sequentialBenchmarkIteration.duration
@@ -81,27 +81,27 @@ class SequentialDeviationGraph(Graph):
         AND algorithm.parameters = ?
         AND benchmark.stage = ?
         AND environment.name = ?
-      """, parameters)
-    return cursor.fetchall()
+      """, parameters, [("compiler", str), ("features", str), ("duration", numpy.int64)])
+
+  def fetch_columnar_data(self, store: ColumnarStore) -> Any:
+    return store.select("sequential_iterations", ["compiler", "features", "duration"],
+                        algorithm_name=self.options.algorithm_name, algorithm_parameters=self.options.algorithm_parameters,
+                        stage=self.options.stage, environment=self.options.environment)
 
-  def generate(self, plot: pyplot, data: Any) -> None:
-    # [("Modern Workstation", "gcc", "ref", 34579902)]
-    series: Dict[str, List[float]] = {}
-    for row in data:
-      label = "{} {}".format(row[1], row[2])
-      if label not in series:
-        series[label] = []
-      series[label].append(row[3] / 1e6)
-    values = list(series.values())
-    values.sort(key=lambda x: min(x), reverse=True)
-    keys = list(series.keys())
-    keys.sort(key=lambda x: min(series[x]), reverse=True)
-    plot.boxplot(values, showfliers=False)
-    plot.gcf().axes[0].yaxis.get_major_formatter().set_scientific(False)
-    plot.gcf().axes[0].set_xticklabels(keys)
-    plot.title("")
-    plot.ylabel("Duration (ms)")
-    plot.xlabel("Optimizations")
+  def generate(self, figure: "Figure", data: Any) -> None:
+    # compiler: ["gcc", ...], features: ["ref", ...], duration: [34579902, ...]
+    compiler, features = data["compiler"], data["features"]
+    statistics = group_statistics(numpy.column_stack((compiler.codes, features.codes)), data["duration"] / 1e6)
+    order = statistics.order(statistics.minimum, reverse=True)
+    values = [statistics.values[i] for i in order]
+    keys = ["{} {}".format(compiler.values[statistics.labels[i][0]], features.values[statistics.labels[i][1]]) for i in order]
+    axes = figure.subplots()
+    axes.boxplot(values, showfliers=False)
+    axes.yaxis.get_major_formatter().set_scientific(False)
+    axes.set_xticklabels(keys)
+    axes.set_title("")
+    axes.set_ylabel("Duration (ms)")
+    axes.set_xlabel("Optimizations")
 
 
 class SequentialDeviationTable(Table):
@@ -148,15 +148,42 @@ class SequentialDeviationTable(Table):
         inputs.append({keys[i]: value for i, value in enumerate(row)})
     return inputs
 
+  @staticmethod
+  def fetch_all_data(cursor: sqlite3.Cursor, inputs: List[Dict[str, Any]]) -> Optional[List[Any]]:
+    cursor.execute("""
+      SELECT
+        algorithm.name,
+        algorithm.parameters,
+        benchmark.stage,
+        environment.name,
+        algorithm.compiler,
+        algorithm.features,
+        STATISTICS(sequentialBenchmarkIteration.duration / 1e6)
+      FROM
+        benchmark
+        INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
+        INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
+        INNER JOIN environment ON environment.id = benchmarkRun.environment
+        INNER JOIN sequentialBenchmark ON sequentialBenchmark.benchmark = benchmark.id
+        INNER JOIN sequentialBenchmarkIteration ON sequentialBenchmarkIteration.sequentialBenchmark = sequentialBenchmark.id
+      GROUP BY
+        algorithm.name,
+        algorithm.parameters,
+        benchmark.stage,
+        environment.name,
+        algorithm.compiler,
+        algorithm.features
+      """)
+    return partition_by_inputs(cursor.fetchall(), inputs, ["algorithm_name", "algorithm_parameters", "stage", "environment"])
+
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     parameters = (self.options.algorithm_name, self.options.algorithm_parameters,
                   self.options.stage, self.options.environment)
     cursor.execute("""
       SELECT
-        environment.name,
         algorithm.compiler,
         algorithm.features,
-        sequentialBenchmarkIteration.duration
+        STATISTICS(sequentialBenchmarkIteration.duration / 1e6)
       FROM
         benchmark
         INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
@@ -169,31 +196,20 @@ class SequentialDeviationTable(Table):
         AND algorithm.parameters = ?
         AND benchmark.stage = ?
         AND environment.name = ?
+      GROUP BY
+        algorithm.compiler,
+        algorithm.features
       """, parameters)
     return cursor.fetchall()
 
   def generate(self, data: Any) -> str:
-   # [("Modern Workstation", "gcc", "ref", 34579902)]
-    series: Dict[str, List[float]] = {}
-    for row in data:
-      label = "{} {}".format(row[1], row[2])
-      if label not in series:
-        series[label] = []
-      series[label].append(row[3] / 1e6)
-    values = list(series.values())
-    values.sort(key=lambda x: min(x), reverse=True)
-    keys = list(series.keys())
-    keys.sort(key=lambda x: min(series[x]), reverse=True)
+    # [("gcc", "ref", '{"count": 1000, "mean": 34.579902, "minimum": 34.1, ...}')]
+    groups = [(row[0], row[1], decode_statistics(row[2])) for row in data]
+    groups.sort(key=lambda x: x[2]["minimum"], reverse=True)
     rows = []
-    for i in range(len(keys)):
-      key = keys[i]
-      value = values[i]
-      standard_deviation = numpy.std(value)
-      average = numpy.mean(value)
-      confidence_interval_lower, confidence_interval_upper = calculate_confidence_interval(value)
-      compiler, features = key.split(" ")
+    for compiler, features, statistics in groups:
       rows.append([compiler, features, "{:.2f}".format(
-          average), "{:.2f}".format(standard_deviation), "{:.2f}".format(confidence_interval_lower), "{:.2f}".format(confidence_interval_upper)])
+          statistics["mean"]), "{:.2f}".format(statistics["standard_deviation"]), "{:.2f}".format(statistics["confidence_interval_lower"]), "{:.2f}".format(statistics["confidence_interval_upper"])])
     return """
     \\begin{{table}}[H]
         \\centering
@@ -2,12 +2,28 @@ import sqlite3
 import itertools
 import json
 from argparse import ArgumentParser, Namespace
-from typing import Any, Dict, List
+from typing import Any, Dict, List, TYPE_CHECKING
 
-from matplotlib import pyplot
+import numpy
 
 from visualization.graph import Graph
 from visualization.table import Table
+from visualization.columns import fetch_columns
+from visualization.columnar import ColumnarStore
+from visualization.stats import group_statistics
+
+# Only needed for annotations, to not load matplotlib for tables
+if TYPE_CHECKING:
+  from matplotlib.figure import Figure
+
+SEQUENTIAL_RUNS_COLUMNS = [
+  ("run_index", numpy.int32),
+  ("compiler", str),
+  ("features", str),
+  ("average_duration", numpy.float64),
+  ("iteration", numpy.int32),
+  ("duration", numpy.int64),
+]
 
 class SequentialRunsGraph(Graph):
   def __init__(self, options: Namespace) -> None:
@@ -55,15 +71,11 @@ class SequentialRunsGraph(Graph):
 
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     parameters = (self.options.algorithm_name, self.options.algorithm_parameters, self.options.stage, self.options.environment)
-    cursor.execute("""
+    return fetch_columns(cursor, """
        SELECT
-        environment.name,
         benchmarkRun.runIndex,
-        algorithm.name,
-        algorithm.parameters,
         algorithm.compiler,
         algorithm.features,
-        benchmark.stage,
         sequentialBenchmark.averageDuration,
         sequentialBenchmarkIteration.iteration,
         sequentialBenchmarkIteration.duration
@@ -79,62 +91,60 @@ class SequentialRunsGraph(Graph):
         algorithm.parameters = ? AND
         benchmark.stage = ? AND
         environment.name = ?
-      """, parameters)
-    return cursor.fetchall()
+      """, parameters, SEQUENTIAL_RUNS_COLUMNS)
+
+  def fetch_columnar_data(self, store: ColumnarStore) -> Any:
+    return store.select("sequential_iterations", [name for name, _ in SEQUENTIAL_RUNS_COLUMNS],
+                        algorithm_name=self.options.algorithm_name, algorithm_parameters=self.options.algorithm_parameters,
+                        stage=self.options.stage, environment=self.options.environment)
 
-  def generate(self, plot: pyplot, data: Any) -> None:
-    # [('low-end-laptop', 0, 'mceliece', '6960119f', 'clang', 'ref-optimized', 'keypair', 666.1022, 999, 665165462)]
+  def generate(self, figure: "Figure", data: Any) -> None:
+    # run_index: [0, ...], compiler: ["clang", ...], features: ["ref-optimized", ...],
+    # average_duration: [666.1022, ...], iteration: [999, ...], duration: [665165462, ...]
     # clang, ref-optimized: [1, 2, 3, ...]
-    series: Dict[str, Dict[int, float]] = {}
-    # run_index: average duration
-    baseline_average_durations: Dict[int, int] = {}
-    # label: run_index: iteration: duration
-    sum_per_label: Dict[str, Dict[int, Dict[int, int]]] = {}
+    series: Dict[str, numpy.ndarray] = {}
+    compiler, features = data["compiler"], data["features"]
+    run_index = data["run_index"]
 
     # Find values
-    for row in data:
-      compiler = row[4]
-      features = row[5]
-      run_index = row[1]
-      if compiler == "gcc" and features == "ref":
-        average_duration = row[7]
-        baseline_average_durations[run_index] = average_duration
-      else:
-        label = "{} {}".format(compiler, features)
-        if label not in sum_per_label:
-          sum_per_label[label] = {}
-
-        if run_index not in sum_per_label[label]:
-          sum_per_label[label][run_index] = {}
-
-        iteration = row[8]
-        duration = row[9]
-        sum_per_label[label][run_index][iteration] = duration
+    baseline = (compiler.codes == compiler.code("gcc")) & (features.codes == features.code("ref"))
+    # run_index: average duration, where the last row of a run wins
+    baseline_runs = run_index[baseline]
+    baseline_durations = data["average_duration"][baseline]
+    runs, first_rows = numpy.unique(baseline_runs, return_index=True)
+    _, last_rows = numpy.unique(baseline_runs[::-1], return_index=True)
+    baseline_average_durations = {}
+    for i in numpy.argsort(first_rows, kind="stable"):
+      baseline_average_durations[int(runs[i])] = float(baseline_durations[len(baseline_runs) - 1 - last_rows[i]])
 
     baseline_avarage_duration = sum(baseline_average_durations.values()) / len(baseline_average_durations)
     print("Baseline runs:", baseline_average_durations)
     print("Baseline average duration:", baseline_avarage_duration)
 
-    for label in sum_per_label.keys():
-      max_length = max([len(value.items()) for value in sum_per_label[label].values()])
-      for i in range(max_length):
-        relevant_items = [items[i] for items in sum_per_label[label].values() if i in items]
-        duration = sum(relevant_items) / len(relevant_items)
-        percentual_duration = (duration / 1e6) / baseline_avarage_duration
-        if label not in series:
-          series[label] = {}
-        series[label][i] = (1 / percentual_duration - 1.0)
+    # Labels in the order they first appear
+    others = numpy.flatnonzero(~baseline)
+    labels = numpy.column_stack((compiler.codes[others], features.codes[others]))
+    unique_labels, first_rows, inverse = numpy.unique(labels, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    for i in numpy.argsort(first_rows, kind="stable"):
+      label = "{} {}".format(compiler.values[unique_labels[i][0]], features.values[unique_labels[i][1]])
+      rows = others[inverse == i]
+      # The average duration of each iteration across runs
+      statistics = group_statistics(data["iteration"][rows], data["duration"][rows], quantiles=())
+      percentual_duration = (statistics.mean / 1e6) / baseline_avarage_duration
+      series[label] = 1 / percentual_duration - 1.0
 
     colors = ["#e6194B", "#3cb44b", "#4363d8", "#f58231",
               "#800000", "#9A6324", "#000075", "#469990"]
+    axes = figure.subplots()
     for i, key in enumerate(series.keys()):
       # TODO: may be wrong if there are gaps in data as it does not care about the acutal indexing
-      values = series[key].values()
-      plot.plot(values, label=key, color=colors[i])
-    plot.title("")
-    plot.ylabel("Speedup")
-    plot.xlabel("Iteration")
-    plot.legend(bbox_to_anchor=(0.5, 1.05), loc="lower center", fontsize=8, ncol=len(series))
+      values = series[key]
+      axes.plot(values, label=key, color=colors[i])
+    axes.set_title("")
+    axes.set_ylabel("Speedup")
+    axes.set_xlabel("Iteration")
+    axes.legend(bbox_to_anchor=(0.5, 1.05), loc="lower center", fontsize=8, ncol=len(series))
 
 
 class SequentialRunsTable(Table):
@@ -156,19 +166,15 @@ class SequentialRunsTable(Table):
   def fetch_all_inputs(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
     cursor.execute("""
     SELECT
-      algorithm.name,
-      algorithm.parameters,
-      benchmark.stage
+      algorithm_name,
+      algorithm_parameters,
+      stage
     FROM
-      benchmark
-      INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-      INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-      INNER JOIN environment ON environment.id = benchmarkRun.environment
-      INNER JOIN sequentialBenchmark ON sequentialBenchmark.benchmark = benchmark.id
+      sequential_rollups
     GROUP BY
-      algorithm.name,
-      algorithm.parameters,
-      benchmark.stage
+      algorithm_name,
+      algorithm_parameters,
+      stage
     """)
     keys = ["algorithm_name", "algorithm_parameters", "stage"]
     rows = cursor.fetchall()
@@ -182,23 +188,19 @@ class SequentialRunsTable(Table):
                   self.options.algorithm_parameters, self.options.stage)
     cursor.execute("""
     SELECT
-      environment.name,
-      algorithm.compiler,
-      algorithm.features,
-      SUM(sequentialBenchmark.iterations),
-      AVG(sequentialBenchmark.averageDuration)
+      environment,
+      compiler,
+      features,
+      iterations,
+      sum / count
     FROM
-      benchmark
-      INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-      INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-      INNER JOIN environment ON environment.id = benchmarkRun.environment
-      INNER JOIN sequentialBenchmark ON sequentialBenchmark.benchmark = benchmark.id
+      sequential_rollups
     WHERE
-      algorithm.name = ?
-      AND algorithm.parameters = ?
-      AND benchmark.stage = ?
-    GROUP BY
-      environment.id, algorithm.id
+      algorithm_name = ?
+      AND algorithm_parameters = ?
+      AND stage = ?
+    ORDER BY
+      environment_id, algorithm_id
     """, parameters)
     return cursor.fetchall()
 
@@ -262,17 +264,13 @@ class SequentialTable(Table):
   def fetch_all_inputs(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
     cursor.execute("""
     SELECT
-      algorithm.name,
-      algorithm.parameters
+      algorithm_name,
+      algorithm_parameters
     FROM
-      benchmark
-      INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-      INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-      INNER JOIN environment ON environment.id = benchmarkRun.environment
-      INNER JOIN sequentialBenchmark ON sequentialBenchmark.benchmark = benchmark.id
+      sequential_rollups
     GROUP BY
-      algorithm.name,
-      algorithm.parameters
+      algorithm_name,
+      algorithm_parameters
     """)
     keys = ["algorithm_name", "algorithm_parameters"]
     rows = cursor.fetchall()
@@ -286,22 +284,18 @@ class SequentialTable(Table):
                   self.options.algorithm_parameters, )
     cursor.execute("""
     SELECT
-      environment.name,
-      algorithm.compiler,
-      algorithm.features,
-      benchmark.stage,
-      AVG(sequentialBenchmark.averageDuration)
+      environment,
+      compiler,
+      features,
+      stage,
+      sum / count
     FROM
-      benchmark
-      INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-      INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-      INNER JOIN environment ON environment.id = benchmarkRun.environment
-      INNER JOIN sequentialBenchmark ON sequentialBenchmark.benchmark = benchmark.id
+      sequential_rollups
     WHERE
-      algorithm.name = ?
-      AND algorithm.parameters = ?
-    GROUP BY
-      environment.id, algorithm.id, benchmark.stage
+      algorithm_name = ?
+      AND algorithm_parameters = ?
+    ORDER BY
+      environment_id, algorithm_id, stage
     """, parameters)
     return cursor.fetchall()
 
@@ -1,10 +1,11 @@
 import sqlite3
 import re
 from argparse import ArgumentParser, Namespace
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Optional
 
 import numpy
 from visualization.table import Table
+from visualization.batch import partition_by_inputs
 
 address_regex = re.compile(r"0x[0-9abcdefABCDEF]+;?")
 
@@ -46,6 +47,33 @@ class StackSymbolTable(Table):
         inputs.append({keys[i]: value for i, value in enumerate(row)})
     return inputs
 
+  @staticmethod
+  def fetch_all_data(cursor: sqlite3.Cursor, inputs: List[Dict[str, Any]]) -> Optional[List[Any]]:
+    cursor.execute("""
+    SELECT
+      algorithm.name,
+      stackBenchmarkSymbol.symbol,
+      environment.name,
+      algorithm.parameters,
+      algorithm.compiler,
+      algorithm.features,
+      MAX(stackBenchmarkSymbol.size) AS size
+    FROM
+      benchmark
+      INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
+      INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
+      INNER JOIN stackBenchmark ON stackBenchmark.benchmark = benchmark.id
+      INNER JOIN stackBenchmarkSymbol ON stackBenchmarkSymbol.stackBenchmark = stackBenchmark.id
+      INNER JOIN environment ON environment.id = benchmarkRun.environment
+    GROUP BY
+      environment.id,
+      algorithm.id,
+      stackBenchmarkSymbol.symbol
+    ORDER BY
+      environment.name
+      """)
+    return partition_by_inputs(cursor.fetchall(), inputs, ["algorithm_name", "symbol"])
+
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     parameters = (self.options.algorithm_name, self.options.symbol)
     cursor.execute("""
@@ -131,7 +159,9 @@ class StackSymbolChangeTable(Table):
     SELECT
       algorithm.name
     FROM
-      algorithm
+      benchmark
+      INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
+      INNER JOIN stackBenchmark ON stackBenchmark.benchmark = benchmark.id
     GROUP BY
       algorithm.name
     """)
@@ -142,6 +172,33 @@ class StackSymbolChangeTable(Table):
         inputs.append({keys[i]: value for i, value in enumerate(row)})
     return inputs
 
+  @staticmethod
+  def fetch_all_data(cursor: sqlite3.Cursor, inputs: List[Dict[str, Any]]) -> Optional[List[Any]]:
+    cursor.execute("""
+    SELECT
+      algorithm.name,
+      environment.name,
+      algorithm.parameters,
+      algorithm.compiler,
+      algorithm.features,
+      stackBenchmarkSymbol.symbol,
+      MAX(stackBenchmarkSymbol.size) AS size
+    FROM
+      benchmark
+      INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
+      INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
+      INNER JOIN stackBenchmark ON stackBenchmark.benchmark = benchmark.id
+      INNER JOIN stackBenchmarkSymbol ON stackBenchmarkSymbol.stackBenchmark = stackBenchmark.id
+      INNER JOIN environment ON environment.id = benchmarkRun.environment
+    GROUP BY
+      environment.id,
+      algorithm.id,
+      stackBenchmarkSymbol.symbol
+    ORDER BY
+      environment.name
+      """)
+    return partition_by_inputs(cursor.fetchall(), inputs, ["algorithm_name"])
+
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     parameters = (self.options.algorithm_name,)
     cursor.execute("""
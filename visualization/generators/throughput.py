@@ -1,17 +1,20 @@
 import sqlite3
 
 from argparse import ArgumentParser, Namespace
-from typing import Any, Dict, List
+from typing import Any, Dict, List, TYPE_CHECKING
 from collections import Counter
 
-import matplotlib
-from matplotlib import pyplot, ticker
-
 from visualization.table import Table
 from visualization.graph import Graph
 
+# Only needed for annotations, to not load matplotlib for tables
+if TYPE_CHECKING:
+  from matplotlib.figure import Figure
+
 
 class ParallelThroughputGraph(Graph):
+  figure_options = {"layout": "tight"}
+
   def __init__(self, options: Namespace) -> None:
     super().__init__(options)
     self.name = "Parallel Throughput Graph"
@@ -28,6 +31,7 @@ class ParallelThroughputGraph(Graph):
         INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
         INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
         INNER JOIN environment ON environment.id = benchmarkRun.environment
+        INNER JOIN parallelBenchmark ON parallelBenchmark.benchmark = benchmark.id
     GROUP BY
         environment.name,
         algorithm.name
@@ -69,13 +73,15 @@ class ParallelThroughputGraph(Graph):
     """, parameters)
     return cursor.fetchall()
 
-  def generate(self, plot: pyplot, data: Any) -> None:
+  def generate(self, figure: "Figure", data: Any) -> None:
+    # Imported when graphing to not load matplotlib for the table in this module
+    from matplotlib import ticker
+
     stages = {row[0]: True for row in data}.keys()
     compilers = {row[1]: True for row in data}.keys()
     parameters = {row[2]: True for row in data}.keys()
-    matplotlib.rcParams.update({'figure.autolayout': True})
     number_of_stages = len(stages)
-    figure, axes_list = plot.subplots(1, number_of_stages)
+    axes_list = figure.subplots(1, number_of_stages)
     # Change the height to be three fourths that of the original height as
     # it becomes very narrow otherwise
     figure_width, figure_height = figure.get_size_inches()
@@ -96,7 +102,7 @@ class ParallelThroughputGraph(Graph):
         axes.xaxis.set_major_locator(ticker.FixedLocator(range(1, len(labels) + 1)))
         axes.set_xticklabels(labels=labels, fontsize=7)
         for tick in axes.yaxis.get_major_ticks():
-            tick.label.set_fontsize(7)
+            tick.label1.set_fontsize(7)
         axes.set_title(stage, fontsize=7)
 
     axes_list[0].set_ylabel("Throughput")
@@ -113,8 +119,6 @@ class ParallelThroughputGraph(Graph):
     figure.legend(legend, bbox_to_anchor=(.5, 1),
                 loc="upper center", fontsize=7, ncol=len(legend))
 
-    return figure
-
 
 class ParallelThroughputTable(Table):
     def __init__(self, options: Namespace) -> None:
@@ -135,21 +139,17 @@ class ParallelThroughputTable(Table):
     def fetch_all_inputs(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
         cursor.execute("""
         SELECT
-            algorithm.name,
-            algorithm.parameters,
-            benchmark.stage
+            algorithm_name,
+            algorithm_parameters,
+            stage
         FROM
-            benchmark
-            INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-            INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-            INNER JOIN environment ON environment.id = benchmarkRun.environment
-            INNER JOIN parallelBenchmark ON parallelBenchmark.benchmark = benchmark.id
+            parallel_rollups
         WHERE
             stage IS NOT ""
         GROUP BY
-            algorithm.name,
-            algorithm.parameters,
-            benchmark.stage
+            algorithm_name,
+            algorithm_parameters,
+            stage
         """)
         keys = ["algorithm_name", "algorithm_parameters", "stage"]
         rows = cursor.fetchall()
@@ -162,26 +162,22 @@ class ParallelThroughputTable(Table):
         parameters = (self.options.algorithm_name, self.options.algorithm_parameters, self.options.stage)
         cursor.execute("""
         SELECT
-            environment.name,
-            algorithm.compiler,
-            algorithm.features,
-            parallelBenchmark.numberOfThreads,
-            AVG(parallelBenchmark.throughput)
+            environment,
+            compiler,
+            features,
+            number_of_threads,
+            sum / count
         FROM
-            benchmark
-            INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
-            INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
-            INNER JOIN environment ON environment.id = benchmarkRun.environment
-            INNER JOIN parallelBenchmark ON parallelBenchmark.benchmark = benchmark.id
+            parallel_rollups
         WHERE
-            algorithm.name = ? AND
-            algorithm.parameters = ? AND
-            benchmark.stage = ?
-        GROUP BY
-            environment.name,
-            algorithm.compiler,
-            algorithm.features,
-            parallelBenchmark.numberOfThreads
+            algorithm_name = ? AND
+            algorithm_parameters = ? AND
+            stage = ?
+        ORDER BY
+            environment,
+            compiler,
+            features,
+            number_of_threads
     """, parameters)
         return cursor.fetchall()
 
@@ -0,0 +1,156 @@
+import sqlite3
+
+from argparse import ArgumentParser, Namespace
+from typing import Any, Dict, List, TYPE_CHECKING
+
+from visualization.table import Table
+from visualization.graph import Graph
+
+# Only needed for annotations, to not load matplotlib for tables
+if TYPE_CHECKING:
+  from matplotlib.figure import Figure
+
+# The portable implementation the speedup of the others is relative to
+BASELINE = "ref-64bits"
+
+
+def fetch_xkcp_inputs(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+  # Databases created before XKCP results could be imported have no xkcpBenchmark table
+  cursor.execute("SELECT COUNT(*) FROM pragma_table_list WHERE name = 'xkcpBenchmark'")
+  if cursor.fetchone()[0] == 0:
+    return []
+  cursor.execute("""
+  SELECT
+    algorithm.name
+  FROM
+    benchmark
+    INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
+    INNER JOIN xkcpBenchmark ON xkcpBenchmark.benchmark = benchmark.id
+  GROUP BY
+    algorithm.name
+  """)
+  return [{"algorithm_name": row[0]} for row in cursor.fetchall()]
+
+
+def fetch_xkcp_data(cursor: sqlite3.Cursor, algorithm_name: str) -> List[Any]:
+  cursor.execute("""
+  SELECT
+    environment.name,
+    algorithm.compiler,
+    algorithm.features,
+    AVG(xkcpBenchmark.averageDuration),
+    AVG(xkcpBenchmark.throughput)
+  FROM
+    benchmark
+    INNER JOIN algorithm ON algorithm.id = benchmark.algorithm
+    INNER JOIN benchmarkRun ON benchmarkRun.id = benchmark.benchmarkRun
+    INNER JOIN environment ON environment.id = benchmarkRun.environment
+    INNER JOIN xkcpBenchmark ON xkcpBenchmark.benchmark = benchmark.id
+  WHERE
+    algorithm.name = ?
+  GROUP BY
+    environment.id, algorithm.id
+  ORDER BY
+    environment.name, algorithm.compiler, algorithm.features
+  """, (algorithm_name, ))
+  return cursor.fetchall()
+
+
+def implementation_label(compiler: str, features: str) -> str:
+  return features if compiler == "" else "{},{}".format(compiler, features)
+
+
+class XkcpThroughputTable(Table):
+  def __init__(self, options: Namespace) -> None:
+    super().__init__(options)
+    self.name = "Xkcp Throughput Table"
+    self.description = "Table of Keccak throughput per implementation and environment"
+
+  @staticmethod
+  def populate_argument_parser(parser: ArgumentParser):
+    parser.add_argument("--algorithm-name", required=True,
+                        type=str, help="The name the XKCP results were imported as")
+
+  @staticmethod
+  def fetch_all_inputs(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    return fetch_xkcp_inputs(cursor)
+
+  def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
+    return fetch_xkcp_data(cursor, self.options.algorithm_name)
+
+  def generate(self, data: Any) -> str:
+    # [('low-end-laptop', '', 'plain-64bits/lcu6', 0.000476, 2100840.336134)]
+    environments: Dict[str, List[Any]] = {}
+    for row in data:
+      environments.setdefault(row[0], []).append(row)
+
+    rows = []
+    for environment_name, environment_rows in environments.items():
+      baselines = [row[4] for row in environment_rows if row[2] == BASELINE]
+      rows.append("\\multirowcell{{{}}}{{{}}}".format(len(environment_rows), environment_name.replace(" ", "\\\\ ")))
+      for i, row in enumerate(sorted(environment_rows, key=lambda x: x[4], reverse=True)):
+        # Rounded first, as speedups within rounding of the baseline would otherwise print as -0.0
+        speedup = "{:.1f}".format(round(row[4] / baselines[0] - 1.0, 1) + 0.0) if len(baselines) > 0 else "-"
+        # The implementations contain underscores, which LaTeX treats as subscripts
+        label = implementation_label(row[1], row[2]).replace("_", "\\_")
+        rows.append("{}& {} & {:.1f} & {:.3f} & {} \\\\".format("" if i == 0 else " ", label, row[3] * 1e6, row[4] / 1e6, speedup))
+      rows.append("\\midrule")
+    if len(rows) > 0:
+      del rows[-1]
+
+    return """
+  \\begin{{table}}[H]
+      \\centering
+      \\footnotesize
+      \\caption{{XKCP Throughput Table for {}}}
+      \\begin{{tabularx}}{{\\linewidth}}{{l l c c c}}
+          \\toprule
+          \\thead{{Environment}} & \\thead{{Implementation}} & \\thead{{Average Duration (ns)}} & \\thead{{Throughput (M/s)}} & \\thead{{Speedup}}\\\\
+          \\midrule
+          {}
+          \\bottomrule
+      \\end{{tabularx}}
+  \\end{{table}}
+  """.format(self.options.algorithm_name, "\n            ".join(rows))
+
+
+class XkcpThroughputGraph(Graph):
+  figure_options = {"layout": "tight"}
+
+  def __init__(self, options: Namespace) -> None:
+    super().__init__(options)
+    self.name = "Xkcp Throughput Graph"
+    self.description = "Graph of Keccak throughput per implementation, grouped by environment"
+
+  @staticmethod
+  def populate_argument_parser(parser: ArgumentParser):
+    parser.add_argument("--algorithm-name", required=True,
+                        type=str, help="The name the XKCP results were imported as")
+
+  @staticmethod
+  def fetch_all_inputs(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    return fetch_xkcp_inputs(cursor)
+
+  def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
+    return fetch_xkcp_data(cursor, self.options.algorithm_name)
+
+  def generate(self, figure: "Figure", data: Any) -> None:
+    environments = {row[0]: True for row in data}.keys()
+    implementations = {implementation_label(row[1], row[2]): True for row in data}.keys()
+    throughputs = {(row[0], implementation_label(row[1], row[2])): row[4] / 1e6 for row in data}
+    colors = ["#e6194B", "#3cb44b", "#4363d8", "#f58231",
+              "#469990", "#800000", "#9A6324", "#000075"]
+
+    axes = figure.subplots()
+    height = 0.8 / max(1, len(environments))
+    for i, environment in enumerate(environments):
+      positions = [j + i * height for j in range(len(implementations))]
+      values = [throughputs.get((environment, implementation), 0) for implementation in implementations]
+      axes.barh(positions, values, height=height, color=colors[i % len(colors)], label=environment)
+
+    axes.set_yticks([j + (len(environments) - 1) * height / 2 for j in range(len(implementations))])
+    axes.set_yticklabels(list(implementations), fontsize=7)
+    axes.invert_yaxis()
+    axes.tick_params(axis="x", labelsize=7)
+    axes.set_xlabel("Throughput (M/s)")
+    axes.legend(fontsize=7)
@@ -1,11 +1,18 @@
 import sqlite3
 import re
-from matplotlib import pyplot
 from argparse import ArgumentParser, Namespace, _SubParsersAction
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+  from matplotlib.figure import Figure
 
 
 class Graph:
+  # Keyword arguments of the Figure a graph is drawn on, such as its layout.
+  # Graphs style their own figure and axes rather than the global rcParams, so
+  # that several graphs can be rendered at once
+  figure_options: Dict[str, Any] = {}
+
   def __init__(self, options: Namespace) -> None:
     self.name = "Graph"
     self.description = "A Graph"
@@ -13,7 +20,7 @@ class Graph:
 
   @classmethod
   def get_name(cls) -> str:
-    return cls(Namespace()).name
+    return cls.get_metadata()[0]
 
   @classmethod
   def get_command_name(cls) -> str:
@@ -21,7 +28,15 @@ class Graph:
 
   @classmethod
   def get_description(cls) -> str:
-    return cls(Namespace()).description
+    return cls.get_metadata()[1]
+
+  @classmethod
+  def get_metadata(cls) -> Tuple[str, str]:
+    # Cached per class, as the name and description are only known from an instance
+    if "_metadata" not in cls.__dict__:
+      instance = cls(Namespace())
+      cls._metadata = (instance.name, instance.description)
+    return cls._metadata
 
   @classmethod
   def create_argument_parser(cls, graph_subparser: _SubParsersAction) -> ArgumentParser:
@@ -34,6 +49,13 @@ class Graph:
     # Do nothing
     return []
 
+  @staticmethod
+  def fetch_all_data(cursor: sqlite3.Cursor, inputs: List[Dict[str, Any]]) -> Optional[List[Any]]:
+    # Do nothing, data is fetched once per input using fetch_data instead.
+    # Generators may return the data of every input, in the order of inputs,
+    # to fetch it using a single query
+    return None
+
   @staticmethod
   def populate_argument_parser(parser: ArgumentParser):
     # Do nothing
@@ -42,6 +64,11 @@ class Graph:
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     return None
 
-  def generate(self, plot: pyplot, data: Any) -> None:
+  def fetch_columnar_data(self, store: Any) -> Any:
+    # Do nothing, data is fetched from the database using fetch_data instead.
+    # Generators may return the same data read from a ColumnarStore
+    return None
+
+  def generate(self, figure: "Figure", data: Any) -> None:
     # Do nothing
     pass
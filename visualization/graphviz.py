@@ -0,0 +1,102 @@
+import hashlib
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from visualization.build_cache import is_up_to_date, store_fingerprint
+
+FORMATS = ["pdf", "svg", "png"]
+
+
+def graphviz_version() -> Optional[str]:
+  """The version of the installed dot, or None if it is not installed."""
+  if shutil.which("dot") is None:
+    return None
+  process = subprocess.run(["dot", "-V"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+  return process.stdout.strip()
+
+
+def find_dot_files(root: Path) -> List[Path]:
+  """Find the DOT files below a directory, skipping build outputs."""
+  if root.is_file():
+    return [root]
+  files = []
+  for directory, directories, names in os.walk(root):
+    directories[:] = sorted(name for name in directories if name != "build" and not name.startswith("."))
+    files += [Path(directory, name) for name in sorted(names) if name.endswith(".dot")]
+  return files
+
+
+def render_fingerprint(version: str, format: str, content: bytes) -> str:
+  """Key an output on the content of its DOT file rather than its modification time."""
+  digest = hashlib.sha256("{}\n{}\n".format(version, format).encode())
+  digest.update(content)
+  return digest.hexdigest()
+
+
+class RenderJob:
+  """Renders a single DOT file to every requested format that is out of date, laying it out once."""
+
+  def __init__(self, source: Path, outputs: Dict[str, Path], version: str) -> None:
+    self.source = source
+    self.outputs = outputs
+    self.content = source.read_bytes()
+    self.fingerprints = {format: render_fingerprint(version, format, self.content) for format in outputs}
+    self.stale = [format for format, path in outputs.items() if not is_up_to_date(path, self.fingerprints[format])]
+
+  def run(self) -> Optional[str]:
+    """Render the stale outputs, returning the error of dot if it failed."""
+    command = ["dot"]
+    for format in self.stale:
+      self.outputs[format].parent.mkdir(parents=True, exist_ok=True)
+      command += ["-T{}".format(format), "-o", str(self.outputs[format])]
+    # Render from the content read when fingerprinting, in case the file changes meanwhile
+    process = subprocess.run(command, input=self.content, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+      return process.stderr.decode(errors="replace").strip()
+    for format in self.stale:
+      store_fingerprint(self.outputs[format], self.fingerprints[format])
+    return None
+
+
+def output_paths(source: Path, root: Path, output: Optional[Path], formats: List[str]) -> Dict[str, Path]:
+  """Place outputs in a build directory of the root, or the given output directory, mirroring the root."""
+  base = root.parent if root.is_file() else root
+  relative = source.relative_to(base).with_suffix("")
+  directory = output if output is not None else base.joinpath("build")
+  return {format: directory.joinpath(relative).with_suffix(".{}".format(format)) for format in formats}
+
+
+def render_dot_files(roots: List[Path], formats: List[str], output: Optional[Path] = None, jobs: int = 1,
+                     verbose: bool = False) -> Tuple[int, int, List[Tuple[Path, str]]]:
+  """Render every DOT file below the roots that changed since it was last rendered.
+
+  Returns the number of rendered and up to date files and the files that
+  failed to render along with their error.
+  """
+  version = graphviz_version()
+  if version is None:
+    raise FileNotFoundError("graphviz is not installed, no 'dot' on the PATH")
+
+  jobs_to_run: List[RenderJob] = []
+  up_to_date = 0
+  for root in roots:
+    for source in find_dot_files(root):
+      job = RenderJob(source, output_paths(source, root, output, formats), version)
+      if len(job.stale) == 0:
+        up_to_date += 1
+      else:
+        jobs_to_run.append(job)
+
+  failed: List[Tuple[Path, str]] = []
+  # dot runs in its own process, so threads suffice to render in parallel
+  with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+    for job, error in zip(jobs_to_run, executor.map(RenderJob.run, jobs_to_run)):
+      if error is not None:
+        failed.append((job.source, error))
+      elif verbose:
+        print("rendered:", job.source, "({})".format(", ".join(job.stale)))
+  return len(jobs_to_run) - len(failed), up_to_date, failed
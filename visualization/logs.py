@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Bump whenever the way files are scanned changes, invalidating indexes
+LOG_INDEX_VERSION = 1
+
+# Size of the blocks files are read and matched in
+BLOCK_SIZE = 1 << 20
+
+# Conventional name of an index, skipped when it is kept in the scanned directory
+INDEX_NAME = ".check-logs.json"
+
+# Longest part of a matching line kept in the report
+MAX_LINE_LENGTH = 500
+
+
+class Rule:
+  """A pattern to report lines of the logs for, unless they also contain one of the excluded strings."""
+
+  def __init__(self, name: str, category: str, pattern: str, exclude: Optional[List[str]] = None) -> None:
+    self.name = name
+    self.category = category
+    self.pattern = pattern
+    self.exclude = exclude or []
+    self.expression = re.compile(pattern.encode())
+
+  def matches(self, line: bytes) -> bool:
+    return self.expression.search(line) is not None and not any(exclude.encode() in line for exclude in self.exclude)
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {"name": self.name, "category": self.category, "pattern": self.pattern, "exclude": self.exclude}
+
+
+# The checks of data/checks/sanity-check-data.sh
+DEFAULT_RULES = [
+  Rule("warning", "warning", "warning", ["echo", "pool.c", "warnings generated"]),
+  Rule("non-sigtrap-stop", "error", "received non SIGTRAP: stopped"),
+  Rule("perf-event-open", "error", "perf_event_open"),
+]
+
+
+def read_rules(path: Path) -> List[Rule]:
+  """Read a rule set from a JSON list of objects with a name, category, pattern and optional exclude list."""
+  with open(path, "rt") as file:
+    rules = json.load(file)
+  return [Rule(rule["name"], rule["category"], rule["pattern"], rule.get("exclude")) for rule in rules]
+
+
+def rules_fingerprint(rules: List[Rule]) -> str:
+  digest = hashlib.sha256(str(LOG_INDEX_VERSION).encode())
+  digest.update(json.dumps([rule.to_dict() for rule in rules], sort_keys=True).encode())
+  return digest.hexdigest()
+
+
+class Finding:
+  """A line of a log matched by a rule."""
+
+  def __init__(self, path: str, line: int, rule: str, category: str, text: str) -> None:
+    self.path = path
+    self.line = line
+    self.rule = rule
+    self.category = category
+    self.text = text
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {"path": self.path, "line": self.line, "rule": self.rule, "category": self.category, "text": self.text}
+
+
+def scan_lines(path: Path, rules: List[Rule]) -> Iterator[Tuple[int, bytes]]:
+  """Yield the lines of a file that any of the rules' patterns match, along with their line numbers.
+
+  The file is read in large blocks matched against all patterns at once, so
+  only the few lines that contain a pattern are split out of a block.
+  """
+  # Anchors match at the start and end of every line, like grep
+  combined = re.compile(b"|".join(b"(?:" + rule.expression.pattern + b")" for rule in rules), re.MULTILINE)
+  line_number = 1
+  remainder = b""
+  with open(path, "rb") as file:
+    while True:
+      block = file.read(BLOCK_SIZE)
+      if len(block) == 0:
+        block, remainder = remainder, b""
+        if len(block) == 0:
+          return
+      else:
+        block = remainder + block
+        end = block.rfind(b"\n") + 1
+        if end == 0:
+          remainder = block
+          continue
+        block, remainder = block[:end], block[end:]
+
+      position = 0
+      for match in combined.finditer(block):
+        if match.start() < position:
+          # Another match on a line already yielded
+          continue
+        start = block.rfind(b"\n", 0, match.start()) + 1
+        end = block.find(b"\n", match.start())
+        end = len(block) if end == -1 else end
+        line_number += block.count(b"\n", position, start)
+        yield line_number, block[start:end]
+        position = end
+      line_number += block.count(b"\n", position)
+
+
+def scan_file(path: Path, relative: str, rules: List[Rule]) -> List[Finding]:
+  findings = []
+  for line_number, line in scan_lines(path, rules):
+    text = line.decode(errors="replace").strip()[:MAX_LINE_LENGTH]
+    for rule in rules:
+      if rule.matches(line):
+        findings.append(Finding(relative, line_number, rule.name, rule.category, text))
+  return findings
+
+
+def scan_file_in_worker(arguments: Tuple[Path, str, List[Rule]]) -> List[Dict[str, Any]]:
+  # Findings are returned as dicts, which are cheaper to send back from workers
+  path, relative, rules = arguments
+  return [finding.to_dict() for finding in scan_file(path, relative, rules)]
+
+
+def find_log_files(root: Path, index_path: Optional[Path]) -> Iterator[Tuple[Path, str, os.stat_result]]:
+  """Find every file below the root, like grep -r, skipping indexes."""
+  for directory, directories, names in os.walk(root):
+    directories.sort()
+    for name in sorted(names):
+      path = Path(directory, name)
+      if name == INDEX_NAME or (index_path is not None and path.resolve() == index_path.resolve()):
+        continue
+      stat = path.stat()
+      yield path, path.relative_to(root).as_posix(), stat
+
+
+def read_log_index(path: Path, rules: List[Rule]) -> Dict[str, Any]:
+  """Read the files scanned before, or nothing if the index is missing or was made with other rules."""
+  try:
+    with open(path, "rt") as file:
+      index = json.load(file)
+  except (OSError, ValueError):
+    return {}
+  if index.get("rules") != rules_fingerprint(rules):
+    return {}
+  return index.get("files", {})
+
+
+def write_log_index(path: Path, rules: List[Rule], files: Dict[str, Any]):
+  path.parent.mkdir(parents=True, exist_ok=True)
+  temporary_path = path.with_name(path.name + ".tmp")
+  with open(temporary_path, "wt") as file:
+    json.dump({"rules": rules_fingerprint(rules), "files": files}, file)
+  os.replace(temporary_path, path)
+
+
+class LogReport:
+  """The findings of a scan, grouped by environment and algorithm.
+
+  The environment and algorithm of a file are taken from the first two
+  directories of its path below the scanned directory.
+  """
+
+  def __init__(self, findings: List[Finding], scanned: int, skipped: int) -> None:
+    self.findings = findings
+    self.scanned = scanned
+    self.skipped = skipped
+    self.groups: Dict[Tuple[str, str], List[Finding]] = {}
+    for finding in findings:
+      parts = finding.path.split("/")[:-1]
+      key = (parts[0] if len(parts) > 0 else "-", parts[1] if len(parts) > 1 else "-")
+      self.groups.setdefault(key, []).append(finding)
+
+  def count(self, category: str) -> int:
+    return sum(1 for finding in self.findings if finding.category == category)
+
+  def to_dict(self) -> Dict[str, Any]:
+    return {
+      "scanned": self.scanned,
+      "skipped": self.skipped,
+      "groups": [
+        {"environment": environment, "algorithm": algorithm, "findings": [finding.to_dict() for finding in findings]}
+        for (environment, algorithm), findings in sorted(self.groups.items())
+      ],
+    }
+
+  def format(self) -> str:
+    lines = []
+    for (environment, algorithm), findings in sorted(self.groups.items()):
+      lines.append("=== {} / {} ===".format(environment, algorithm))
+      for category in sorted({finding.category for finding in findings}):
+        matching = [finding for finding in findings if finding.category == category]
+        lines.append("{} ({}):".format(category, len(matching)))
+        for finding in matching:
+          lines.append("  {}:{}: [{}] {}".format(finding.path, finding.line, finding.rule, finding.text))
+    lines.append("scanned {} files, {} unchanged, {} findings".format(self.scanned, self.skipped, len(self.findings)))
+    return "\n".join(lines)
+
+
+def check_logs(root: Path, rules: List[Rule], index_path: Optional[Path] = None, jobs: int = 1) -> LogReport:
+  """Scan every file below the root for the rules in a single pass per file.
+
+  Files whose size and modification time match the index are not read
+  again, their findings are taken from the index instead.
+  """
+  indexed = read_log_index(index_path, rules) if index_path is not None else {}
+  files: Dict[str, Any] = {}
+  pending: List[Tuple[Path, str, List[Rule]]] = []
+  for path, relative, stat in find_log_files(root, index_path):
+    entry = indexed.get(relative)
+    if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+      files[relative] = entry
+    else:
+      files[relative] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "findings": []}
+      pending.append((path, relative, rules))
+
+  if jobs > 1 and len(pending) > 1:
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+      # Keep the largest files from being scanned last, by a single worker
+      pending.sort(key=lambda x: -files[x[1]]["size"])
+      results = executor.map(scan_file_in_worker, pending, chunksize=max(1, len(pending) // (jobs * 8)))
+      for (_, relative, _), findings in zip(pending, results):
+        files[relative]["findings"] = findings
+  else:
+    for arguments in pending:
+      files[arguments[1]]["findings"] = scan_file_in_worker(arguments)
+  if index_path is not None:
+    write_log_index(index_path, rules, files)
+
+  findings = [Finding(**finding) for relative in sorted(files) for finding in files[relative]["findings"]]
+  return LogReport(findings, len(pending), len(files) - len(pending))
@@ -1,47 +1,47 @@
-import importlib
 import inspect
+import io
+import json
 import os
+import re
 import sqlite3
 import traceback
 from argparse import ArgumentParser, Namespace
-from typing import Dict, Type, cast, Any, Union, Tuple
+from contextlib import redirect_stdout, redirect_stderr, nullcontext
+from typing import ContextManager, Dict, List, Tuple, Type, cast, Any, Union, Optional, Mapping, TYPE_CHECKING
 from pathlib import Path
 
-from visualization.generators import generator_modules
 from visualization.graph import Graph
 from visualization.table import Table
-from matplotlib import pyplot
+from visualization.registry import LazyGenerators, LazySubParsersAction, load_generators
+from visualization.profiling import Profiler, PhaseRecord
 
-graph_generators: Dict[str, Type[Graph]] = {}
-table_generators: Dict[str, Type[Table]] = {}
+# Modules depending on numpy and matplotlib are imported by the commands using
+# them, so that listing generators or generating tables starts quickly
+if TYPE_CHECKING:
+  from visualization.database import Database
+  from visualization.renderer import Renderer
+
+graph_generators: Mapping[str, Type[Graph]] = {}
+table_generators: Mapping[str, Type[Table]] = {}
+renderer: Optional["Renderer"] = None
+# Set when writing a profile report
+profiler: Optional[Profiler] = None
 
 
 def initialize_generators():
+  """Register the generators listed in the generator manifest, without importing them."""
   global graph_generators, table_generators
-  for module_name in generator_modules:
-    qualified_module_name = "visualization.generators." + module_name
-    module = importlib.import_module(qualified_module_name, package=None)
-    for class_name, cls in inspect.getmembers(module, inspect.isclass):
-      # Only include classes defined in the module itself
-      if cls.__module__ != qualified_module_name:
-        continue
-      if issubclass(cls, Graph):
-        graph_generators[cls.get_command_name()] = cls
-      elif issubclass(cls, Table):
-        table_generators[cls.get_command_name()] = cls
-
-def connect_to_database(database_path: Path) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
-  with database_path.open("rb") as file:
-    header = file.read(100)
-    if len(header) != 100 or header[:16] != b"SQLite format 3\x00":
-      print("error: '{}' is not a valid database file".format(database_path))
-      exit(1)
+  graph_generators, table_generators = load_generators()
+
+def connect_to_database(database_path: Path, immutable: bool = False) -> "Database":
+  from visualization.database import open_database, is_database_file
+
+  if not is_database_file(database_path):
+    print("error: '{}' is not a valid database file".format(database_path))
+    exit(1)
 
   try:
-    connection = sqlite3.connect(
-        "file:{}?mode=ro".format(database_path), uri=True)
-    cursor = connection.cursor()
-    return (connection, cursor)
+    return open_database(database_path, immutable)
   except sqlite3.Error as exception:
     print("error: unable to connect to database")
     print("exception:")
@@ -50,14 +50,67 @@ def connect_to_database(database_path: Path) -> Tuple[sqlite3.Connection, sqlite
     traceback.print_exc()
     exit(1)
 
-def fetch_data(instance: Union[Table, Graph], database_path: Path) -> Any:
-  connection, cursor = connect_to_database(database_path)
+def initialize_worker(database_path: Path, immutable: bool, profiling: bool, trace_memory: bool):
+  """Prepare a pool worker with its own read-only connection and, when profiling, its own profiler."""
+  global profiler
+  if len(graph_generators) == 0 and len(table_generators) == 0:
+    initialize_generators()
+  connect_to_database(database_path, immutable)
+  profiler = Profiler(trace_memory) if profiling else None
+
+def profile(generator: str, input: Optional[Path], phase: str) -> ContextManager[PhaseRecord]:
+  """Measure a phase of generating an input when writing a profile report."""
+  if profiler is None:
+    return nullcontext(PhaseRecord(generator, None, phase))
+  return profiler.phase(generator, None if input is None else str(input), phase)
+
+def check_columnar_export(options: Namespace):
+  """Validate the columnar export of a command once, before it fetches any data, ignoring it if it is out of date."""
+  from visualization.columnar import open_columnar_store, is_columnar_store
+
+  columnar_path = getattr(options, "columnar", None)
+  if columnar_path is None:
+    return
+
+  if not is_columnar_store(columnar_path):
+    print("error: '{}' is not a columnar export".format(columnar_path))
+    exit(1)
+
+  if not open_columnar_store(columnar_path).is_export_of(cast(Path, options.database)):
+    print("warning: columnar export '{}' is out of date, reading from the database".format(columnar_path))
+    options.columnar = None
+
+def fetch_columnar_data(instance: Union[Table, Graph], options: Namespace) -> Any:
+  """Read data from a columnar export checked by check_columnar_export, or return None to read it from the database."""
+  from visualization.columnar import open_columnar_store
+
+  store = open_columnar_store(cast(Path, options.columnar))
+  try:
+    return instance.fetch_columnar_data(store)
+  except Exception as exception:
+    print("error: caught unexpected exception when reading columnar data")
+    print("exception:")
+    print(exception)
+    print("traceback:")
+    traceback.print_exc()
+    exit(1)
+
+def fetch_data(instance: Union[Table, Graph], options: Namespace) -> Any:
+  if hasattr(options, "prefetched_data"):
+    return options.prefetched_data
+
+  if getattr(options, "columnar", None) is not None:
+    data = fetch_columnar_data(instance, options)
+    if data is not None:
+      return data
+
+  database = connect_to_database(cast(Path, options.database), getattr(options, "immutable", False))
+  cursor = database.cursor()
 
   data = None
   try:
     data = instance.fetch_data(cursor)
     cursor.close()
-    connection.close()
   except sqlite3.Error as exception:
     print("error: unable to fetch data")
     print("exception:")
@@ -75,16 +128,35 @@ def fetch_data(instance: Union[Table, Graph], database_path: Path) -> Any:
   return data
 
 
-def graph(options: Namespace):
-  generator = graph_generators[options.graph]
+def fingerprint_output(instance: Union[Table, Graph], options: Namespace, data: Any) -> Optional[str]:
+  """Fingerprint the output of an incremental build, or return None if the build is not incremental."""
+  if not getattr(options, "incremental", False) or options.output is None:
+    return None
+  from visualization import build_cache
+  return build_cache.fingerprint(instance, options, data)
 
-  instance = generator(options)
 
-  database_path = cast(Path, options.database)
-  data = fetch_data(instance, database_path)
+def get_renderer() -> "Renderer":
+  """The renderer of this process, rendering inline unless all created a thread pool."""
+  global renderer
+  if renderer is None:
+    from visualization.renderer import Renderer
+    renderer = Renderer()
+  return renderer
+
 
+def render_graph(instance: Graph, options: Namespace, data: Any, current_fingerprint: Optional[str]):
+  """Draw and save a graph. Called on a renderer thread when rendering concurrently."""
+  from visualization import build_cache
+  from visualization.renderer import create_figure, save_figure
+
+  output_path = cast(Path, options.output)
   try:
-    instance.generate(pyplot, data)
+    with profile(options.graph, output_path, "generate"):
+      figure = create_figure(instance)
+      instance.generate(figure, data)
+    with profile(options.graph, output_path, "save"):
+      save_figure(figure, output_path)
   except Exception as exception:
     print("error: caught unexpected exception when graphing data")
     if options.verbose:
@@ -94,25 +166,72 @@ def graph(options: Namespace):
       traceback.print_exc()
     return
 
+  if current_fingerprint is not None:
+    build_cache.store_fingerprint(output_path, current_fingerprint)
+
+
+def show_graph(instance: Graph, data: Any):
+  """Draw a graph on a pyplot-managed figure and show it interactively."""
+  from matplotlib import pyplot
+
+  figure = pyplot.figure(**instance.figure_options)
+  try:
+    instance.generate(figure, data)
+  except Exception as exception:
+    print("error: caught unexpected exception when graphing data")
+    print("exception:")
+    print(exception)
+    print("traceback:")
+    traceback.print_exc()
+    pyplot.close(figure)
+    return
+  pyplot.show()
+
+
+def graph(options: Namespace):
+  from visualization import build_cache
+
+  generator = graph_generators[options.graph]
+
+  instance = generator(options)
+
+  with profile(options.graph, options.output, "fetch_data") as record:
+    data = fetch_data(instance, options)
+    record.measure(data)
+
   output_path = cast(Path, options.output)
+  current_fingerprint = fingerprint_output(instance, options, data)
+  if current_fingerprint is not None and build_cache.is_up_to_date(output_path, current_fingerprint):
+    print("up to date:", output_path)
+    return
+
   if output_path is None:
-    pyplot.show()
+    show_graph(instance, data)
   else:
-    pyplot.savefig(output_path, bbox_inches="tight")
-  pyplot.close("all")
+    get_renderer().submit(render_graph, instance, options, data, current_fingerprint)
 
 
 def table(options: Namespace):
+  from visualization import build_cache
+
   generator = table_generators[options.table]
 
   instance = generator(options)
 
-  database_path = cast(Path, options.database)
-  data = fetch_data(instance, database_path)
+  with profile(options.table, options.output, "fetch_data") as record:
+    data = fetch_data(instance, options)
+    record.measure(data)
+
+  output_path = cast(Path, options.output)
+  current_fingerprint = fingerprint_output(instance, options, data)
+  if current_fingerprint is not None and build_cache.is_up_to_date(output_path, current_fingerprint):
+    print("up to date:", output_path)
+    return
 
   output = ""
   try:
-    output = inspect.cleandoc(instance.generate(data))
+    with profile(options.table, output_path, "generate"):
+      output = inspect.cleandoc(instance.generate(data))
   except Exception as exception:
     print("error: caught unexpected exception when generating table")
     if options.verbose:
@@ -122,88 +241,420 @@ def table(options: Namespace):
       traceback.print_exc()
     return
 
-  output_path = cast(Path, options.output)
   if output_path is None:
     print(output)
   else:
-    with open(output_path, "wt") as file:
-      file.write(output)
+    # Leave unchanged tables untouched to not trigger needless LaTeX rebuilds
+    with profile(options.table, output_path, "save"):
+      if not output_path.exists() or output_path.read_text() != output:
+        with open(output_path, "wt") as file:
+          file.write(output)
+    if current_fingerprint is not None:
+      build_cache.store_fingerprint(output_path, current_fingerprint)
 
 
 def ls(options: Namespace):
   """List available graphs."""
   print("{:20s} {:20s} {:20s}".format("Name", "Description", "Type"))
-  for generator in graph_generators.values():
-    print("{:20s} {:20s} {:20s}".format(
-        generator.get_name(), generator.get_description(), "Graph"))
-  for generator in table_generators.values():
-    print("{:20s} {:20s} {:20s}".format(
-        generator.get_name(), generator.get_description(), "Table"))
+  # Names and descriptions are read from the manifest to not import any generator
+  for entry in cast(LazyGenerators, graph_generators).entries.values():
+    print("{:20s} {:20s} {:20s}".format(entry.name, entry.description, "Graph"))
+  for entry in cast(LazyGenerators, table_generators).entries.values():
+    print("{:20s} {:20s} {:20s}".format(entry.name, entry.description, "Table"))
 
 def all(options: Namespace):
-  """Run all."""
-  generator = None
-  generator_handler = None
-  if options.name in table_generators:
-    generator = table_generators[options.name]
-    generator_handler = table
-  if options.name in graph_generators:
-    generator = graph_generators[options.name]
-    generator_handler = graph
-  if generator is None:
-    print("No such generator '{}'".format(options.name))
+  """Run all inputs of one or more generators."""
+  names = options.names or []
+  if options.every:
+    names = list(table_generators.keys()) + list(graph_generators.keys())
+  if len(names) == 0:
+    print("error: expected at least one --name or --every")
+    exit(1)
+  for name in names:
+    if name not in table_generators and name not in graph_generators:
+      print("No such generator '{}'".format(name))
+      exit(1)
+
+  # Generators share a single connection and query cache for the entire run
+  database = connect_to_database(options.database, options.immutable)
+
+  global renderer
+  executor = None
+  if options.jobs > 1:
+    from concurrent.futures import ProcessPoolExecutor
+    executor = ProcessPoolExecutor(max_workers=options.jobs, initializer=initialize_worker,
+                                   initargs=(options.database, options.immutable, profiler is not None, options.profile_allocations))
+  elif options.render_threads > 1 and profiler is None:
+    # Graphs are drawn and saved on threads while the next inputs are fetched
+    from visualization.renderer import Renderer
+    renderer = Renderer(options.render_threads)
+  try:
+    # Handle one generator at a time to only keep its prefetched data in memory
+    for name in names:
+      generated_inputs = fetch_generated_inputs(name, database, options)
+      if executor is None:
+        for generated_options in generated_inputs:
+          generate_input(generated_options)
+      else:
+        # Results are yielded in input order, keeping the log identical to a serial run
+        for output, records in executor.map(generate_input_in_worker, generated_inputs):
+          print(output, end="", flush=True)
+          if profiler is not None:
+            profiler.records.extend(records)
+  finally:
+    if executor is not None:
+      executor.shutdown()
+    if renderer is not None:
+      renderer.close()
+
+  if options.verbose and executor is None:
+    print(database.format_statistics())
+
+def export_columnar_command(options: Namespace):
+  """Export the fact tables of a database to memory-mappable column files."""
+  from visualization.columnar import export_columnar
+
+  database = connect_to_database(options.database, options.immutable)
+  options.output.mkdir(parents=True, exist_ok=True)
+  try:
+    export_columnar(database, options.output, options.verbose)
+  except sqlite3.Error as exception:
+    print("error: unable to export columnar data")
+    print("exception:")
+    print(exception)
+    print("traceback:")
+    traceback.print_exc()
+    exit(1)
+
+def prepare(options: Namespace):
+  """Flatten the fact tables of a database into a sidecar next to it, read instead of the database while fresh.
+
+  An existing sidecar is updated with the benchmark runs added since it was prepared.
+  """
+  from visualization.database import is_database_file
+  from visualization.facts import facts_path_of, prepare_facts
+
+  if not is_database_file(options.database):
+    print("error: '{}' is not a valid database file".format(options.database))
+    exit(1)
+
+  facts_path = facts_path_of(options.database)
+  try:
+    prepare_facts(options.database, facts_path, options.verbose, options.rebuild)
+  except sqlite3.Error as exception:
+    print("error: unable to prepare '{}'".format(facts_path))
+    print("exception:")
+    print(exception)
+    print("traceback:")
+    traceback.print_exc()
+    exit(1)
+  if options.verbose:
+    print("wrote:", facts_path)
+
+def import_xkcp(options: Namespace):
+  """Import XKCP benchmark reports into a database, one benchmark run per report."""
+  from visualization.xkcp import read_xkcp_report, import_xkcp_results
+
+  connection = sqlite3.connect(options.database)
+  for i, report in enumerate(options.reports):
+    try:
+      results = read_xkcp_report(report)
+      run_index = None if options.run_index is None else options.run_index + i
+      _, run_index = import_xkcp_results(connection, results, options.environment, options.compiler, run_index)
+      connection.commit()
+    except (OSError, ValueError, sqlite3.Error) as exception:
+      connection.rollback()
+      print("error: unable to import '{}'".format(report))
+      print("exception:")
+      print(exception)
+      exit(1)
+    if options.verbose:
+      print("imported: {} ({} implementations, run {})".format(report, len(results), run_index))
+  connection.close()
+
+def check_logs_command(options: Namespace):
+  """Scan the logs of a data collection for warnings and errors, reporting them by environment and algorithm."""
+  from visualization.logs import DEFAULT_RULES, check_logs, read_rules
+
+  try:
+    rules = read_rules(options.rules) if options.rules is not None else DEFAULT_RULES
+    report = check_logs(options.path, rules, options.index, options.jobs)
+  except (OSError, ValueError, KeyError, re.error) as exception:
+    print("error: unable to check logs in '{}'".format(options.path))
+    print("exception:")
+    print(exception)
+    exit(1)
+
+  print(report.format())
+  if options.output is not None:
+    with open(options.output, "wt") as file:
+      json.dump(report.to_dict(), file, indent=2)
+  if report.count("error") > 0:
+    exit(1)
+
+def hot_paths(options: Namespace):
+  """Write the hot paths of the roots of a callgrind profile as DOT graphs."""
+  from visualization.callgrind.parser import read_profile
+  from visualization.callgrind.callgraph import CallGraph, HotPath
+  from visualization.callgrind.dot import format_hot_path
+
+  try:
+    profile = read_profile(options.profile)
+    call_graph = CallGraph(profile, options.event)
+    roots = [(root, call_graph.find(root)) for root in options.roots or ["crypto_kem_keypair", "crypto_kem_enc", "crypto_kem_dec"]]
+  except (ValueError, KeyError, IndexError) as exception:
+    print("error: unable to read profile '{}'".format(options.profile))
+    print("exception:")
+    print(exception)
+    exit(1)
+
+  options.output.mkdir(parents=True, exist_ok=True)
+  for name, root in roots:
+    output_path = options.output.joinpath("{}.dot".format(name))
+    with open(output_path, "wt") as file:
+      file.write(format_hot_path(HotPath(call_graph, root, options.threshold)))
+    if options.verbose:
+      print("wrote:", output_path)
+
+def flame_graph(options: Namespace):
+  """Draw the cost of the call stacks of a callgrind profile as flame graphs, one per root."""
+  from matplotlib.figure import Figure
+  from visualization.callgrind.parser import read_profile
+  from visualization.callgrind.callgraph import CallGraph
+  from visualization.callgrind.flame import build_frame_tree, collapse_stacks, entry_functions, format_collapsed_stacks, function_names
+  from visualization.flame import draw_flame_graph
+
+  try:
+    profile = read_profile(options.profile)
+    call_graph = CallGraph(profile, options.event)
+    # Without a root, the whole program is drawn from where it starts
+    roots = [(root, [call_graph.find(root)]) for root in options.roots] if options.roots else [("all", entry_functions(call_graph))]
+  except (ValueError, KeyError, IndexError) as exception:
+    print("error: unable to read profile '{}'".format(options.profile))
+    print("exception:")
+    print(exception)
+    exit(1)
+
+  names = function_names(call_graph)
+  options.output.mkdir(parents=True, exist_ok=True)
+  for name, functions in roots:
+    stacks = [stack for function in functions for stack in collapse_stacks(call_graph, function, options.threshold)]
+    tree = build_frame_tree(stacks, names)
+    depth = max([len(path) for path, _ in stacks], default=0) + 1
+    figure = Figure(layout="tight", figsize=(12, max(3.0, 1.0 + 0.2 * depth)))
+    axes = figure.subplots()
+    draw_flame_graph(axes, tree, minimum_fraction=options.threshold / 100, icicle=options.icicle)
+    axes.set_title("{} of {} in {}".format(options.event, name, options.profile.name), fontsize=8)
+    axes.set_xlabel(options.event)
+    output_path = options.output.joinpath("{}.{}".format(name, options.format))
+    figure.savefig(output_path)
+    if options.verbose:
+      print("wrote:", output_path)
+    if options.collapsed:
+      collapsed_path = options.output.joinpath("{}.collapsed".format(name))
+      with open(collapsed_path, "wt") as file:
+        file.write(format_collapsed_stacks(stacks, names))
+      if options.verbose:
+        print("wrote:", collapsed_path)
+
+def render_dot(options: Namespace):
+  """Render the DOT files below the given paths whose content changed since they were last rendered."""
+  from visualization.graphviz import render_dot_files
+
+  try:
+    rendered, up_to_date, failed = render_dot_files(options.paths, options.formats, options.output, options.jobs, options.verbose)
+  except FileNotFoundError as exception:
+    print("error: unable to render graphs")
+    print("exception:")
+    print(exception)
+    exit(1)
+
+  for source, error in failed:
+    print("error: unable to render '{}'".format(source))
+    print(error)
+  if options.verbose:
+    print("rendered {} graphs, {} up to date, {} failed".format(rendered, up_to_date, len(failed)))
+  if len(failed) > 0:
+    exit(1)
+
+def annotate(options: Namespace):
+  """Annotate the source of a function with the share of its cost spent on every line."""
+  from visualization.callgrind.parser import read_profile
+  from visualization.callgrind.annotate import Annotation, select_function
+
+  try:
+    profile = read_profile(options.profile, line_costs=[options.function])
+    if profile.positions.count("line") == 0:
+      raise ValueError("the profile has no line numbers, record it with --dump-line=yes")
+    event = profile.event_index(options.event)
+    function = select_function(profile, options.function, options.source, event)
+    with open(options.source, "rt") as file:
+      source = file.read()
+    annotation = Annotation(function, event, source, options.first_line, options.threshold, options.highlight)
+  except (ValueError, KeyError, IndexError) as exception:
+    print("error: unable to annotate '{}'".format(options.function))
+    print("exception:")
+    print(exception)
+    exit(1)
+
+  if annotation.unmatched >= options.threshold:
+    print("warning: {:.2f}% of the cost is on lines outside of '{}'".format(annotation.unmatched, options.source))
+  if options.output is None:
+    print(annotation.format(), end="")
+  else:
+    with open(options.output, "wt") as file:
+      file.write(annotation.format())
+
+def callgrind(options: Namespace):
+  """Query the most expensive functions of a callgrind profile, or the callers and callees of a function."""
+  from visualization.callgrind.index import open_index
+
+  try:
+    index = open_index(options.profile, options.index, options.verbose)
+    total = index.total(options.event)
+    if options.query == "index":
+      return
+
+    def describe(function: int) -> str:
+      name = index.name(function)
+      if len(index.find(name)) > 1:
+        name = "{} ({})".format(name, index.file(function).rsplit("/", 1)[-1])
+      if index["cycle"][function]:
+        name += " (cycle)"
+      return name
+
+    def percentage(cost: int) -> float:
+      return 100.0 * cost / total if total > 0 else 0.0
+
+    if options.query == "diff":
+      from visualization.callgrind.diff import ProfileDiff, format_diff_dot, format_relative
+
+      diff = ProfileDiff(index, open_index(options.other, verbose=options.verbose), options.event)
+      print("Total {}: {} before, {} after ({})".format(options.event, diff.totals[0], diff.totals[1],
+                                                      format_relative((diff.totals[1] - diff.totals[0]) / diff.totals[0] if diff.totals[0] > 0 else None, diff.totals[1] - diff.totals[0])))
+      print("{:>16s} {:>16s} {:>16s} {:>9s}  {:>16s} {:>16s} {:>16s} {:>9s}  {}".format(
+        "Inclusive", "After", "Delta", "Relative", "Exclusive", "After", "Delta", "Relative", "Function"))
+      changed = [function for function in diff.ranked(options.exclusive) if function.delta() != 0 or function.delta(True) != 0]
+      for function in changed[:options.limit]:
+        print("{:>16d} {:>16d} {:>+16d} {:>9s}  {:>16d} {:>16d} {:>+16d} {:>9s}  {}".format(
+          function.inclusive[0], function.inclusive[1], function.delta(), format_relative(function.relative(), function.delta()),
+          function.exclusive[0], function.exclusive[1], function.delta(True), format_relative(function.relative(True), function.delta(True)),
+          function.name))
+      if options.dot is not None:
+        with open(options.dot, "wt") as file:
+          file.write(format_diff_dot(diff, options.threshold, options.limit))
+      return
+
+    if options.query == "top":
+      print("{:>16s} {:>8s}  {}".format(options.event, "%", "Function"))
+      for function, cost in index.top(options.event, not options.exclusive, options.limit):
+        print("{:>16d} {:>7.2f}%  {}".format(cost, percentage(cost), describe(function)))
+      return
+
+    functions = index.find(options.function)
+    if len(functions) == 0:
+      raise ValueError("the profile has no function named '{}'".format(options.function))
+    event = index.event_index(options.event)
+    for function in functions:
+      print("{}: {} inclusive ({:.2f}%), {} exclusive ({:.2f}%)".format(
+        describe(function),
+        index["inclusive"][function, event], percentage(index["inclusive"][function, event]),
+        index["exclusive"][function, event], percentage(index["exclusive"][function, event])))
+      calls = index.callers(function, options.event) if options.query == "callers" else index.callees(function, options.event)
+      print("{:>16s} {:>8s} {:>10s}  {}".format(options.event, "%", "Calls", "Caller" if options.query == "callers" else "Callee"))
+      for other, count, cost in calls[:options.limit]:
+        print("{:>16d} {:>7.2f}% {:>10d}  {}".format(cost, percentage(cost), count, describe(other)))
+  except (ValueError, KeyError, IndexError) as exception:
+    print("error: unable to query profile '{}'".format(options.profile))
+    print("exception:")
+    print(exception)
     exit(1)
 
-  connection, cursor = connect_to_database(options.database)
+def fetch_generated_inputs(name: str, database: "Database", options: Namespace) -> List[Namespace]:
+  """Create the options of every input of a generator for the all command."""
+  generator: Union[Type[Table], Type[Graph]]
+  if name in graph_generators:
+    generator = graph_generators[name]
+    generator_handler = graph
+  else:
+    generator = table_generators[name]
+    generator_handler = table
+
+  cursor = database.cursor()
   inputs = []
+  all_data = None
   try:
-    inputs = generator.fetch_all_inputs(cursor)
+    with profile(name, None, "fetch_all_inputs") as record:
+      inputs = generator.fetch_all_inputs(cast(sqlite3.Cursor, cursor))
+      record.measure(inputs)
+    # Generators may fetch the data of every input at once instead of once per input
+    with profile(name, None, "fetch_all_data") as record:
+      all_data = generator.fetch_all_data(cast(sqlite3.Cursor, cursor), inputs)
+      record.measure(all_data)
     cursor.close()
-    connection.close()
   except sqlite3.Error as exception:
-    print("error: unable to fetch all inputs")
+    print("error: unable to fetch all inputs of '{}'".format(name))
     if options.verbose:
       print("exception:")
       print(exception)
       print("traceback:")
       traceback.print_exc()
-    exit(1)
+    return []
   except Exception as exception:
-    print("error: caught unexpected exception when fetching all inputs")
+    print("error: caught unexpected exception when fetching all inputs of '{}'".format(name))
     if options.verbose:
       print("exception:")
       print(exception)
       print("traceback:")
       traceback.print_exc()
-    exit(1)
+    return []
 
-  for input in inputs:
+  generated_inputs = []
+  for i, input in enumerate(inputs):
     features = "_".join([str(x) for x in input.values()])
     input["database"] = options.database
+    input["immutable"] = options.immutable
     input["command"] = generator_handler
     input["verbose"] = options.verbose
+    input["incremental"] = options.incremental
+    input["columnar"] = options.columnar
     output_path = cast(Path, options.output)
-    output_path = output_path.joinpath(options.name, features)
+    output_path = output_path.joinpath(name, features)
     if generator_handler is graph:
-      input["graph"] = options.name
+      input["graph"] = name
       output_path = output_path.with_suffix(".pdf")
     elif generator_handler is table:
-      input["table"] = options.name
+      input["table"] = name
       output_path = output_path.with_suffix(".tex")
     input["output"] = output_path
-    generated_options = Namespace(**input)
-    try:
-      print("=== Generating {} ===".format(output_path))
-      output_path.parent.mkdir(parents=True, exist_ok=True)
-      generated_options.command(generated_options)
-    except Exception as exception:
-      if options.verbose:
-        print("error: caught unexpected exception when fetching all inputs")
-        print("exception:")
-        print(exception)
-        print("traceback:")
-        traceback.print_exc()
-      print("generator failed:", output_path)
+    if all_data is not None:
+      input["prefetched_data"] = all_data[i]
+    generated_inputs.append(Namespace(**input))
+  return generated_inputs
+
+def generate_input(generated_options: Namespace):
+  """Generate the output of a single input of the all command."""
+  output_path = cast(Path, generated_options.output)
+  try:
+    print("=== Generating {} ===".format(output_path))
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    generated_options.command(generated_options)
+  except (Exception, SystemExit) as exception:
+    if generated_options.verbose:
+      print("error: caught unexpected exception when generating input")
+      print("exception:")
+      print(exception)
+      print("traceback:")
+      traceback.print_exc()
+    print("generator failed:", output_path)
+
+def generate_input_in_worker(generated_options: Namespace) -> Tuple[str, List[Dict[str, Any]]]:
+  """Generate a single input in a pool worker, returning everything it logged and its profile records."""
+  output = io.StringIO()
+  with redirect_stdout(output), redirect_stderr(output):
+    generate_input(generated_options)
+  records = profiler.take_records() if profiler is not None else []
+  return output.getvalue(), records
 
 def parse_file_path(parser, should_exist=False):
   """Parses a file path."""
@@ -218,6 +669,20 @@ def parse_file_path(parser, should_exist=False):
   return wrapper
 
 
+def parse_directory_path(parser):
+  """Parses the path of an existing directory."""
+  def wrapper(raw_path: str):
+    path = Path(raw_path)
+    # An empty path would otherwise be the working directory
+    if raw_path == "":
+      parser.error("Empty directory path")
+    elif not path.is_dir():
+      parser.error("No such directory: '{}'".format(path))
+    else:
+      return path
+  return wrapper
+
+
 def main():
   initialize_generators()
   parser = ArgumentParser(description="A graphing application")
@@ -228,31 +693,48 @@ def main():
   graph_parser = subparsers.add_parser("graph")
   graph_parser.add_argument("-d", "--database", required=True, type=parse_file_path(
   graph_parser, should_exist=True), help="Path to database file")
+  graph_parser.add_argument("--immutable", action="store_true",
+                            help="Open the database as immutable. Only use for archived databases that are never modified")
   graph_parser.add_argument("-v", "--verbose", dest="verbose",
                            action="store_true", help="Log verbose errors")
   graph_parser.set_defaults(verbose=False)
+  graph_parser.add_argument("--profile-report", type=parse_file_path(graph_parser),
+                            help="Write the wall time, fetched rows and bytes and peak memory of every phase as JSON")
+  graph_parser.add_argument("--profile-allocations", action="store_true",
+                            help="Also trace Python allocations for the peak memory of every phase. Slows generation down considerably")
+  graph_parser.add_argument("--columnar", type=parse_file_path(graph_parser),
+                            help="Path to a columnar export of the database to read data from, when supported by the generator")
   graph_parser.add_argument(
       "-o", "--output", type=parse_file_path(graph_parser), help="Path to output file")
 
-  graph_subparser = graph_parser.add_subparsers(dest="graph")
+  # The arguments of a generator are only added once it is selected
+  graph_subparser = graph_parser.add_subparsers(dest="graph", action=LazySubParsersAction, generators=graph_generators)
   graph_subparser.required = True
-  for generator in graph_generators.values():
-    generator_parser = generator.create_argument_parser(graph_subparser)
+  for name in graph_generators:
+    generator_parser = graph_subparser.add_parser(name)
     generator_parser.set_defaults(command=graph)
 
   table_parser = subparsers.add_parser("table")
   table_parser.add_argument("-d", "--database", required=True, type=parse_file_path(
   table_parser, should_exist=True), help="Path to database file")
+  table_parser.add_argument("--immutable", action="store_true",
+                            help="Open the database as immutable. Only use for archived databases that are never modified")
   table_parser.add_argument("-v", "--verbose", dest="verbose",
                            action="store_true", help="Log verbose errors")
   table_parser.set_defaults(verbose=False)
+  table_parser.add_argument("--profile-report", type=parse_file_path(table_parser),
+                            help="Write the wall time, fetched rows and bytes and peak memory of every phase as JSON")
+  table_parser.add_argument("--profile-allocations", action="store_true",
+                            help="Also trace Python allocations for the peak memory of every phase. Slows generation down considerably")
+  table_parser.add_argument("--columnar", type=parse_file_path(table_parser),
+                            help="Path to a columnar export of the database to read data from, when supported by the generator")
   table_parser.add_argument(
       "-o", "--output", type=parse_file_path(table_parser), help="Path to output file")
 
-  table_subparser = table_parser.add_subparsers(dest="table")
+  table_subparser = table_parser.add_subparsers(dest="table", action=LazySubParsersAction, generators=table_generators)
   table_subparser.required = True
-  for generator in table_generators.values():
-    generator_parser = generator.create_argument_parser(table_subparser)
+  for name in table_generators:
+    generator_parser = table_subparser.add_parser(name)
     generator_parser.set_defaults(command=table)
 
   all_parsers = subparsers.add_parser("all")
@@ -260,16 +742,167 @@ def main():
       all_parsers, should_exist=True), help="Path to database file")
   all_parsers.add_argument(
       "-o", "--output", required=True, type=parse_file_path(all_parsers), help="Path to output directory")
-  all_parsers.add_argument("-n", "--name", required=True, type=str, help="Name of the table or graph to generate")
+  all_parsers.add_argument("-n", "--name", dest="names", action="append", type=str,
+                           help="Name of the table or graph to generate. May be given multiple times")
+  all_parsers.add_argument("--every", action="store_true", help="Generate every registered table and graph")
+  all_parsers.add_argument("--immutable", action="store_true",
+                           help="Open the database as immutable. Only use for archived databases that are never modified")
   all_parsers.add_argument("-v", "--verbose", dest="verbose", action="store_true", help="Log verbose errors")
+  all_parsers.add_argument("-i", "--incremental", action="store_true",
+                           help="Only regenerate outputs whose generator, options or data changed since the last build")
+  all_parsers.add_argument("-j", "--jobs", type=int, default=1, help="Number of worker processes to generate inputs with")
+  all_parsers.add_argument("--render-threads", type=int, default=1,
+                           help="Number of threads to render graphs with while fetching data. Only used without --jobs or --profile-report")
+  all_parsers.add_argument("--columnar", type=parse_file_path(all_parsers),
+                           help="Path to a columnar export of the database to read data from, when supported by the generator")
   all_parsers.set_defaults(verbose=False)
+  all_parsers.add_argument("--profile-report", type=parse_file_path(all_parsers),
+                           help="Write the wall time, fetched rows and bytes and peak memory of every phase as JSON")
+  all_parsers.add_argument("--profile-allocations", action="store_true",
+                           help="Also trace Python allocations for the peak memory of every phase. Slows generation down considerably")
   all_parsers.set_defaults(command=all)
 
+  export_parser = subparsers.add_parser("export-columnar")
+  export_parser.add_argument("-d", "--database", required=True, type=parse_file_path(
+      export_parser, should_exist=True), help="Path to database file")
+  export_parser.add_argument(
+      "-o", "--output", required=True, type=parse_file_path(export_parser), help="Path to output directory")
+  export_parser.add_argument("--immutable", action="store_true",
+                             help="Open the database as immutable. Only use for archived databases that are never modified")
+  export_parser.add_argument("-v", "--verbose", dest="verbose", action="store_true", help="Log exported tables")
+  export_parser.set_defaults(verbose=False)
+  export_parser.set_defaults(command=export_columnar_command)
+
+  prepare_parser = subparsers.add_parser("prepare")
+  prepare_parser.add_argument("-d", "--database", required=True, type=parse_file_path(
+      prepare_parser, should_exist=True), help="Path to database file")
+  prepare_parser.add_argument("--rebuild", action="store_true", help="Prepare the sidecar from scratch instead of updating it")
+  prepare_parser.add_argument("-v", "--verbose", dest="verbose", action="store_true", help="Log prepared tables")
+  prepare_parser.set_defaults(verbose=False)
+  prepare_parser.set_defaults(command=prepare)
+
+  import_parser = subparsers.add_parser("import-xkcp")
+  import_parser.add_argument("-d", "--database", required=True, type=parse_file_path(
+      import_parser), help="Path to database file, created if missing")
+  import_parser.add_argument("-e", "--environment", required=True, type=str, help="Name of the environment the reports were recorded in")
+  import_parser.add_argument("--compiler", type=str, default="", help="Compiler XKCP was built with, if known")
+  import_parser.add_argument("--run-index", type=int,
+                             help="Run index of the first report. Defaults to following the environment's last run")
+  import_parser.add_argument("reports", nargs="+", type=parse_file_path(import_parser, should_exist=True),
+                             help="Paths to the output of XKCP's benchmark")
+  import_parser.add_argument("-v", "--verbose", dest="verbose", action="store_true", help="Log imported reports")
+  import_parser.set_defaults(verbose=False)
+  import_parser.set_defaults(command=import_xkcp)
+
+  check_logs_parser = subparsers.add_parser("check-logs")
+  check_logs_parser.add_argument("path", type=parse_directory_path(check_logs_parser),
+                                 help="Path to data collection directory")
+  check_logs_parser.add_argument("-r", "--rules", type=parse_file_path(check_logs_parser, should_exist=True),
+                                 help="Path to a JSON list of rules with a name, category, pattern and optional exclude list. Defaults to warnings, non SIGTRAP stops and perf_event_open errors")
+  check_logs_parser.add_argument("--index", type=parse_file_path(check_logs_parser),
+                                 help="Path to an index of scanned files, to skip unchanged files on the next check. Every file is scanned without one")
+  check_logs_parser.add_argument("-o", "--output", type=parse_file_path(check_logs_parser), help="Path to write the report to as JSON")
+  check_logs_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of files to scan at once")
+  check_logs_parser.set_defaults(command=check_logs_command)
+
+  hot_paths_parser = subparsers.add_parser("hot-paths")
+  hot_paths_parser.add_argument("-p", "--profile", required=True, type=parse_file_path(
+      hot_paths_parser, should_exist=True), help="Path to callgrind profile")
+  hot_paths_parser.add_argument(
+      "-o", "--output", required=True, type=parse_file_path(hot_paths_parser), help="Path to output directory")
+  hot_paths_parser.add_argument("-r", "--root", dest="roots", action="append", type=str,
+                                help="Function to root a graph at. May be given multiple times. Defaults to the KEM operations")
+  hot_paths_parser.add_argument("-t", "--threshold", type=float, default=1.0,
+                                help="Percentage of the root's cost a call must account for to be included")
+  hot_paths_parser.add_argument("--event", type=str, default="Ir", help="Event to weigh calls by")
+  hot_paths_parser.add_argument("-v", "--verbose", dest="verbose", action="store_true", help="Log written graphs")
+  hot_paths_parser.set_defaults(verbose=False)
+  hot_paths_parser.set_defaults(command=hot_paths)
+
+  flame_graph_parser = subparsers.add_parser("flame-graph")
+  flame_graph_parser.add_argument("-p", "--profile", required=True, type=parse_file_path(
+      flame_graph_parser, should_exist=True), help="Path to callgrind profile")
+  flame_graph_parser.add_argument(
+      "-o", "--output", required=True, type=parse_file_path(flame_graph_parser), help="Path to output directory")
+  flame_graph_parser.add_argument("-r", "--root", dest="roots", action="append", type=str,
+                                  help="Function to root a graph at. May be given multiple times. Defaults to the whole program")
+  flame_graph_parser.add_argument("-t", "--threshold", type=float, default=0.1,
+                                  help="Percentage of the root's cost a call stack must account for to be drawn")
+  flame_graph_parser.add_argument("--event", type=str, default="Ir", help="Event to weigh call stacks by")
+  flame_graph_parser.add_argument("-f", "--format", choices=["pdf", "svg", "png"], default="pdf", help="Format of the graphs")
+  flame_graph_parser.add_argument("--icicle", action="store_true", help="Draw the roots at the top, as icicle charts")
+  flame_graph_parser.add_argument("--collapsed", action="store_true",
+                                  help="Also write the call stacks in the collapsed format of flamegraph.pl")
+  flame_graph_parser.add_argument("-v", "--verbose", dest="verbose", action="store_true", help="Log written graphs")
+  flame_graph_parser.set_defaults(verbose=False)
+  flame_graph_parser.set_defaults(command=flame_graph)
+
+  render_parser = subparsers.add_parser("render-dot")
+  render_parser.add_argument("paths", nargs="+", type=Path, help="DOT files or directories to find DOT files in")
+  render_parser.add_argument("-o", "--output", type=Path,
+                             help="Path to output directory, mirroring the given directories. Defaults to a build directory in each")
+  render_parser.add_argument("-f", "--format", dest="formats", nargs="+", choices=["pdf", "svg", "png"], default=["pdf"],
+                             help="Formats to render each graph to")
+  render_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of graphs to render at once")
+  render_parser.add_argument("-v", "--verbose", dest="verbose", action="store_true", help="Log rendered graphs")
+  render_parser.set_defaults(verbose=False)
+  render_parser.set_defaults(command=render_dot)
+
+  annotate_parser = subparsers.add_parser("annotate")
+  annotate_parser.add_argument("-p", "--profile", required=True, type=parse_file_path(
+      annotate_parser, should_exist=True), help="Path to callgrind profile")
+  annotate_parser.add_argument("-f", "--function", required=True, type=str, help="Name of the function to annotate")
+  annotate_parser.add_argument("-s", "--source", required=True, type=parse_file_path(
+      annotate_parser, should_exist=True), help="Path to the source of the function, either the whole file or the function alone")
+  annotate_parser.add_argument(
+      "-o", "--output", type=parse_file_path(annotate_parser), help="Path to output file. Defaults to printing the annotated source")
+  annotate_parser.add_argument("--first-line", type=int,
+                               help="Line of the original file the source starts at. Defaults to aligning the function's definition")
+  annotate_parser.add_argument("-t", "--threshold", type=float, default=1.0,
+                               help="Percentage of the function's cost a line must account for to be annotated")
+  annotate_parser.add_argument("--highlight", type=float, default=25.0,
+                               help="Percentage of the function's cost an innermost loop must account for to be highlighted")
+  annotate_parser.add_argument("--event", type=str, default="Ir", help="Event to annotate the cost of")
+  annotate_parser.set_defaults(command=annotate)
+
+  callgrind_parser = subparsers.add_parser("callgrind")
+  callgrind_parser.add_argument("-p", "--profile", required=True, type=parse_file_path(
+      callgrind_parser, should_exist=True), help="Path to callgrind profile")
+  callgrind_parser.add_argument("--index", type=parse_file_path(callgrind_parser),
+                                help="Path to the index of the profile, created when missing or out of date. Defaults to the profile's path with .index appended")
+  callgrind_parser.add_argument("--event", type=str, default="Ir", help="Event to report the cost of")
+  callgrind_parser.add_argument("-v", "--verbose", dest="verbose", action="store_true", help="Log when indexing the profile")
+  callgrind_parser.set_defaults(verbose=False)
+  callgrind_parser.set_defaults(command=callgrind)
+  callgrind_subparser = callgrind_parser.add_subparsers(dest="query")
+  callgrind_subparser.required = True
+  callgrind_subparser.add_parser("index", help="Only index the profile")
+  top_parser = callgrind_subparser.add_parser("top", help="List the most expensive functions")
+  top_parser.add_argument("--exclusive", action="store_true", help="Rank by exclusive rather than inclusive cost")
+  callers_parser = callgrind_subparser.add_parser("callers", help="List the callers of a function")
+  callers_parser.add_argument("function", type=str)
+  callees_parser = callgrind_subparser.add_parser("callees", help="List the callees of a function")
+  callees_parser.add_argument("function", type=str)
+  diff_parser = callgrind_subparser.add_parser("diff", help="Compare the cost of every function with another profile")
+  diff_parser.add_argument("other", type=parse_file_path(diff_parser, should_exist=True), help="Path to the profile to compare with")
+  diff_parser.add_argument("--exclusive", action="store_true", help="Rank by the change of exclusive rather than inclusive cost")
+  diff_parser.add_argument("--dot", type=parse_file_path(diff_parser), help="Path to write a DOT graph of the changed functions to")
+  diff_parser.add_argument("-t", "--threshold", type=float, default=1.0,
+                           help="Percentage of the total cost the inclusive cost of a function must change by to be graphed")
+  for query_parser in [top_parser, callers_parser, callees_parser, diff_parser]:
+    query_parser.add_argument("-n", "--limit", type=int, default=20, help="Maximum number of functions to list")
+
   ls_parser = subparsers.add_parser("ls")
   ls_parser.set_defaults(command=ls)
 
   options = parser.parse_args()
+  global profiler
+  if getattr(options, "profile_report", None) is not None:
+    profiler = Profiler(options.profile_allocations)
+  check_columnar_export(options)
   options.command(options)
+  if profiler is not None:
+    profiler.write(options.profile_report, options.command.__name__)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+  import resource
+except ImportError:
+  resource = None  # type: ignore
+
+PROFILE_REPORT_VERSION = 1
+# Number of inputs and phases listed in the summary
+SUMMARY_LIMIT = 20
+
+
+def measure_data(data: Any) -> Tuple[Optional[int], int]:
+  """Estimate the number of rows and bytes of fetched data."""
+  if data is None:
+    return (None, 0)
+  if hasattr(data, "nbytes"):
+    return (len(data) if getattr(data, "ndim", 1) > 0 else 1, int(data.nbytes))
+  if hasattr(data, "columns") and isinstance(data.columns, dict):
+    # A ColumnTable, of arrays and dictionary-encoded StringColumns
+    size = 0
+    for column in data.columns.values():
+      if hasattr(column, "codes"):
+        size += int(column.codes.nbytes) + sum(measure_value(value) for value in column.values)
+      else:
+        size += int(column.nbytes)
+    return (len(data), size)
+  if isinstance(data, (list, tuple)):
+    return (len(data), sum(measure_value(row) for row in data))
+  return (None, measure_value(data))
+
+
+def measure_value(value: Any) -> int:
+  """Estimate the number of bytes of a single fetched value, ignoring Python object overhead."""
+  if value is None:
+    return 0
+  if isinstance(value, (str, bytes)):
+    return len(value)
+  if isinstance(value, (list, tuple)):
+    return sum(measure_value(item) for item in value)
+  if isinstance(value, dict):
+    return sum(measure_value(key) + measure_value(item) for key, item in value.items())
+  if hasattr(value, "nbytes"):
+    return int(value.nbytes)
+  return 8
+
+
+def peak_rss() -> Optional[int]:
+  """The peak resident set size of the process in bytes."""
+  if resource is None:
+    return None
+  maximum = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # Linux reports kilobytes, macOS bytes
+  return maximum if sys.platform == "darwin" else maximum * 1024
+
+
+class PhaseRecord:
+  """The measurements of a single phase of generating an input."""
+
+  def __init__(self, generator: str, input: Optional[str], phase: str) -> None:
+    self.generator = generator
+    self.input = input
+    self.phase = phase
+    self.wall_time = 0.0
+    self.rows: Optional[int] = None
+    self.bytes: Optional[int] = None
+    self.peak_memory: Optional[int] = None
+    self.peak_rss: Optional[int] = None
+    self.data: Any = None
+
+  def measure(self, data: Any):
+    """Record the size of the data a phase produced, measured once the phase ends."""
+    self.data = data
+
+  def to_dict(self) -> Dict[str, Any]:
+    record = dict(vars(self))
+    del record["data"]
+    return record
+
+
+class Profiler:
+  """Records the wall time, data size and peak memory of each phase of each input.
+
+  The peak resident set size is always recorded. Tracing allocations with
+  tracemalloc gives the peak memory of each phase on its own, but slows
+  rendering down several times.
+  """
+
+  def __init__(self, trace_memory: bool = False) -> None:
+    self.trace_memory = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+    self.records: List[Dict[str, Any]] = []
+    self.start = time.perf_counter()
+
+  @contextmanager
+  def phase(self, generator: str, input: Optional[str], phase: str) -> Iterator[PhaseRecord]:
+    record = PhaseRecord(generator, input, phase)
+    baseline = 0
+    if self.trace_memory:
+      tracemalloc.reset_peak()
+      baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+      yield record
+    finally:
+      record.wall_time = time.perf_counter() - start
+      if self.trace_memory:
+        record.peak_memory = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+      record.peak_rss = peak_rss()
+      if record.data is not None:
+        record.rows, record.bytes = measure_data(record.data)
+        record.data = None
+      self.records.append(record.to_dict())
+
+  def take_records(self) -> List[Dict[str, Any]]:
+    """Remove and return the records so far, to send them from a worker to its parent."""
+    records, self.records = self.records, []
+    return records
+
+  def report(self, command: str) -> Dict[str, Any]:
+    generators: Dict[str, Dict[str, Any]] = {}
+    inputs: Dict[Tuple[str, Optional[str]], float] = {}
+    for record in self.records:
+      generator = generators.setdefault(record["generator"], {"generator": record["generator"], "wall_time": 0.0, "inputs": 0, "phases": {}})
+      generator["wall_time"] += record["wall_time"]
+      generator["phases"][record["phase"]] = generator["phases"].get(record["phase"], 0.0) + record["wall_time"]
+      if record["input"] is not None:
+        key = (record["generator"], record["input"])
+        if key not in inputs:
+          generator["inputs"] += 1
+        inputs[key] = inputs.get(key, 0.0) + record["wall_time"]
+
+    slowest_inputs = sorted(inputs.items(), key=lambda x: x[1], reverse=True)[:SUMMARY_LIMIT]
+    slowest_phases = sorted(self.records, key=lambda x: x["wall_time"], reverse=True)[:SUMMARY_LIMIT]
+    return {
+      "version": PROFILE_REPORT_VERSION,
+      "command": command,
+      "wall_time": time.perf_counter() - self.start,
+      "peak_rss": peak_rss(),
+      "phases": self.records,
+      "summary": {
+        "generators": sorted(generators.values(), key=lambda x: x["wall_time"], reverse=True),
+        "inputs": [{"generator": generator, "input": input, "wall_time": wall_time} for (generator, input), wall_time in slowest_inputs],
+        "phases": slowest_phases,
+      },
+    }
+
+  def write(self, path: Path, command: str):
+    with open(path, "wt") as file:
+      json.dump(self.report(command), file, indent=2)
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+
+class QueryCache:
+  """A bounded cache of query results keyed by SQL and parameters."""
+
+  def __init__(self, maximum_rows: int = 1000000) -> None:
+    self.maximum_rows = maximum_rows
+    self.rows = 0
+    self.hits = 0
+    self.misses = 0
+    self.results: "OrderedDict[Tuple[str, Tuple[Any, ...]], List[Tuple[Any, ...]]]" = OrderedDict()
+
+  def get(self, key: Tuple[str, Tuple[Any, ...]]) -> Optional[List[Tuple[Any, ...]]]:
+    result = self.results.get(key)
+    if result is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    self.results.move_to_end(key)
+    return result
+
+  def put(self, key: Tuple[str, Tuple[Any, ...]], result: List[Tuple[Any, ...]]):
+    # Results larger than the entire cache are not worth evicting everything for
+    if len(result) > self.maximum_rows:
+      return
+    if key in self.results:
+      self.rows -= len(self.results.pop(key))
+    self.results[key] = result
+    self.rows += len(result)
+    while self.rows > self.maximum_rows:
+      _, evicted = self.results.popitem(last=False)
+      self.rows -= len(evicted)
+
+
+class CachedCursor:
+  """A cursor that serves repeated queries from a shared QueryCache."""
+
+  def __init__(self, cursor: Any, cache: QueryCache) -> None:
+    self.cursor = cursor
+    self.cache = cache
+    self.result: List[Tuple[Any, ...]] = []
+    self.position = 0
+    self.streaming = False
+
+  def execute(self, sql: str, parameters: Sequence[Any] = (), cached: bool = True) -> "CachedCursor":
+    """Execute a statement. Uncached statements are streamed from the underlying cursor."""
+    self.streaming = not cached
+    if self.streaming:
+      self.cursor.execute(sql, parameters)
+      return self
+
+    key = (sql, tuple(parameters))
+    result = self.cache.get(key)
+    if result is None:
+      self.cursor.execute(sql, parameters)
+      result = self.cursor.fetchall()
+      self.cache.put(key, result)
+    self.result = result
+    self.position = 0
+    return self
+
+  def fetchone(self) -> Optional[Tuple[Any, ...]]:
+    if self.streaming:
+      return self.cursor.fetchone()
+    if self.position >= len(self.result):
+      return None
+    self.position += 1
+    return self.result[self.position - 1]
+
+  def fetchmany(self, size: int = 1) -> List[Tuple[Any, ...]]:
+    if self.streaming:
+      return self.cursor.fetchmany(size)
+    rows = self.result[self.position:self.position + size]
+    self.position += len(rows)
+    return rows
+
+  def fetchall(self) -> List[Tuple[Any, ...]]:
+    if self.streaming:
+      return self.cursor.fetchall()
+    rows = self.result[self.position:]
+    self.position = len(self.result)
+    return rows
+
+  def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+    while True:
+      row = self.fetchone()
+      if row is None:
+        return
+      yield row
+
+  def close(self):
+    self.cursor.close()
@@ -0,0 +1,181 @@
+import ast
+import importlib
+import json
+import os
+import re
+from argparse import ArgumentParser, _SubParsersAction
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from visualization.generators import generator_modules
+
+MANIFEST_VERSION = 1
+GENERATORS_PATH = Path(__file__).parent.joinpath("generators")
+MANIFEST_PATH = GENERATORS_PATH.joinpath("__pycache__", "generators.json")
+
+BASE_CLASSES = {"Graph": "graph", "Table": "table"}
+
+
+def command_name(name: str) -> str:
+  """The command name of a generator name, like Graph.get_command_name."""
+  return re.sub(r"(?<!^)(?=[A-Z])", "-", name.replace(" ", "")).lower()
+
+
+def literal_attributes(function: ast.FunctionDef) -> Dict[str, Any]:
+  """Find the constant values assigned to attributes of self in a method."""
+  attributes = {}
+  for node in ast.walk(function):
+    if not isinstance(node, ast.Assign) or not isinstance(node.value, ast.Constant):
+      continue
+    for target in node.targets:
+      if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and target.value.id == "self":
+        attributes[target.attr] = node.value.value
+  return attributes
+
+
+def scan_module(module_name: str, path: Path) -> List[Dict[str, Any]]:
+  """Find the generators defined in a module without importing it."""
+  tree = ast.parse(path.read_bytes(), filename=str(path))
+  # Class name: kind, including subclasses of generators defined in the module
+  kinds: Dict[str, str] = {}
+  generators = []
+  for node in tree.body:
+    if not isinstance(node, ast.ClassDef):
+      continue
+    kind = None
+    for base in node.bases:
+      if isinstance(base, ast.Name):
+        kind = BASE_CLASSES.get(base.id, kinds.get(base.id))
+      if kind is not None:
+        break
+    if kind is None:
+      continue
+    kinds[node.name] = kind
+
+    attributes: Dict[str, Any] = {}
+    for statement in node.body:
+      if isinstance(statement, ast.FunctionDef) and statement.name == "__init__":
+        attributes = literal_attributes(statement)
+    generators.append({
+      "module": module_name,
+      "class": node.name,
+      "kind": kind,
+      "name": attributes.get("name"),
+      "description": attributes.get("description"),
+    })
+
+  # Names that are not plain string literals are only known once the module is imported
+  if any(not isinstance(generator["name"], str) or not isinstance(generator["description"], str) for generator in generators):
+    module = importlib.import_module("visualization.generators." + module_name)
+    for generator in generators:
+      cls = getattr(module, generator["class"])
+      generator["name"] = cls.get_name()
+      generator["description"] = cls.get_description()
+  # Like inspect.getmembers, which the registry was previously built with
+  generators.sort(key=lambda x: x["class"])
+  return generators
+
+
+def module_signature(path: Path) -> Tuple[int, int]:
+  stat = os.stat(path)
+  return (stat.st_mtime_ns, stat.st_size)
+
+
+def read_manifest() -> Dict[str, Any]:
+  try:
+    with open(MANIFEST_PATH, "rt") as file:
+      manifest = json.load(file)
+  except (OSError, ValueError):
+    return {}
+  if manifest.get("version") != MANIFEST_VERSION:
+    return {}
+  return manifest.get("modules", {})
+
+
+def write_manifest(modules: Dict[str, Any]):
+  try:
+    MANIFEST_PATH.parent.mkdir(exist_ok=True)
+    temporary_path = MANIFEST_PATH.with_suffix(".{}.tmp".format(os.getpid()))
+    with open(temporary_path, "wt") as file:
+      json.dump({"version": MANIFEST_VERSION, "modules": modules}, file)
+    os.replace(temporary_path, MANIFEST_PATH)
+  except OSError:
+    # The manifest is only a cache, a read-only installation scans every time
+    pass
+
+
+def load_manifest() -> List[Dict[str, Any]]:
+  """List the generators of every generator module, rescanning only modules changed since the cached manifest."""
+  cached_modules = read_manifest()
+  modules: Dict[str, Any] = {}
+  changed = False
+  for module_name in sorted(generator_modules):
+    path = GENERATORS_PATH.joinpath(module_name + ".py")
+    signature = list(module_signature(path))
+    cached = cached_modules.get(module_name)
+    if cached is not None and cached["signature"] == signature:
+      modules[module_name] = cached
+    else:
+      modules[module_name] = {"signature": signature, "generators": scan_module(module_name, path)}
+      changed = True
+  if changed or len(modules) != len(cached_modules):
+    write_manifest(modules)
+  return [generator for module in modules.values() for generator in module["generators"]]
+
+
+class GeneratorEntry:
+  """A generator known from the manifest, whose module is not necessarily imported."""
+
+  def __init__(self, generator: Dict[str, Any]) -> None:
+    self.module = generator["module"]
+    self.class_name = generator["class"]
+    self.kind = generator["kind"]
+    self.name = generator["name"]
+    self.description = generator["description"]
+    self.command_name = command_name(self.name)
+    self.cls: Optional[Any] = None
+
+  def load(self) -> Any:
+    if self.cls is None:
+      module = importlib.import_module("visualization.generators." + self.module)
+      self.cls = getattr(module, self.class_name)
+    return self.cls
+
+
+class LazyGenerators(Mapping[str, Any]):
+  """Generator classes by command name, importing a generator's module on first access."""
+
+  def __init__(self, entries: List[GeneratorEntry]) -> None:
+    self.entries = {entry.command_name: entry for entry in entries}
+
+  def __getitem__(self, name: str) -> Any:
+    return self.entries[name].load()
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self.entries)
+
+  def __len__(self) -> int:
+    return len(self.entries)
+
+
+def load_generators() -> Tuple[LazyGenerators, LazyGenerators]:
+  """Create the registries of graph and table generators."""
+  entries = [GeneratorEntry(generator) for generator in load_manifest()]
+  return (LazyGenerators([entry for entry in entries if entry.kind == "graph"]),
+          LazyGenerators([entry for entry in entries if entry.kind == "table"]))
+
+
+class LazySubParsersAction(_SubParsersAction):
+  """Generator subcommands whose arguments are only added once the subcommand is selected."""
+
+  def __init__(self, *args: Any, generators: Optional[LazyGenerators] = None, **kwargs: Any) -> None:
+    super().__init__(*args, **kwargs)
+    self.generators = generators
+    self.populated: Dict[str, bool] = {}
+
+  def __call__(self, parser: ArgumentParser, namespace: Any, values: Any, option_string: Any = None):
+    name = values[0]
+    if self.generators is not None and name in self.generators and name not in self.populated:
+      self.generators[name].populate_argument_parser(self._name_parser_map[name])
+      self.populated[name] = True
+    super().__call__(parser, namespace, values, option_string)
@@ -0,0 +1,53 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+from matplotlib.figure import Figure
+
+from visualization.graph import Graph
+
+
+def create_figure(instance: Graph) -> Figure:
+  """Create a figure, not managed by pyplot, styled for a graph."""
+  return Figure(**instance.figure_options)
+
+
+def save_figure(figure: Figure, output_path: Path):
+  # Leave out the creation date to keep the output reproducible
+  metadata = {"CreationDate": None} if output_path.suffix == ".pdf" else None
+  # The backend is chosen by the file extension, such as PDF or Agg for PNG
+  figure.savefig(output_path, bbox_inches="tight", metadata=metadata)
+
+
+class Renderer:
+  """Runs rendering tasks, either immediately or on a pool of threads.
+
+  Rendering on threads lets the caller fetch the data of the next graph while
+  previous graphs are drawn and saved.
+  """
+
+  def __init__(self, threads: int = 1) -> None:
+    self.executor: Optional[ThreadPoolExecutor] = None
+    if threads > 1:
+      self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="renderer")
+    self.futures: List[Future] = []
+
+  def submit(self, task: Callable[..., Any], *args: Any):
+    if self.executor is None:
+      task(*args)
+    else:
+      self.futures.append(self.executor.submit(task, *args))
+
+  def wait(self):
+    """Wait for every submitted task, raising the first exception of a failed task."""
+    futures, self.futures = self.futures, []
+    for future in futures:
+      future.result()
+
+  def close(self):
+    try:
+      self.wait()
+    finally:
+      if self.executor is not None:
+        self.executor.shutdown()
+        self.executor = None
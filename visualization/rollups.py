@@ -0,0 +1,129 @@
+import sqlite3
+from typing import List, Optional, Tuple
+
+from visualization.columnar import BENCHMARK_JOINS
+
+# Columns that identify the benchmark a measurement belongs to, as names and the expressions selecting them
+ALGORITHM_KEYS = [
+  ("algorithm_name", "algorithm.name"),
+  ("algorithm_parameters", "algorithm.parameters"),
+  ("environment", "environment.name"),
+  ("compiler", "algorithm.compiler"),
+  ("features", "algorithm.features"),
+  ("stage", "benchmark.stage"),
+]
+
+
+class Rollup:
+  """Per-group aggregates of a measure, from which tables are generated in O(groups).
+
+  Every group holds the count, sum, sum of squares, minimum and maximum of the
+  measure, as well as the sums of the summed columns. These merge by adding
+  and taking extremes, so that a group is updated with the measurements of a
+  new benchmark run without reading those it was built from. The labels are
+  carried along with the keys, which they must be determined by.
+
+  The histogram of every group, the count of its values per HISTOGRAM_BIN, is
+  kept in <name>_histogram.
+  """
+
+  def __init__(self, name: str, joins: str, keys: List[Tuple[str, str]], measure: str,
+               labels: Optional[List[Tuple[str, str]]] = None, sums: Optional[List[Tuple[str, str]]] = None) -> None:
+    self.name = name
+    self.joins = joins
+    self.keys = keys
+    self.measure = measure
+    self.labels = labels or []
+    self.sums = sums or []
+
+  @property
+  def histogram(self) -> str:
+    return "{}_histogram".format(self.name)
+
+  def select(self, where: str = "") -> str:
+    """Select the aggregates of every group of the benchmarks matching a condition."""
+    columns = ["{} AS {}".format(expression, name) for name, expression in self.keys + self.labels] + [
+      "COUNT({}) AS count".format(self.measure),
+      "TOTAL({}) AS sum".format(self.measure),
+      "TOTAL(CAST({0} AS REAL) * {0}) AS sum_of_squares".format(self.measure),
+      "MIN({}) AS minimum".format(self.measure),
+      "MAX({}) AS maximum".format(self.measure),
+    ] + ["COALESCE(SUM({}), 0) AS {}".format(expression, name) for name, expression in self.sums]
+    return "SELECT {} FROM {} WHERE {} GROUP BY {}".format(
+      ", ".join(columns), self.joins, self.condition(where), ", ".join(expression for _, expression in self.keys))
+
+  def select_histogram(self, where: str = "") -> str:
+    columns = ["{} AS {}".format(expression, name) for name, expression in self.keys]
+    return "SELECT {0}, HISTOGRAM_BIN({1}) AS bin, COUNT(*) AS count FROM {2} WHERE {3} AND {1} IS NOT NULL GROUP BY {4}, bin".format(
+      ", ".join(columns), self.measure, self.joins, self.condition(where), ", ".join(expression for _, expression in self.keys))
+
+  def condition(self, where: str) -> str:
+    # Groups with a NULL key could not be told apart when merging, and no table selects them
+    conditions = ["{} IS NOT NULL".format(expression) for _, expression in self.keys]
+    return " AND ".join(conditions + ([where] if where else []))
+
+
+ROLLUPS = [
+  Rollup("micro_event_rollups", BENCHMARK_JOINS + """
+      INNER JOIN microBenchmark ON microBenchmark.benchmark = benchmark.id
+      INNER JOIN microBenchmarkMeasurement ON microBenchmarkMeasurement.microBenchmark = microBenchmark.id
+      INNER JOIN microBenchmarkEvent ON microBenchmarkEvent.microBenchmarkMeasurement = microBenchmarkMeasurement.id
+    """, ALGORITHM_KEYS + [
+      ("region", "microBenchmarkMeasurement.region"),
+      ("event", "microBenchmarkEvent.event"),
+    ], "microBenchmarkEvent.value"),
+  # Grouped by the ids, like the tables of sequential runs, whose rows are in the order of the ids
+  Rollup("sequential_rollups", BENCHMARK_JOINS + """
+      INNER JOIN sequentialBenchmark ON sequentialBenchmark.benchmark = benchmark.id
+    """, [
+      ("environment_id", "environment.id"),
+      ("algorithm_id", "algorithm.id"),
+      ("stage", "benchmark.stage"),
+    ], "sequentialBenchmark.averageDuration", labels=[
+      (name, expression) for name, expression in ALGORITHM_KEYS if name != "stage"
+    ], sums=[
+      ("iterations", "sequentialBenchmark.iterations"),
+    ]),
+  Rollup("parallel_rollups", BENCHMARK_JOINS + """
+      INNER JOIN parallelBenchmark ON parallelBenchmark.benchmark = benchmark.id
+    """, ALGORITHM_KEYS + [
+      ("number_of_threads", "parallelBenchmark.numberOfThreads"),
+    ], "parallelBenchmark.throughput"),
+]
+
+
+def create_rollup_views(connection: sqlite3.Connection):
+  """Expose the rollups of a benchmark database as temporary views aggregating its tables.
+
+  Must be called before the connection is made query only.
+  """
+  for rollup in ROLLUPS:
+    connection.execute("CREATE TEMP VIEW IF NOT EXISTS {} AS {}".format(rollup.name, rollup.select()))
+    connection.execute("CREATE TEMP VIEW IF NOT EXISTS {} AS {}".format(rollup.histogram, rollup.select_histogram()))
+
+
+def update_rollups(connection: sqlite3.Connection, where: str):
+  """Merge the benchmarks matching a condition into the rollups of a sidecar, creating them if needed.
+
+  Only the groups of those benchmarks are written. The benchmark database
+  must be attached as source.
+  """
+  for rollup in ROLLUPS:
+    keys = [name for name, _ in rollup.keys]
+    labels = [name for name, _ in rollup.labels]
+    sums = [name for name, _ in rollup.sums]
+    definitions = keys + labels + ["count INTEGER", "sum REAL", "sum_of_squares REAL", "minimum", "maximum"] + sums
+    connection.execute("CREATE TABLE IF NOT EXISTS {} (id INTEGER PRIMARY KEY, {}, UNIQUE ({}))".format(rollup.name, ", ".join(definitions), ", ".join(keys)))
+    connection.execute("CREATE TABLE IF NOT EXISTS {} ({}, bin INTEGER, count INTEGER, PRIMARY KEY ({}, bin)) WITHOUT ROWID".format(
+      rollup.histogram, ", ".join(keys), ", ".join(keys)))
+
+    columns = keys + labels + ["count", "sum", "sum_of_squares", "minimum", "maximum"] + sums
+    # The extremes of a group are NULL if all its values are
+    merged = ["count = count + excluded.count", "sum = sum + excluded.sum", "sum_of_squares = sum_of_squares + excluded.sum_of_squares",
+              "minimum = COALESCE(MIN(minimum, excluded.minimum), minimum, excluded.minimum)",
+              "maximum = COALESCE(MAX(maximum, excluded.maximum), maximum, excluded.maximum)"]
+    merged += ["{0} = {0} + excluded.{0}".format(name) for name in sums]
+    connection.execute("INSERT INTO {} ({}) {} ON CONFLICT ({}) DO UPDATE SET {}".format(
+      rollup.name, ", ".join(columns), rollup.select(where), ", ".join(keys), ", ".join(merged)))
+    connection.execute("INSERT INTO {0} ({1}, bin, count) {2} ON CONFLICT ({1}, bin) DO UPDATE SET count = count + excluded.count".format(
+      rollup.histogram, ", ".join(keys), rollup.select_histogram(where)))
@@ -0,0 +1,131 @@
+import json
+import shutil
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from visualization.registry import load_generators
+from visualization.synthetic import SyntheticOptions, write_synthetic_database
+
+SCALING_REPORT_VERSION = 1
+DEFAULT_SCALES = [1, 10, 100]
+
+
+def run_generator(name: str, database_path: Path, output_path: Path) -> Dict[str, Any]:
+  """Generate every input of a generator in a fresh process, returning its time and memory."""
+  report_path = output_path.joinpath("{}.profile.json".format(name))
+  build_path = output_path.joinpath("build")
+  # Remove earlier outputs, which the build cache would otherwise consider up to date
+  shutil.rmtree(build_path.joinpath(name), ignore_errors=True)
+  build_path.mkdir(parents=True, exist_ok=True)
+  command = [sys.executable, "-m", "visualization.main", "all", "-d", str(database_path), "-o", str(build_path),
+             "-n", name, "--profile-report", str(report_path)]
+  start = time.perf_counter()
+  process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+  wall_time = time.perf_counter() - start
+
+  result: Dict[str, Any] = {"wall_time": wall_time, "failed": process.returncode != 0 or "generator failed" in process.stdout}
+  if report_path.exists():
+    with open(report_path, "rt") as file:
+      report = json.load(file)
+    result["peak_rss"] = report["peak_rss"]
+    for generator in report["summary"]["generators"]:
+      if generator["generator"] == name:
+        result["inputs"] = generator["inputs"]
+        result["phases"] = generator["phases"]
+  return result
+
+
+def run_suite(options: Namespace) -> Dict[str, Any]:
+  graph_generators, table_generators = load_generators()
+  names = options.names or [name for name in list(table_generators) + list(graph_generators) if not name.startswith("example-")]
+
+  results: Dict[str, Any] = {"version": SCALING_REPORT_VERSION, "scales": {}}
+  for scale in options.scales:
+    scale_path = options.output.joinpath("scale-{}".format(scale))
+    scale_path.mkdir(parents=True, exist_ok=True)
+    database_path = scale_path.joinpath("data.sqlite")
+    start = time.perf_counter()
+    rows = write_synthetic_database(database_path, SyntheticOptions(scale=scale, seed=options.seed))
+    print("scale {}x: wrote {} rows in {:.1f}s".format(scale, sum(rows.values()), time.perf_counter() - start), flush=True)
+
+    generators = {}
+    for name in names:
+      generators[name] = run_generator(name, database_path, scale_path)
+      print("  {:30s} {:8.2f}s {:8.1f} MiB{}".format(name, generators[name]["wall_time"], generators[name].get("peak_rss", 0) / 2**20,
+                                                  " (failed)" if generators[name]["failed"] else ""), flush=True)
+    results["scales"][str(scale)] = {"rows": rows, "generators": generators}
+  return results
+
+
+def format_results(results: Dict[str, Any]) -> str:
+  """Format the time of every generator at every scale, relative to the smallest scale."""
+  scales = list(results["scales"].keys())
+  names = list(results["scales"][scales[0]]["generators"].keys())
+  lines = ["{:30s}".format("Generator") + "".join("{:>20s}".format(scale + "x") for scale in scales)]
+  for name in names:
+    line = "{:30s}".format(name)
+    base = results["scales"][scales[0]]["generators"][name]["wall_time"]
+    for scale in scales:
+      wall_time = results["scales"][scale]["generators"][name]["wall_time"]
+      line += "{:>20s}".format("{:.2f}s ({:.1f}x)".format(wall_time, wall_time / base if base > 0 else 0))
+    lines.append(line)
+  return "\n".join(lines)
+
+
+def find_regressions(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+  """Find generators that became slower than a baseline report by more than the tolerated factor."""
+  regressions = []
+  for scale, scale_results in results["scales"].items():
+    baseline_generators = baseline.get("scales", {}).get(scale, {}).get("generators", {})
+    for name, result in scale_results["generators"].items():
+      previous: Optional[Dict[str, Any]] = baseline_generators.get(name)
+      if previous is None:
+        continue
+      if result["wall_time"] > previous["wall_time"] * tolerance:
+        regressions.append("{} at {}x: {:.2f}s, was {:.2f}s".format(name, scale, result["wall_time"], previous["wall_time"]))
+      if result.get("peak_rss") is not None and previous.get("peak_rss") is not None and result["peak_rss"] > previous["peak_rss"] * tolerance:
+        regressions.append("{} at {}x: {:.1f} MiB, was {:.1f} MiB".format(name, scale, result["peak_rss"] / 2**20, previous["peak_rss"] / 2**20))
+  return regressions
+
+
+def main():
+  parser = ArgumentParser(description="Measure how the generators scale with the size of the benchmark database")
+  parser.add_argument("-o", "--output", required=True, type=Path,
+                      help="Path to a directory to write the synthetic databases, outputs and report to")
+  parser.add_argument("-s", "--scale", dest="scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                      help="The scales of the synthetic databases to generate")
+  parser.add_argument("-n", "--name", dest="names", action="append", type=str,
+                      help="Name of a generator to measure. May be given multiple times. Defaults to every generator")
+  parser.add_argument("--seed", type=int, default=1, help="Seed of the synthetic data")
+  parser.add_argument("--baseline", type=Path, help="Path to a previous report to compare against")
+  parser.add_argument("--tolerance", type=float, default=1.5,
+                      help="Factor by which a generator may become slower or use more memory than in the baseline")
+  options = parser.parse_args()
+
+  options.output.mkdir(parents=True, exist_ok=True)
+  results = run_suite(options)
+  with open(options.output.joinpath("scaling.json"), "wt") as file:
+    json.dump(results, file, indent=2)
+  print(format_results(results))
+
+  failed = [name for scale in results["scales"].values() for name, result in scale["generators"].items() if result["failed"]]
+  if len(failed) > 0:
+    print("error: generators failed: {}".format(", ".join(sorted(set(failed)))))
+    exit(1)
+
+  if options.baseline is not None:
+    with open(options.baseline, "rt") as file:
+      baseline = json.load(file)
+    regressions = find_regressions(results, baseline, options.tolerance)
+    for regression in regressions:
+      print("regression:", regression)
+    if len(regressions) > 0:
+      exit(1)
+
+
+if __name__ == "__main__":
+  main()
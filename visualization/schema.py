@@ -0,0 +1,144 @@
+import sqlite3
+from typing import Any, Dict, List, Tuple
+
+# The tables of a benchmark database, as queried by the generators.
+#
+# A benchmark run executes every algorithm variant in an environment. Each
+# benchmark of a run measures one stage (keypair, encrypt or decrypt) of a
+# variant, with the measurements of its benchmark_type stored in the matching
+# tables below.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS environment (
+  id INTEGER PRIMARY KEY,
+  name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS benchmarkRun (
+  id INTEGER PRIMARY KEY,
+  environment INTEGER REFERENCES environment(id),
+  runIndex INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS algorithm (
+  id INTEGER PRIMARY KEY,
+  name TEXT,
+  parameters TEXT,
+  compiler TEXT,
+  features TEXT
+);
+
+CREATE TABLE IF NOT EXISTS benchmark (
+  id INTEGER PRIMARY KEY,
+  benchmarkRun INTEGER REFERENCES benchmarkRun(id),
+  algorithm INTEGER REFERENCES algorithm(id),
+  benchmark_type TEXT,
+  stage TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sequentialBenchmark (
+  id INTEGER PRIMARY KEY,
+  benchmark INTEGER REFERENCES benchmark(id),
+  iterations INTEGER,
+  -- Milliseconds
+  averageDuration REAL
+);
+
+CREATE TABLE IF NOT EXISTS sequentialBenchmarkIteration (
+  id INTEGER PRIMARY KEY,
+  sequentialBenchmark INTEGER REFERENCES sequentialBenchmark(id),
+  iteration INTEGER,
+  -- Nanoseconds
+  duration INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS parallelBenchmark (
+  id INTEGER PRIMARY KEY,
+  benchmark INTEGER REFERENCES benchmark(id),
+  numberOfThreads INTEGER,
+  throughput REAL
+);
+
+CREATE TABLE IF NOT EXISTS microBenchmark (
+  id INTEGER PRIMARY KEY,
+  benchmark INTEGER REFERENCES benchmark(id)
+);
+
+CREATE TABLE IF NOT EXISTS microBenchmarkMeasurement (
+  id INTEGER PRIMARY KEY,
+  microBenchmark INTEGER REFERENCES microBenchmark(id),
+  region TEXT
+);
+
+CREATE TABLE IF NOT EXISTS microBenchmarkEvent (
+  id INTEGER PRIMARY KEY,
+  microBenchmarkMeasurement INTEGER REFERENCES microBenchmarkMeasurement(id),
+  event TEXT,
+  -- Negative when the event could not be counted
+  value INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS stackBenchmark (
+  id INTEGER PRIMARY KEY,
+  benchmark INTEGER REFERENCES benchmark(id)
+);
+
+CREATE TABLE IF NOT EXISTS stackBenchmarkSymbol (
+  id INTEGER PRIMARY KEY,
+  stackBenchmark INTEGER REFERENCES stackBenchmark(id),
+  symbol TEXT,
+  size INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS xkcpBenchmark (
+  id INTEGER PRIMARY KEY,
+  benchmark INTEGER REFERENCES benchmark(id),
+  iterations INTEGER,
+  -- Milliseconds
+  averageDuration REAL,
+  -- Operations per second
+  throughput REAL
+);
+
+CREATE TABLE IF NOT EXISTS heapBenchmark (
+  id INTEGER PRIMARY KEY,
+  benchmark INTEGER REFERENCES benchmark(id)
+);
+
+CREATE TABLE IF NOT EXISTS heapBenchmarkMeasurement (
+  id INTEGER PRIMARY KEY,
+  heapBenchmark INTEGER REFERENCES heapBenchmark(id),
+  peakAllocation INTEGER,
+  -- Semicolon-separated call stack, outermost frame first
+  trace TEXT
+);
+"""
+
+
+def create_schema(connection: sqlite3.Connection):
+  """Create the tables of a benchmark database."""
+  connection.executescript(SCHEMA)
+
+
+class BulkWriter:
+  """Inserts rows in bulk, assigning ids itself so that rows can refer to each other before being written."""
+
+  def __init__(self, connection: sqlite3.Connection) -> None:
+    self.connection = connection
+    self.ids: Dict[str, int] = {}
+    self.rows: Dict[str, List[Tuple[Any, ...]]] = {}
+
+  def insert(self, table: str, *values: Any) -> int:
+    if table not in self.ids:
+      # Continue after the rows already in the database
+      self.ids[table] = self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM {}".format(table)).fetchone()[0]
+    id = self.ids[table] + 1
+    self.ids[table] = id
+    self.rows.setdefault(table, []).append((id,) + values)
+    return id
+
+  def flush(self):
+    for table, rows in self.rows.items():
+      if len(rows) > 0:
+        placeholders = ", ".join(["?"] * len(rows[0]))
+        self.connection.executemany("INSERT INTO {} VALUES ({})".format(table, placeholders), rows)
+    self.rows = {}
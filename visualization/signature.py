@@ -0,0 +1,9 @@
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+
+def database_signature(path: Path) -> Dict[str, Any]:
+  """Identify the version of a file an export or index was made from by its size and modification time."""
+  stat = os.stat(path)
+  return {"size": stat.st_size, "modified": stat.st_mtime_ns}
@@ -0,0 +1,88 @@
+from statistics import NormalDist
+from typing import Any, Dict, List, Sequence
+
+import numpy
+
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75)
+
+
+def confidence_interval(mean: Any, sample_standard_deviation: Any, count: Any, confidence: float = 0.95) -> Any:
+  """The bounds of the confidence interval of the mean of normally distributed samples.
+
+  Works on scalars as well as arrays of groups. Groups with less than two
+  samples have no interval and get NaN bounds.
+  """
+  z = NormalDist().inv_cdf((1 + confidence) / 2.)
+  count = numpy.asarray(count, dtype=numpy.float64)
+  with numpy.errstate(divide="ignore", invalid="ignore"):
+    h = numpy.where(count > 1, sample_standard_deviation * z / numpy.sqrt(count - 1), numpy.nan)
+  return mean - h, mean + h
+
+
+class GroupStatistics:
+  """Statistics of the values of each group, indexed in the order of labels."""
+
+  def __init__(self, labels: numpy.ndarray, values: List[numpy.ndarray]) -> None:
+    self.labels = labels
+    # The values of each group, for plots that need the samples themselves
+    self.values = values
+    self.count = numpy.zeros(0, dtype=numpy.int64)
+    self.mean = numpy.zeros(0)
+    self.variance = numpy.zeros(0)
+    self.standard_deviation = numpy.zeros(0)
+    self.sample_standard_deviation = numpy.zeros(0)
+    self.confidence_interval_lower = numpy.zeros(0)
+    self.confidence_interval_upper = numpy.zeros(0)
+    self.minimum = numpy.zeros(0)
+    self.maximum = numpy.zeros(0)
+    self.quantiles: Dict[float, numpy.ndarray] = {}
+
+  def __len__(self) -> int:
+    return len(self.labels)
+
+  def order(self, key: numpy.ndarray, reverse: bool = False) -> numpy.ndarray:
+    """Indices of the groups sorted by one of the statistics, keeping ties in label order."""
+    return numpy.argsort(-key if reverse else key, kind="stable")
+
+
+def group_statistics(labels: Any, values: Any, confidence: float = 0.95,
+                     quantiles: Sequence[float] = DEFAULT_QUANTILES) -> GroupStatistics:
+  """Compute the statistics of values grouped by labels in a single vectorized pass.
+
+  Labels is either a 1-D array with one label per value, or a 2-D array with
+  one row of key columns per value. Groups are sorted by their label.
+  """
+  labels = numpy.asarray(labels)
+  values = numpy.asarray(values, dtype=numpy.float64)
+  if len(values) == 0:
+    return GroupStatistics(labels[:0], [])
+
+  unique_labels, inverse = numpy.unique(labels, axis=0, return_inverse=True)
+  inverse = inverse.reshape(-1)
+  # Sort by group, then by value, so that each group is a contiguous, sorted run
+  order = numpy.lexsort((values, inverse))
+  sorted_values = values[order]
+  count = numpy.bincount(inverse, minlength=len(unique_labels))
+  starts = numpy.concatenate(([0], numpy.cumsum(count)[:-1]))
+
+  statistics = GroupStatistics(unique_labels, numpy.split(sorted_values, starts[1:]))
+  statistics.count = count
+  statistics.mean = numpy.bincount(inverse, weights=values) / count
+  squared_distance = numpy.bincount(inverse, weights=(values - statistics.mean[inverse]) ** 2)
+  statistics.variance = squared_distance / count
+  statistics.standard_deviation = numpy.sqrt(statistics.variance)
+  with numpy.errstate(divide="ignore", invalid="ignore"):
+    statistics.sample_standard_deviation = numpy.where(
+        count > 1, numpy.sqrt(squared_distance / (count - 1)), numpy.nan)
+  statistics.confidence_interval_lower, statistics.confidence_interval_upper = confidence_interval(
+      statistics.mean, statistics.sample_standard_deviation, count, confidence)
+  statistics.minimum = sorted_values[starts]
+  statistics.maximum = sorted_values[starts + count - 1]
+  for quantile in quantiles:
+    # Linear interpolation between the closest ranks, like numpy.quantile
+    position = starts + quantile * (count - 1)
+    below = numpy.floor(position).astype(numpy.int64)
+    above = numpy.minimum(below + 1, starts + count - 1)
+    fraction = position - below
+    statistics.quantiles[quantile] = sorted_values[below] * (1 - fraction) + sorted_values[above] * fraction
+  return statistics
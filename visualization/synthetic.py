@@ -0,0 +1,116 @@
+import random
+import sqlite3
+from pathlib import Path
+from typing import Dict
+
+from visualization.schema import BulkWriter, create_schema
+
+# The variants each algorithm is built as, as (compiler, features)
+VARIANTS = [
+  ("gcc", "ref"),
+  ("gcc", "ref-optimized"),
+  ("gcc", "avx2"),
+  ("gcc", "avx2-optimized"),
+  ("clang", "ref-optimized"),
+  ("clang", "avx2-optimized"),
+]
+
+STAGES = ["keypair", "encrypt", "decrypt"]
+STAGE_REGIONS = {"keypair": "crypto_kem_keypair", "encrypt": "crypto_kem_enc", "decrypt": "crypto_kem_dec"}
+REGIONS = ["poly_Rq_mul", "poly_S3_inv", "poly_lift", "randombytes", "sha3_256"]
+EVENTS = ["cpu-cycles", "instructions", "cache-misses", "page-faults"]
+STACK_SYMBOLS = ["crypto_kem_keypair", "crypto_kem_enc", "crypto_kem_dec", "poly_Rq_mul", "AES256_CTR_DRBG_Update"]
+HEAP_TRACES = [
+  "main;benchmark_heap;crypto_kem_keypair;0x7fc56d704301;poly_Rq_mul",
+  "main;benchmark_heap;crypto_kem_enc;randombytes;0x7fc56d70a2c0",
+  "main;benchmark_heap;crypto_kem_dec;poly_lift",
+  "main;get_global_state;0x7fc56d7011f0;malloc",
+]
+
+
+class SyntheticOptions:
+  """The shape of a synthetic benchmark database.
+
+  The scale multiplies the number of sequential iterations and micro
+  measurements, which dominate the size of real databases.
+  """
+
+  def __init__(self, scale: int = 1, environments: int = 2, runs: int = 2, algorithms: int = 2, variants: int = len(VARIANTS),
+               iterations: int = 20, measurements: int = 5, thread_counts: int = 4, seed: int = 1) -> None:
+    self.scale = scale
+    self.environments = environments
+    self.runs = runs
+    self.algorithms = algorithms
+    self.variants = min(variants, len(VARIANTS))
+    self.iterations = iterations
+    self.measurements = measurements
+    self.thread_counts = thread_counts
+    self.seed = seed
+
+
+def write_synthetic_database(path: Path, options: SyntheticOptions) -> Dict[str, int]:
+  """Write a synthetic benchmark database, returning the number of rows of each table."""
+  generator = random.Random(options.seed)
+  if path.exists():
+    path.unlink()
+  connection = sqlite3.connect(str(path))
+  # The database is written once and is worthless if interrupted
+  connection.execute("PRAGMA journal_mode = OFF")
+  connection.execute("PRAGMA synchronous = OFF")
+  create_schema(connection)
+  writer = BulkWriter(connection)
+
+  algorithms = []
+  for i in range(options.algorithms):
+    name, parameters = ("ntru", "hrss{}".format(701 + 100 * i)) if i % 2 == 0 else ("mceliece", "{}f".format(348864 + i))
+    for compiler, features in VARIANTS[:options.variants]:
+      # How much faster the variant is than the reference implementation
+      speedup = 1.0 if features == "ref" else generator.uniform(1.2, 4.0)
+      id = writer.insert("algorithm", name, parameters, compiler, features)
+      algorithms.append((id, speedup))
+
+  iterations = options.iterations * options.scale
+  measurements = options.measurements * options.scale
+  for environment_index in range(options.environments):
+    environment = writer.insert("environment", "environment-{}".format(environment_index))
+    for run_index in range(options.runs):
+      run = writer.insert("benchmarkRun", environment, run_index)
+      for algorithm, speedup in algorithms:
+        for stage in STAGES:
+          mean = 1e6 / speedup
+
+          benchmark = writer.insert("benchmark", run, algorithm, "sequential", stage)
+          durations = [int(generator.gauss(mean, mean * 0.02)) for _ in range(iterations)]
+          sequential = writer.insert("sequentialBenchmark", benchmark, iterations, sum(durations) / iterations / 1e6)
+          for iteration, duration in enumerate(durations):
+            writer.insert("sequentialBenchmarkIteration", sequential, iteration, duration)
+
+          benchmark = writer.insert("benchmark", run, algorithm, "parallel", stage)
+          for threads in [2 ** i for i in range(options.thread_counts)]:
+            writer.insert("parallelBenchmark", benchmark, threads, threads * 1e9 / mean * generator.uniform(0.9, 1.0))
+
+          benchmark = writer.insert("benchmark", run, algorithm, "micro", stage)
+          micro = writer.insert("microBenchmark", benchmark)
+          for region in [STAGE_REGIONS[stage]] + REGIONS:
+            for _ in range(measurements):
+              measurement = writer.insert("microBenchmarkMeasurement", micro, region)
+              for event in EVENTS:
+                # Events occasionally fail to be counted
+                value = int(generator.gauss(mean, mean * 0.05)) if generator.random() > 0.02 else -1
+                writer.insert("microBenchmarkEvent", measurement, event, value)
+
+        benchmark = writer.insert("benchmark", run, algorithm, "stack", "")
+        stack = writer.insert("stackBenchmark", benchmark)
+        for symbol in STACK_SYMBOLS:
+          writer.insert("stackBenchmarkSymbol", stack, symbol, generator.randint(100, 20000))
+
+        benchmark = writer.insert("benchmark", run, algorithm, "heap", "")
+        heap = writer.insert("heapBenchmark", benchmark)
+        for trace in HEAP_TRACES:
+          writer.insert("heapBenchmarkMeasurement", heap, generator.randint(1, 9000), trace)
+      # Keep the pending rows of a single run in memory at most
+      writer.flush()
+
+  connection.commit()
+  connection.close()
+  return dict(writer.ids)
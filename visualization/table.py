@@ -1,7 +1,7 @@
 import sqlite3
 import re
 from argparse import ArgumentParser, Namespace, _SubParsersAction
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Optional, Tuple
 
 
 class Table:
@@ -12,7 +12,7 @@ class Table:
 
   @classmethod
   def get_name(cls) -> str:
-    return cls(Namespace()).name
+    return cls.get_metadata()[0]
 
   @classmethod
   def get_command_name(cls) -> str:
@@ -20,7 +20,15 @@ class Table:
 
   @classmethod
   def get_description(cls) -> str:
-    return cls(Namespace()).description
+    return cls.get_metadata()[1]
+
+  @classmethod
+  def get_metadata(cls) -> Tuple[str, str]:
+    # Cached per class, as the name and description are only known from an instance
+    if "_metadata" not in cls.__dict__:
+      instance = cls(Namespace())
+      cls._metadata = (instance.name, instance.description)
+    return cls._metadata
 
   @classmethod
   def create_argument_parser(cls, graph_subparser: _SubParsersAction) -> ArgumentParser:
@@ -33,6 +41,13 @@ class Table:
     # Do nothing
     return []
 
+  @staticmethod
+  def fetch_all_data(cursor: sqlite3.Cursor, inputs: List[Dict[str, Any]]) -> Optional[List[Any]]:
+    # Do nothing, data is fetched once per input using fetch_data instead.
+    # Generators may return the data of every input, in the order of inputs,
+    # to fetch it using a single query
+    return None
+
   @staticmethod
   def populate_argument_parser(parser: ArgumentParser):
     # Do nothing
@@ -41,5 +56,10 @@ class Table:
   def fetch_data(self, cursor: sqlite3.Cursor) -> Any:
     return None
 
+  def fetch_columnar_data(self, store: Any) -> Any:
+    # Do nothing, data is fetched from the database using fetch_data instead.
+    # Generators may return the same data read from a ColumnarStore
+    return None
+
   def generate(self, data: Any) -> str:
     return ""
@@ -0,0 +1,49 @@
+import re
+import sqlite3
+from typing import Optional
+
+# Addresses of frames without symbols, which differ between runs
+address_regex = re.compile(r"0x[0-9abcdefABCDEF]+;?")
+
+
+def normalize_trace(trace: Optional[str]) -> Optional[str]:
+  """A trace without the addresses of its unsymbolized frames."""
+  if trace is None:
+    return None
+  return address_regex.sub("", trace)
+
+
+def register_trace_functions(connection: sqlite3.Connection):
+  """Register NORMALIZE_TRACE(trace) on a connection."""
+  connection.create_function("NORMALIZE_TRACE", 1, normalize_trace, deterministic=True)
+
+
+def create_trace_views(connection: sqlite3.Connection):
+  """Expose the distinct heap traces of a benchmark database along with their normalized form as a temporary view.
+
+  Must be called before the connection is made query only.
+  """
+  connection.execute("""
+    CREATE TEMP VIEW IF NOT EXISTS heap_traces(raw, trace) AS
+    SELECT DISTINCT trace, NORMALIZE_TRACE(trace) FROM heapBenchmarkMeasurement WHERE trace IS NOT NULL
+  """)
+
+
+def update_trace_index(connection: sqlite3.Connection):
+  """Index the normalized form of the traces interned into a sidecar since it was last indexed.
+
+  The index is a trigram full-text table, so that LIKE and GLOB patterns on
+  the normalized traces with a run of at least three characters are looked
+  up rather than scanned. Its rows are keyed by the id of the raw trace in
+  dimension_trace, which only grows.
+  """
+  try:
+    connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS heap_traces USING fts5(raw UNINDEXED, trace, tokenize = 'trigram')")
+  except sqlite3.OperationalError:
+    # Without FTS5 or its trigram tokenizer (SQLite 3.34), the traces can only be scanned
+    connection.execute("CREATE TABLE IF NOT EXISTS heap_traces (raw TEXT, trace TEXT)")
+  connection.execute("""
+    INSERT INTO heap_traces (rowid, raw, trace)
+    SELECT id, value, NORMALIZE_TRACE(value) FROM dimension_trace
+    WHERE value IS NOT NULL AND id > (SELECT COALESCE(MAX(rowid), 0) FROM heap_traces)
+  """)
@@ -0,0 +1,97 @@
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from visualization.schema import BulkWriter, create_schema
+
+# The algorithm name XKCP results are stored under, one algorithm per implementation
+XKCP_ALGORITHM = "xkcp"
+XKCP_BENCHMARK_TYPE = "xkcp"
+
+HEADER = re.compile(r"^=+\s*(.+?)\s*=+$")
+FIELD = re.compile(r"^([a-z ]+):\s*([0-9.eE+-]+)\s*(ms|/s)?$")
+
+
+class XkcpResult:
+  """The result of benchmarking a single XKCP implementation."""
+
+  def __init__(self, implementation: str, iterations: int, average_duration: float, throughput: float) -> None:
+    self.implementation = implementation
+    self.iterations = iterations
+    # Milliseconds
+    self.average_duration = average_duration
+    # Operations per second
+    self.throughput = throughput
+
+
+def parse_xkcp_report(lines: Iterable[str]) -> List[XkcpResult]:
+  """Parse a report of the XKCP benchmark, such as:
+
+  ===== plain-64bits/lcu6 =====
+  iterations: 1000
+  average duration: 0.000476ms
+  throughput: 2100840.336134/s
+  """
+  results = []
+  implementation: Optional[str] = None
+  fields: Dict[str, float] = {}
+
+  def finish(number: int):
+    if implementation is None:
+      return
+    missing = {"iterations", "average duration", "throughput"} - fields.keys()
+    if len(missing) > 0:
+      raise ValueError("line {}: '{}' is missing {}".format(number, implementation, ", ".join(sorted(missing))))
+    results.append(XkcpResult(implementation, int(fields["iterations"]), fields["average duration"], fields["throughput"]))
+
+  number = 0
+  for number, line in enumerate(lines, start=1):
+    line = line.strip()
+    if not line:
+      continue
+    header = HEADER.match(line)
+    if header is not None:
+      finish(number)
+      implementation = header.group(1)
+      fields = {}
+      continue
+    field = FIELD.match(line)
+    if field is None or implementation is None:
+      raise ValueError("line {}: unexpected '{}'".format(number, line))
+    fields[field.group(1)] = float(field.group(2))
+  finish(number + 1)
+  return results
+
+
+def read_xkcp_report(path: Path) -> List[XkcpResult]:
+  with open(path, "rt") as file:
+    return parse_xkcp_report(file)
+
+
+def import_xkcp_results(connection: sqlite3.Connection, results: List[XkcpResult], environment: str,
+                        compiler: str = "", run_index: Optional[int] = None) -> Tuple[int, int]:
+  """Import the results of a single benchmark run in an environment, returning the run's id and index.
+
+  Every implementation is stored as an algorithm named xkcp with the
+  implementation as its features, like the variants of the KEMs.
+  """
+  create_schema(connection)
+  row = connection.execute("SELECT id FROM environment WHERE name = ?", (environment,)).fetchone()
+  writer = BulkWriter(connection)
+  environment_id = row[0] if row is not None else writer.insert("environment", environment)
+  if run_index is None:
+    row = connection.execute("SELECT COALESCE(MAX(runIndex) + 1, 0) FROM benchmarkRun WHERE environment = ?", (environment_id,)).fetchone()
+    run_index = row[0]
+  run = writer.insert("benchmarkRun", environment_id, run_index)
+
+  algorithms = {features: id for id, features in connection.execute(
+    "SELECT id, features FROM algorithm WHERE name = ? AND parameters = '' AND compiler = ?", (XKCP_ALGORITHM, compiler))}
+  for result in results:
+    algorithm = algorithms.get(result.implementation)
+    if algorithm is None:
+      algorithm = algorithms[result.implementation] = writer.insert("algorithm", XKCP_ALGORITHM, "", compiler, result.implementation)
+    benchmark = writer.insert("benchmark", run, algorithm, XKCP_BENCHMARK_TYPE, "")
+    writer.insert("xkcpBenchmark", benchmark, result.iterations, result.average_duration, result.throughput)
+  writer.flush()
+  return run, run_index